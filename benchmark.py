@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+from itertools import groupby
+
+# rendering is measured without a display
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide2 import __version__ as pyside_version
+from PySide2.QtWidgets import QApplication
+
+from cw_visual.workload import profiles, benchmark_profiles, scaled, generate_events, event_line
+from cw_visual.cycle_batcher import CycleBatcher
+from cw_visual.stdin_listener import READ_CHUNK_SIZE
+from cw_visual.state_manager import CorewarStateManager, NullView
+from cw_visual.cw_parser import CorewarParser
+from cw_visual.arena import Arena
+from cw_visual.view import ByteView
+
+# measures throughput of every stage of the visualizer on generated matches:
+#   batching - raw stdin bytes into cycle batches (reader thread of StdinListener)
+#   parse - CorewarParser.parse_corewar_output of every cycle, tokenizing and applying
+#   apply - CorewarStateManager updates from already tokenized batches
+#   render - ByteView pixmap rendering of changed cells, once per cycle
+#   pixel_map - ByteView pixel map level of detail frame, once per cycle
+# results are written as json to compare versions
+
+
+class RenderTimingView(NullView):
+    """passes cell rendering to byte view and sums time spent in it, everything else is ignored"""
+
+    def __init__(self, byte_view: ByteView):
+        self.byte_view = byte_view
+        self.seconds = 0.0
+
+    def redraw_cells(self, addrs):
+        start = time.perf_counter()
+        self.byte_view.redraw_cells(addrs)
+        self.seconds += time.perf_counter() - start
+
+    def redraw_cursor_cells(self, addrs):
+        start = time.perf_counter()
+        self.byte_view.redraw_cursor_cells(addrs)
+        self.seconds += time.perf_counter() - start
+
+
+def new_state():
+    arena = Arena()
+    manager = CorewarStateManager(NullView(), arena)
+    return arena, manager, CorewarParser(manager)
+
+
+def bench_batching(data: bytes):
+    start = time.perf_counter()
+
+    batcher = CycleBatcher()
+    batches = []
+
+    for i in range(0, len(data), READ_CHUNK_SIZE):
+        batches += batcher.feed(data[i:i + READ_CHUNK_SIZE])
+
+    batches += batcher.finish()
+
+    return time.perf_counter() - start, batches
+
+
+def bench_parse(cycle_lines):
+    _, manager, parser = new_state()
+    start = time.perf_counter()
+
+    for lines in cycle_lines:
+        parser.parse_corewar_output(lines)
+        manager.flush()
+
+    return time.perf_counter() - start
+
+
+def bench_apply(batches):
+    _, manager, parser = new_state()
+    start = time.perf_counter()
+
+    for batch in batches:
+        parser.apply_events(batch.events)
+        manager.flush()
+
+    return time.perf_counter() - start
+
+
+def bench_render(batches, font_size):
+    arena, manager, parser = new_state()
+    byte_view = ByteView(arena, font_size=font_size)
+    manager.view = RenderTimingView(byte_view)
+
+    pixel_map_seconds = 0.0
+
+    for batch in batches:
+        parser.apply_events(batch.events)
+        manager.flush()
+
+        start = time.perf_counter()
+        byte_view.pixel_map.render()
+        pixel_map_seconds += time.perf_counter() - start
+
+    return manager.view.seconds, pixel_map_seconds
+
+
+def stage_result(seconds, events, cycles):
+    seconds = max(seconds, 1e-9)
+
+    return {
+        "seconds": round(seconds, 6),
+        "events_per_s": round(events / seconds, 1),
+        "us_per_cycle": round(seconds * 1e6 / max(cycles, 1), 3),
+    }
+
+
+def bench_profile(name, profile, seed, repeat, font_size):
+    lines = [event_line(event) for event in generate_events(profile, seed)]
+    data = ("\n".join(lines) + "\n").encode()
+
+    # lines of every cycle, for parse_corewar_output
+    cycle_lines = [list(group) for _, group in groupby(lines, key=lambda line: line.split('"', 2)[1])]
+
+    times = {"batching": [], "parse": [], "apply": [], "render": [], "pixel_map": []}
+
+    for _ in range(repeat):
+        seconds, batches = bench_batching(data)
+        times["batching"].append(seconds)
+        times["parse"].append(bench_parse(cycle_lines))
+        times["apply"].append(bench_apply(batches))
+
+        render, pixel_map = bench_render(batches, font_size)
+        times["render"].append(render)
+        times["pixel_map"].append(pixel_map)
+
+    events = len(lines)
+    cycles = len(batches)
+
+    # the best of repeats is the least disturbed by the rest of the system
+    return {
+        "profile": profile._asdict(),
+        "events": events,
+        "cycles": cycles,
+        "bytes": len(data),
+        "stages": {
+            stage: stage_result(min(seconds), events, cycles) for stage, seconds in times.items()
+        },
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(description="benchmark of corewar visualization stages")
+    arg_parser.add_argument("--profiles", default=",".join(benchmark_profiles),
+                            help=f"comma separated profiles to run, of: {', '.join(profiles)}")
+    arg_parser.add_argument("--scale", type=float, default=1.0,
+                            help="multiplies length of every generated match")
+    arg_parser.add_argument("--seed", type=int, default=0,
+                            help="seed of generated matches")
+    arg_parser.add_argument("--repeat", type=int, default=3,
+                            help="runs of every stage, the best one is reported")
+    arg_parser.add_argument("--font-size", type=int, default=12,
+                            help="pixel size of byte font for rendering")
+    arg_parser.add_argument("--output", metavar="PATH",
+                            help="write json results to PATH instead of stdout")
+
+    return arg_parser.parse_args()
+
+
+if __name__ == "__main__":
+    options = parse_args()
+    app = QApplication()
+
+    results = {
+        "revision": git_revision(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pyside": pyside_version,
+        "platform": platform.platform(),
+        "seed": options.seed,
+        "scale": options.scale,
+        "profiles": {},
+    }
+
+    for name in options.profiles.split(","):
+        if name not in profiles:
+            sys.exit(f"unknown profile: {name}")
+
+        profile = scaled(profiles[name], options.scale)
+        result = bench_profile(name, profile, options.seed, options.repeat, options.font_size)
+        results["profiles"][name] = result
+
+        # progress goes to stderr so json on stdout stays clean
+        stages = ", ".join(
+            f"{stage} {stats['us_per_cycle']} us/cycle" for stage, stats in result["stages"].items())
+        print(f"{name}: {result['events']} events, {result['cycles']} cycles: {stages}", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+
+    if options.output:
+        with open(options.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
@@ -1,18 +1,30 @@
 #!/usr/bin/env python3
 
+import os
 import sys
+import argparse
 from random import random
 from functools import partial
 from typing import List
 
-from PySide2.QtWidgets import QApplication
+from PySide2.QtWidgets import QApplication, QInputDialog
 from PySide2.QtCore import QTimer
 
-from cw_visual.stdin_listener import StdinListener
+from cw_visual.stdin_listener import StdinListener, NonBlockingReader, stdin_batches, file_batches, recorded, stream_batches
+from cw_visual.recorder import RawRecorder
+from cw_visual.listen_server import ListenServer
+from cw_visual.perf_stats import PerfSampler, PerfLog
+from cw_visual.trace import TraceReader, TraceWriter
+from cw_visual.timeline import Timeline, KEYFRAME_INTERVAL, MEMORY_LIMIT
+from cw_visual import headless
 from cw_visual.colors import PEN_WARNING
 from cw_visual.view import View
 from cw_visual.state_manager import CorewarStateManager
 from cw_visual.cw_parser import CorewarParser
+from cw_visual.arena import Arena, MEM_SIZE, ROW_WIDTH
+from cw_visual.shared_arena import SharedArena
+from cw_visual.worker import WorkerProcess, WorkerClient
+from cw_visual.dashboard import Dashboard
 
 
 def uncaught_exception_hook(exctype, value, tb):
@@ -25,10 +37,15 @@ def uncaught_exception_hook(exctype, value, tb):
 # catch KeyboardInterrupt event on top level
 sys.excepthook = uncaught_exception_hook
 
+# how often performance counters are shown and logged
+PERF_SAMPLE_INTERVAL_MS = 500
+
 
 def print_no_stdin_data_msg():
+    waiting_for = f"vm on {options.listen}" if options.listen else "input on stdin"
+
     view.print_msg(
-        "corewar 42\n\nno input on stdin",
+        f"corewar 42\n\nno {waiting_for}",
         {2: PEN_WARNING}
     )
 
@@ -37,12 +54,20 @@ def print_controls_info_msg():
     view.print_msg(
         "corewar 42\n\npress \"space\" to run/pause the simulation\n"
         "+-to speed up/slow down\n\"D\" next step paused\n"
+        "\"A\" previous step paused\n"
+        "\"G\" go to cycle\n"
+        "\"P\" performance counters\n"
+        "mouse wheel to zoom\n"
         "Alt + enter to go fullscreen\n"
         " F11 to go fullscreen"
     )
 
 
 def run_or_pause():
+    if stdin_listener.fast_forwarding:
+        stdin_listener.stop_fast_forward()
+        return
+
     stdin_listener.set_paused(not stdin_listener.paused)
     view.set_paused(stdin_listener.paused)
 
@@ -55,25 +80,143 @@ def read_next_cycle():
     stdin_listener.read_next_cycle()
 
 
+def read_prev_cycle():
+    if not stdin_listener.paused:
+        stdin_listener.set_paused(True)
+        view.set_paused(True)
+
+    if timeline.position is not None:
+        seek(timeline.position - 1)
+
+
+def seek(cycle: int):
+    cycle = timeline.seek(cycle)
+
+    if cycle is not None:
+        view.set_cycle(cycle)
+        view.set_paused(stdin_listener.paused)
+
+        stdin_listener.wake()  # cycles after the seeked one are to be played again
+
+
+def go_to_cycle(cycle: int):
+    """
+    played cycles are seeked in timeline, later ones are fast forwarded to
+    with drawing suppressed and the state is drawn once at the cycle
+    a trace is jumped in instead when it is faster, see jump_in_trace
+    """
+    if not stdin_listener.paused:
+        stdin_listener.set_paused(True)
+        view.set_paused(True)
+
+    if trace is not None:
+        cycle = min(cycle, trace.last_cycle)  # fast forward past the end would wait forever
+
+    if jump_in_trace(cycle):
+        return
+
+    if timeline.live_cycle is not None and cycle <= timeline.live_cycle:
+        seek(cycle)
+    else:
+        stdin_listener.fast_forward(cycle, fast_forward_done)
+
+
+def jump_in_trace(cycle: int):
+    """
+    --trace: restores the keyframe of the trace nearest before the cycle, the trace is read again
+    from the frame after it (see TraceReader.offset_of) and fast forwarded to the cycle,
+    so neither the cycles before the keyframe nor the ones dropped from timeline are replayed
+    returns False if there is no trace, the cycle is in timeline or fast forwarding to it is not slower
+    """
+    if trace is None:
+        return False
+
+    if timeline.first_cycle is not None and timeline.first_cycle <= cycle <= timeline.live_cycle:
+        return False
+
+    keyframe = trace.keyframe_before(cycle)
+
+    if keyframe is None:
+        return False
+
+    keyframe_cycle, snapshot = keyframe
+    position = timeline.position
+
+    if position is not None and keyframe_cycle <= position <= cycle:
+        return False
+
+    stdin_listener.restart(trace.batches(keyframe_cycle + 1))
+    timeline.jump(keyframe_cycle, snapshot)
+    stdin_listener.fast_forward(cycle, fast_forward_done)
+
+    return True
+
+
+def fast_forward_done(cycle: int):
+    # in worker mode the worker draws the state at the cycle
+    if manager is not None:
+        with manager.view_suppressed():
+            manager.flush()
+
+        manager.redraw_state()
+
+    if timeline.position is not None:
+        view.set_cycle(timeline.position)
+        view.set_timeline_range(timeline.first_cycle, timeline.live_cycle)
+
+    view.set_paused(stdin_listener.paused)
+
+
+def ask_cycle():
+    position = timeline.position or 0
+    cycle, ok = QInputDialog.getInt(view, "go to cycle", "cycle:", position, 0, 2**31 - 1)
+
+    if ok:
+        go_to_cycle(cycle)
+
+
 def set_play_speed(speed: int):
     stdin_listener.set_speed(speed)
-    view.set_speed(stdin_listener.speed + 1)
+    view.set_speed(stdin_listener.speed_label())
 
 
 def speed_up():
     stdin_listener.speed_up()
-    view.set_speed(stdin_listener.speed + 1)
+    view.set_speed(stdin_listener.speed_label())
 
 
 def slow_down():
     stdin_listener.slow_down()
-    view.set_speed(stdin_listener.speed + 1)
+    view.set_speed(stdin_listener.speed_label())
+
+
+def sample_perf():
+    sample = perf_sampler.sample()
+
+    if perf_log:
+        perf_log.write(sample)
+
+    view.set_perf_sample(sample)
+
+
+def toggle_perf_hud():
+    shown = view.toggle_perf_hud()
+
+    # counters are sampled only while someone is looking
+    if shown and not perf_timer.isActive():
+        sample_perf()
+        perf_timer.start()
+    elif not shown and not perf_log:
+        perf_timer.stop()
 
 
 def on_key_pressed(key: str):
     actions = {
         " ": run_or_pause,
         "d": read_next_cycle,
+        "a": read_prev_cycle,
+        "g": ask_cycle,
+        "p": toggle_perf_hud,
         "+": speed_up,
         "-": slow_down
     }
@@ -82,31 +225,270 @@ def on_key_pressed(key: str):
     action()
 
 
-def on_stdin_data(cycle: int, data: str or List[str]):
+def start_new_stream():
+    """another vm connected to --listen, its match is played from scratch"""
+    timeline.reset()
+
+    view.set_cycle(0)
+    view.set_timeline_range(0, 0)
+
+
+def on_stdin_data(cycle: int, data: str or List[tuple]):
+    if stdin_listener.fast_forwarding and not isinstance(data, str):
+        # state is drawn once fast forward is done
+        with manager.view_suppressed():
+            timeline.apply(cycle, data)
+
+        return
+
     view.set_cycle(cycle)
 
     if isinstance(data, str) and data == "start":
         print_controls_info_msg()
+    elif isinstance(data, str) and data == "new stream":
+        start_new_stream()
     else:
-        parser.parse_corewar_output(data)
+        timeline.apply(cycle, data)
+        view.set_timeline_range(timeline.first_cycle, timeline.live_cycle)
+
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(description="corewar visualization")
+    arg_parser.add_argument("--trace", metavar="PATH",
+                            help="replay recorded trace file instead of reading stdin")
+    arg_parser.add_argument("--write-trace", metavar="PATH",
+                            help="record the match to trace file while visualizing")
+    arg_parser.add_argument("--record", metavar="PATH",
+                            help="save the raw input stream to PATH (.gz or .xz to compress)")
+    arg_parser.add_argument("--replay", metavar="PATH",
+                            help="read vm output from file instead of stdin, e.g. saved with --record, "
+                                 "gzip or xz compressed files are decompressed on the fly")
+    arg_parser.add_argument("--keyframe-interval", metavar="CYCLES", type=int,
+                            default=KEYFRAME_INTERVAL,
+                            help="cycles between timeline keyframes")
+    arg_parser.add_argument("--timeline-memory", metavar="MB", type=int,
+                            default=MEMORY_LIMIT // (1024 * 1024),
+                            help="memory limit of timeline keyframes and delta logs")
+    arg_parser.add_argument("--mem-size", metavar="BYTES", type=int, default=MEM_SIZE,
+                            help="memory size of vm, header event of the stream overrides it")
+    arg_parser.add_argument("--row-width", metavar="BYTES", type=int, default=ROW_WIDTH,
+                            help="bytes shown in one row of the arena")
+    arg_parser.add_argument("--start-cycle", metavar="CYCLE", type=int,
+                            help="fast forward to the cycle without drawing before showing the state")
+    arg_parser.add_argument("--notifier", action="store_true",
+                            help="read stdin in gui thread as soon as it is readable "
+                                 "instead of polling a reader thread (not on windows)")
+    arg_parser.add_argument("--worker", action="store_true",
+                            help="read, parse and apply input in a worker process, "
+                                 "gui process only draws (not on windows)")
+    arg_parser.add_argument("--listen", metavar="ADDRESS",
+                            help="accept vm connections on a unix socket path or tcp:[HOST:]PORT "
+                                 "instead of reading stdin, every connection starts the match from scratch")
+    arg_parser.add_argument("--profile-log", metavar="PATH",
+                            help="write performance counters shown by \"P\" to PATH as csv")
+    arg_parser.add_argument("--dashboard", metavar="SOURCE", nargs="+",
+                            help="show several matches side by side, every SOURCE is a file, a fifo, "
+                                 "a unix socket or tcp:HOST:PORT of a vm output stream")
+
+    headless_args = arg_parser.add_argument_group(
+        "headless", "render png frames without a window as fast as input is read")
+    headless_args.add_argument("--headless", metavar="DIR",
+                               help="write frames to DIR instead of showing the window")
+    headless_args.add_argument("--every", metavar="K", type=int, default=0,
+                               help="write a frame every K cycles")
+    headless_args.add_argument("--at-cycles", metavar="C1,C2,...", default="",
+                               help="write frames at these cycles")
+    headless_args.add_argument("--size", metavar="WxH", default="1280x720",
+                               help="frame size in pixels")
+    headless_args.add_argument("--font-size", metavar="PX", type=int,
+                               default=headless.DEFAULT_FONT_SIZE,
+                               help="pixel size of byte font in frames")
+
+    return arg_parser.parse_args()
+
+
+def create_arena(options, arena_type=Arena):
+    try:
+        return arena_type(options.mem_size, options.row_width)
+    except ValueError as e:
+        sys.exit(str(e))
+
+
+def create_source(options, non_blocking=False, at_quit=None, stdin_fd=None, listen_server=None):
+    """
+    iterable of cycle batches to visualize,
+    NonBlockingReader of stdin if non_blocking and stdin is read
+    at_quit(close) registers what must be closed before exit, when the app quits by default
+    stdin_fd is read instead of stdin if it is given
+    listen_server (see ListenServer of --listen) is read instead of stdin if it is given
+    """
+    at_quit = at_quit or app.aboutToQuit.connect
+    trace_writer = None
+
+    if options.write_trace:
+        trace_writer = TraceWriter(options.write_trace, (options.mem_size, options.row_width))
+
+        # write index of the trace even if the stream has not ended yet
+        at_quit(trace_writer.close)
+
+    recorder = None
+
+    if options.record and not (options.trace or options.replay or listen_server):
+        recorder = RawRecorder(options.record)
+        at_quit(recorder.close)
+
+    if options.trace:
+        source = TraceReader(options.trace)
+    elif options.replay:
+        source = file_batches(options.replay)
+    elif listen_server:
+        source = listen_server
+        at_quit(listen_server.close)
+    elif non_blocking:
+        return NonBlockingReader(sys.stdin.fileno(), trace_writer, recorder)
+    elif stdin_fd is not None:
+        source = stream_batches(open(stdin_fd, "rb"), recorder)
+    else:
+        source = stdin_batches(recorder)
+
+    if trace_writer:
+        source = recorded(source, trace_writer)
+
+    return source
+
+
+def open_listen_server(options):
+    """binds --listen address before the worker is forked, so the worker inherits the socket"""
+    if options.trace or options.replay or options.write_trace or options.headless or options.dashboard:
+        sys.exit("--listen cannot be combined with --trace, --replay, --write-trace, --headless or --dashboard")
+
+    try:
+        return ListenServer(options.listen)
+    except (OSError, ValueError) as e:
+        sys.exit(f"cannot listen on {options.listen}: {e}")
+
+
+def start_worker(options, listen_server=None):
+    """forks the worker process of --worker, before qt is initialized"""
+    if not hasattr(os, "fork"):
+        sys.exit("--worker is not supported on this platform")
+
+    arena = create_arena(options, SharedArena)
+
+    # multiprocessing closes stdin of the worker, it reads a duplicate instead
+    stdin_fd = os.dup(sys.stdin.fileno())
+
+    worker = WorkerProcess(
+        arena, lambda at_exit: create_source(
+            options, at_quit=at_exit, stdin_fd=stdin_fd, listen_server=listen_server),
+        keyframe_interval=options.keyframe_interval,
+        memory_limit=options.timeline_memory * 1024 * 1024
+    )
+
+    os.close(stdin_fd)
+
+    return worker
+
+
+def run_headless(options):
+    renderer = headless.FrameRenderer(
+        create_arena(options), options.headless,
+        frame_size=headless.parse_size(options.size),
+        font_size=options.font_size
+    )
+    at_cycles = [int(cycle) for cycle in options.at_cycles.split(",") if cycle]
+
+    return headless.run_headless(
+        create_source(options), renderer, every=options.every, at_cycles=at_cycles)
+
+
+def run_dashboard(options):
+    dashboard = Dashboard(options.dashboard, partial(create_arena, options))
+    dashboard.showMaximized()  # tiles are sized to share the whole screen
+
+    return app.exec_()
 
 
 if __name__ == "__main__":
+    options = parse_args()
+
+    # only stdin read by the gui process can be watched by the notifier
+    if options.notifier and (options.trace or options.replay or options.worker or options.listen or
+                             options.headless or options.dashboard):
+        sys.exit("--notifier cannot be combined with --trace, --replay, --worker, --listen, --headless or --dashboard")
+
+    if options.headless:
+        headless.use_offscreen_platform()
+
+    listen_server = open_listen_server(options) if options.listen else None
+
+    worker = None
+
+    if options.worker and not (options.headless or options.dashboard):
+        worker = start_worker(options, listen_server)
+
     app = QApplication()
 
-    view = View()
+    if options.headless:
+        frames = run_headless(options)
+        print(f"{frames} frames written to {options.headless}")
+        sys.exit(0)
 
-    view.key_pressed.connect(on_key_pressed)
+    if options.dashboard:
+        sys.exit(run_dashboard(options))
 
-    manager = CorewarStateManager(view)
-    parser = CorewarParser(manager)
-    stdin_listener = StdinListener(on_stdin_data, 100)
+    arena = worker.arena if worker else create_arena(options)
+
+    view = View(arena)
+
+    view.key_pressed.connect(on_key_pressed)
+    view.seek_requested.connect(seek)
+
+    if worker:
+        # state is kept by the worker process
+        manager = None
+        stdin_listener = WorkerClient(worker, view, on_stdin_data)
+        timeline = stdin_listener.timeline
+        trace = None  # the worker reads the trace, it is fast forwarded
+        app.aboutToQuit.connect(worker.close)
+
+        if listen_server:
+            # the worker reads the inherited socket, the file is removed by this process
+            app.aboutToQuit.connect(listen_server.close)
+    else:
+        manager = CorewarStateManager(view, arena)
+        parser = CorewarParser(manager)
+        timeline = Timeline(
+            parser, manager,
+            keyframe_interval=options.keyframe_interval,
+            memory_limit=options.timeline_memory * 1024 * 1024
+        )
+        source = create_source(options, non_blocking=options.notifier, listen_server=listen_server)
+        stdin_listener = StdinListener(
+            on_stdin_data, source=source, history=timeline, frame_applied=manager.flush)
+
+        # a trace being recorded again (--write-trace) is read through, not jumped in
+        trace = source if isinstance(source, TraceReader) else None
+
+    perf_sampler = PerfSampler(
+        queue_depth=stdin_listener.queue_depth, frame_interval_ms=stdin_listener.timeout)
+    perf_log = PerfLog(options.profile_log) if options.profile_log else None
+    perf_timer = QTimer()
+    perf_timer.setInterval(PERF_SAMPLE_INTERVAL_MS)
+    perf_timer.timeout.connect(sample_perf)
+
+    if perf_log:
+        app.aboutToQuit.connect(perf_log.close)
+        perf_timer.start()
 
     print_no_stdin_data_msg()
 
-    set_play_speed(3)
+    set_play_speed(2)
 
     stdin_listener.start_paused()
+
+    if options.start_cycle is not None:
+        go_to_cycle(options.start_cycle)
     view.show()
 
     sys.exit(app.exec_())
@@ -1,5 +1,10 @@
 
 #include <iostream>
+#include <cstdio>
+#include <cstdint>
+#include <cstring>
+#include <map>
+#include <vector>
 
 // символ раздилителя используемый при печати в консоль, в качестве символа выбран символ двойных кавычек "
 // так как его не может быть в имени игрока и соответственно не возникнет путаницы
@@ -19,6 +24,15 @@ struct Player
 	Carriage *cursors; // массив кареток принадлежащих игроку
 };
 
+// печатать в начале вывода, до создания игроков, если память vm не 4096 байт по 64 в строке
+// cycle номер текущего цикла
+// mem_size размер памяти vm в байтах
+// row_width сколько байт показывать в одной строке, mem_size должен делиться на него
+void print_geometry(int cycle, int mem_size, int row_width)
+{
+	printf("h%c%d%c%d%c%d\n", sep, cycle, sep, mem_size, sep, row_width);
+}
+
 // печатать при создании игрока
 // cycle номер текущего цикла
 // player_id игроков както надо отличать друг от друга в процессе вывода, можно просто использовать аддрес их структур
@@ -77,13 +91,198 @@ void print_declare_winner(int cycle, const void *player_id)
 	printf("e%c%d%c%p\n", sep, cycle, sep, player_id);
 }
 
-int main()
+// ---------------------------------------------------------------------------
+// компактный бинарный протокол, альтернатива текстовому выводу
+// визуализатор определяет его автоматически по первым байтам потока
+//
+// поток начинается с MAGIC, затем идут кадры, по одному на цикл:
+//   заголовок кадра: cycle (u32), длина данных кадра (u32)
+//   данные: записи, каждая запись это байт команды и ее поля
+//
+//   'p' player (u16), address (i32), длина имени (u16), длина кода (u16), имя, код
+//   'c' player (u16), carriage (u32), address (i32)
+//   'k' player (u16), carriage (u32)
+//   'm' player (u16), carriage (u32), offset (i32)
+//   'w' player (u16), address (i32), значение регистра (4 байта как в памяти vm)
+//   'W' player (u16), address (i32), длина данных (u16), данные - запись любой другой длины
+//   'e' player (u16)
+//   'h' размер памяти (u32), байт в строке (u32) - геометрия арены, пишется до всех остальных записей
+//
+// все числа little endian (как на x86)
+
+const char MAGIC[4] = {'C', 'W', 'B', 1};
+
+// вместо адресов структур используются маленькие номера
+// номер выдается при первом появлении адреса
+uint32_t small_id(const void *ptr)
+{
+	static std::map<const void *, uint32_t> ids;
+
+	auto it = ids.find(ptr);
+	if (it != ids.end())
+		return it->second;
+
+	uint32_t id = ids.size();
+	ids[ptr] = id;
+	return id;
+}
+
+// записи текущего цикла копятся в буфере и печатаются одним кадром при смене цикла
+static std::vector<char> frame;
+static int frame_cycle = -1;
+
+void bin_flush_cycle()
+{
+	if (frame.empty())
+		return;
+
+	uint32_t header[2] = {(uint32_t)frame_cycle, (uint32_t)frame.size()};
+	fwrite(header, sizeof(header), 1, stdout);
+	fwrite(frame.data(), frame.size(), 1, stdout);
+	frame.clear();
+}
+
+template <typename T>
+void bin_put(T value)
+{
+	const char *p = (const char *)&value;
+	frame.insert(frame.end(), p, p + sizeof(T));
+}
+
+// начать запись команды, печатает предыдущий кадр если цикл сменился
+void bin_record(int cycle, char command)
+{
+	if (cycle != frame_cycle)
+	{
+		bin_flush_cycle();
+		frame_cycle = cycle;
+	}
+	frame.push_back(command);
+}
+
+void bin_start()
+{
+	fwrite(MAGIC, sizeof(MAGIC), 1, stdout);
+}
+
+void bin_add_player(int cycle, const void *player_id, const char *name, int address, const uint8_t *code, uint16_t code_len)
+{
+	uint16_t name_len = strlen(name);
+
+	bin_record(cycle, 'p');
+	bin_put<uint16_t>(small_id(player_id));
+	bin_put<int32_t>(address);
+	bin_put<uint16_t>(name_len);
+	bin_put<uint16_t>(code_len);
+	frame.insert(frame.end(), name, name + name_len);
+	frame.insert(frame.end(), code, code + code_len);
+}
+
+void bin_add_carriage(int cycle, const void *player_id, const void *carriage_id, int address)
+{
+	bin_record(cycle, 'c');
+	bin_put<uint16_t>(small_id(player_id));
+	bin_put<uint32_t>(small_id(carriage_id));
+	bin_put<int32_t>(address);
+}
+
+void bin_kill_carriage(int cycle, const void *player_id, const void *carriage_id)
 {
+	bin_record(cycle, 'k');
+	bin_put<uint16_t>(small_id(player_id));
+	bin_put<uint32_t>(small_id(carriage_id));
+}
+
+void bin_move_carriage(int cycle, const void *player_id, const void *carriage_id, int offset)
+{
+	bin_record(cycle, 'm');
+	bin_put<uint16_t>(small_id(player_id));
+	bin_put<uint32_t>(small_id(carriage_id));
+	bin_put<int32_t>(offset);
+}
+
+// значение регистра пишется в порядке байт памяти vm (big endian), как и в текстовом выводе %08X
+void bin_write_memory(int cycle, const void *player_id, int address, int32_t reg_value)
+{
+	uint32_t v = (uint32_t)reg_value;
+
+	bin_record(cycle, 'w');
+	bin_put<uint16_t>(small_id(player_id));
+	bin_put<int32_t>(address);
+	frame.push_back((char)(v >> 24));
+	frame.push_back((char)(v >> 16));
+	frame.push_back((char)(v >> 8));
+	frame.push_back((char)v);
+}
+
+// запись в память не 4х байт, длина указывается явно, соседние ячейки не затираются
+void bin_write_bytes(int cycle, const void *player_id, int address, const uint8_t *data, uint16_t len)
+{
+	bin_record(cycle, 'W');
+	bin_put<uint16_t>(small_id(player_id));
+	bin_put<int32_t>(address);
+	bin_put<uint16_t>(len);
+	frame.insert(frame.end(), data, data + len);
+}
+
+void bin_declare_winner(int cycle, const void *player_id)
+{
+	bin_record(cycle, 'e');
+	bin_put<uint16_t>(small_id(player_id));
+}
+
+void bin_set_geometry(int cycle, uint32_t mem_size, uint32_t row_width)
+{
+	bin_record(cycle, 'h');
+	bin_put<uint32_t>(mem_size);
+	bin_put<uint32_t>(row_width);
+}
+
+// конец вывода, печатает последний кадр
+void bin_finish()
+{
+	bin_flush_cycle();
+	fflush(stdout);
+}
+
+// пример вывода в бинарном протоколе, те же события что и в текстовом примере в main
+void binary_example()
+{
+	Player batman;
+	batman.name = "Batman";
+	const uint8_t code[] = {0x4A, 0x16, 0xAF, 0x85, 0x42, 0xE5, 0x61, 0x79,
+							0x5A, 0xFA, 0xBF, 0x4F, 0xCE, 0xE1, 0xF6, 0x50};
+	batman.cursors = new Carriage[2];
+
+	bin_start();
+	bin_set_geometry(0, 4096, 64);
+	bin_add_player(1, (void *)&batman, batman.name, 0, code, sizeof(code));
+	bin_add_carriage(1, (void *)&batman, (void *)&batman.cursors[0], 0);
+	bin_add_carriage(100, (void *)&batman, (void *)&batman.cursors[1], 64 * 20);
+	bin_kill_carriage(150, (void *)&batman, (void *)&batman.cursors[0]);
+	bin_move_carriage(200, (void *)&batman, (void *)&batman.cursors[1], 4);
+	bin_write_memory(300, (void *)&batman, 64 * 25, 0x01AF223F);
+	bin_declare_winner(400, (void *)&batman);
+	bin_finish();
+}
+
+// запуск с флагом -b печатает пример в бинарном протоколе
+int main(int argc, char **argv)
+{
+	if (argc > 1 && strcmp(argv[1], "-b") == 0)
+	{
+		binary_example();
+		return 0;
+	}
+
 	// пример игрок Бэтман
 	Player batman;
 	batman.name = "Batman";
 	batman.bytes = "4A16AF8542E561795AFABF4FCEE1F650";
 
+	// пример вывода геометрии памяти, стандартные 4096 байт по 64 в строке
+	print_geometry(0, 4096, 64);
+
 	// пример вывода при его создании
 	int cycle = 1;
 	int address = 0;
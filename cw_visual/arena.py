@@ -0,0 +1,105 @@
+import numpy as np
+
+
+MEM_SIZE = 4096  # bytes of corewar memory
+ROW_WIDTH = 64  # bytes shown in one row of byte view
+MAX_PLAYERS = 4
+
+
+class Arena:
+    """
+    compact store of corewar memory state
+    shared by parser, state manager and view
+
+    values - byte value of every cell
+    owners - 0 for bytes never written by a player, otherwise player number + 1
+    cursor_counts - count of cursors of every player occupying the cell
+    """
+
+    def __init__(self, size=MEM_SIZE, row_width=ROW_WIDTH):
+        self.resize(size, row_width)
+
+    def resize(self, size: int, row_width: int):
+        """reallocates empty memory of another geometry"""
+        if size <= 0 or row_width <= 0 or size % row_width:
+            raise ValueError(f"bad arena geometry: {size} bytes in rows of {row_width}")
+
+        self.size = size
+        self.row_width = row_width
+        self.rows = size // row_width
+
+        self.allocate()
+
+    def allocate(self):
+        """creates zeroed arrays of current size"""
+        self.values = np.zeros(self.size, dtype=np.uint8)
+        self.owners = np.zeros(self.size, dtype=np.uint8)
+        self.cursor_counts = np.zeros((self.size, MAX_PLAYERS), dtype=np.uint32)
+
+    def clear(self):
+        """empties memory in place"""
+        self.values.fill(0)
+        self.owners.fill(0)
+        self.cursor_counts.fill(0)
+
+    @property
+    def geometry(self):
+        return self.size, self.row_width
+
+    def cell_pos(self, addr: int):
+        """column and row of the address in byte view"""
+        return addr % self.row_width, addr // self.row_width
+
+    def write(self, addr: int, data: bytes, player_number: int):
+        """writes data starting at addr, wraps around the end of memory"""
+        start = addr % self.size
+        data = np.frombuffer(data, dtype=np.uint8)[:self.size]
+        end = start + len(data)
+        owner = player_number + 1
+
+        if end <= self.size:
+            self.values[start:end] = data
+            self.owners[start:end] = owner
+        else:
+            head = self.size - start
+            self.values[start:] = data[:head]
+            self.owners[start:] = owner
+            self.values[:end - self.size] = data[head:]
+            self.owners[:end - self.size] = owner
+
+    def add_cursor(self, addr: int, player_number: int):
+        self.cursor_counts[addr, player_number] += 1
+
+    def remove_cursor(self, addr: int, player_number: int):
+        self.cursor_counts[addr, player_number] -= 1
+
+    def snapshot(self):
+        return self.geometry, self.values.copy(), self.owners.copy(), self.cursor_counts.copy()
+
+    def restore(self, snapshot):
+        """copies snapshot into arrays in place, so references to the arrays stay valid"""
+        geometry, values, owners, cursor_counts = snapshot
+
+        if geometry != self.geometry:
+            self.resize(*geometry)
+
+        self.values[:] = values
+        self.owners[:] = owners
+        self.cursor_counts[:] = cursor_counts
+
+    def snapshot_size(self):
+        return self.values.nbytes + self.owners.nbytes + self.cursor_counts.nbytes
+
+    def cursor_stacks(self, addrs):
+        """
+        for every address returns the player whose cursor is shown in the cell and count of cursors
+        the lowest player number occupying the cell wins, so stacked cells always look the same
+        """
+        counts = self.cursor_counts[addrs]
+        owners = (counts > 0).argmax(axis=1)
+
+        return owners, counts.sum(axis=1)
+
+    def occupied(self, addrs):
+        """mask of addresses occupied by any cursor"""
+        return self.cursor_counts[addrs].any(axis=1)
@@ -0,0 +1,239 @@
+import struct
+from typing import List
+
+from cw_visual.cycle_batcher import CycleBatch
+from cw_visual.cw_parser import IdInterner
+
+
+# compact binary alternative to the text protocol
+#
+# stream starts with MAGIC followed by frames, one frame per cycle:
+#   frame header: cycle (u32), payload length (u32)
+#   payload: records, every record is a command id byte followed by its fields
+#
+#   'p' player (u16), address (i32), name length (u16), code length (u16), name (utf-8), code
+#   'c' player (u16), carriage (u32), address (i32)
+#   'k' player (u16), carriage (u32)
+#   'm' player (u16), carriage (u32), offset (i32)
+#   'w' player (u16), address (i32), register value (4 bytes as stored in vm memory)
+#   'W' player (u16), address (i32), data length (u16), data, write of any other length
+#   'e' player (u16)
+#   'h' memory size (u32), row width (u32), arena geometry, sent before any other event
+#
+# all integers are little endian
+
+MAGIC = b"CWB\x01"
+
+# the longest data of one 'W' record
+MAX_WRITE_LENGTH = 0xffff
+
+FRAME_HEADER = struct.Struct("<II")
+
+records = {
+    ord('p'): struct.Struct("<HiHH"),
+    ord('c'): struct.Struct("<HIi"),
+    ord('k'): struct.Struct("<HI"),
+    ord('m'): struct.Struct("<HIi"),
+    ord('w'): struct.Struct("<Hi4s"),
+    ord('W'): struct.Struct("<HiH"),
+    ord('e'): struct.Struct("<H"),
+    ord('h'): struct.Struct("<II"),
+}
+
+
+class ProtocolError(ValueError):
+    """
+    malformed record in a frame of binary stream, the rest of the frame can not be decoded
+    events holds events of the frame decoded before the record
+    """
+
+    def __init__(self, cycle: int, offset: int, reason: str, events: list):
+        super().__init__(f"bad record in frame of cycle {cycle} at stream offset {offset}: {reason}")
+        self.cycle = cycle
+        self.offset = offset
+        self.events = events
+
+
+def is_binary_stream(head: bytes):
+    return head.startswith(MAGIC)
+
+
+def decode_frame(cycle: int, payload: memoryview, stream_offset=0):
+    """
+    returns events of one frame in the same form as cw_parser.tokenize_line
+    stream_offset - offset of the payload in the stream, reported by ProtocolError
+    """
+    events = []
+    offset = 0
+    end = len(payload)
+
+    while offset < end:
+        command = payload[offset]
+        record = records.get(command)
+
+        if record is None:
+            raise ProtocolError(cycle, stream_offset + offset, f"unknown command {command:#04x}", events)
+
+        if offset + 1 + record.size > end:
+            raise ProtocolError(cycle, stream_offset + offset, f"truncated '{chr(command)}' record", events)
+
+        fields = record.unpack_from(payload, offset + 1)
+        record_offset = offset
+        offset += 1 + record.size
+
+        if command == ord('p'):
+            player_id, address, name_length, code_length = fields
+
+            if offset + name_length + code_length > end:
+                raise ProtocolError(cycle, stream_offset + record_offset, "truncated 'p' record", events)
+
+            name = bytes(payload[offset:offset + name_length]).decode("utf-8", "replace")
+            offset += name_length
+            code = bytes(payload[offset:offset + code_length])
+            offset += code_length
+
+            events.append(('p', cycle, player_id, name, address, code))
+        elif command == ord('W'):
+            player_id, address, length = fields
+
+            if offset + length > end:
+                raise ProtocolError(cycle, stream_offset + record_offset, "truncated 'W' record", events)
+
+            events.append(('w', cycle, player_id, address, bytes(payload[offset:offset + length])))
+            offset += length
+        else:
+            events.append((chr(command), cycle) + fields)
+
+    return events
+
+
+def bad_record(error: ProtocolError):
+    """reported like unknown commands of text protocol, the rest of the frame is skipped"""
+    print(error)
+
+
+def decode_frame_reporting(cycle: int, payload: memoryview, stream_offset=0):
+    """events of the frame, a malformed record is reported and the frame is cut short before it"""
+    try:
+        return decode_frame(cycle, payload, stream_offset)
+    except ProtocolError as e:
+        bad_record(e)
+        return e.events
+
+
+class BinaryDecoder:
+    """
+    turns raw chunks of binary vm output into cycle batches
+    has the same interface as CycleBatcher, ids of events are interned as frames are decoded
+    """
+
+    def __init__(self):
+        self.ids = IdInterner()
+        self.buffer = bytearray()
+        self.magic_checked = False
+        self.buffer_offset = 0  # stream offset of the first byte of buffer
+
+    def feed(self, chunk: bytes) -> List[CycleBatch]:
+        self.buffer += chunk
+
+        if not self.magic_checked:
+            if len(self.buffer) < len(MAGIC):
+                return []
+
+            if not is_binary_stream(self.buffer):
+                raise ValueError("not a binary corewar stream")
+
+            del self.buffer[:len(MAGIC)]
+            self.magic_checked = True
+            self.buffer_offset = len(MAGIC)
+
+        batches = []
+        view = memoryview(self.buffer)
+        offset = 0
+        intern = self.ids.intern
+
+        while len(view) - offset >= FRAME_HEADER.size:
+            cycle, length = FRAME_HEADER.unpack_from(view, offset)
+            start = offset + FRAME_HEADER.size
+
+            if len(view) - start < length:
+                break  # frame is not complete yet
+
+            events = decode_frame_reporting(cycle, view[start:start + length], self.buffer_offset + start)
+            events = [event for event in map(intern, events) if event]
+            batches.append(CycleBatch(cycle, events))
+            offset = start + length
+
+        view.release()
+        del self.buffer[:offset]
+        self.buffer_offset += offset
+
+        return batches
+
+    def finish(self) -> List[CycleBatch]:
+        self.buffer.clear()
+        return []
+
+
+class BinaryWriter:
+    """
+    writes events in binary protocol to a binary stream
+    events of one cycle are collected and written as one frame when the cycle changes
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.cycle = None
+        self.payload = bytearray()
+
+        self.stream.write(MAGIC)
+
+    def record(self, cycle: int, command: str, *fields):
+        if cycle != self.cycle:
+            self.flush_cycle()
+            self.cycle = cycle
+
+        self.payload.append(ord(command))
+        self.payload += records[ord(command)].pack(*fields)
+
+    def flush_cycle(self):
+        if self.payload:
+            self.stream.write(FRAME_HEADER.pack(self.cycle, len(self.payload)))
+            self.stream.write(self.payload)
+            self.payload = bytearray()
+
+    def add_player(self, cycle, player_id, name, address, code: bytes):
+        name = name.encode("utf-8")
+        self.record(cycle, 'p', player_id, address, len(name), len(code))
+        self.payload += name
+        self.payload += code
+
+    def add_cursor(self, cycle, player_id, carriage_id, address):
+        self.record(cycle, 'c', player_id, carriage_id, address)
+
+    def kill_cursor(self, cycle, player_id, carriage_id):
+        self.record(cycle, 'k', player_id, carriage_id)
+
+    def move_cursor(self, cycle, player_id, carriage_id, offset):
+        self.record(cycle, 'm', player_id, carriage_id, offset)
+
+    def write_memory(self, cycle, player_id, address, data: bytes):
+        """register writes go as packed 'w' records, writes of any other length as 'W' with their length"""
+        if len(data) == 4:
+            self.record(cycle, 'w', player_id, address, data)
+            return
+
+        for i in range(0, len(data), MAX_WRITE_LENGTH):
+            chunk = data[i:i + MAX_WRITE_LENGTH]
+            self.record(cycle, 'W', player_id, address + i, len(chunk))
+            self.payload += chunk
+
+    def declare_winner(self, cycle, player_id):
+        self.record(cycle, 'e', player_id)
+
+    def set_geometry(self, cycle, mem_size, row_width):
+        self.record(cycle, 'h', mem_size, row_width)
+
+    def close(self):
+        self.flush_cycle()
+        self.stream.flush()
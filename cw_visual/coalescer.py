@@ -0,0 +1,49 @@
+from typing import Dict, Set, Tuple, Optional
+
+
+class ChangeCoalescer:
+    """
+    collects changes made by a batch of cycles
+    so that every cell and cursor is updated only once when the batch is flushed
+
+    for cursors only the position before the batch is remembered,
+    comparing it to the position after the batch gives the net move,
+    a cursor added and killed within the batch has no position on both ends and is dropped
+    for memory only written cells are remembered, their values are already in the arena,
+    so the last writer of a cell wins
+    """
+
+    def __init__(self):
+        # slot -> (address, player number) before the batch, None for a cursor added in the batch
+        self.cursor_origins: Dict[int, Optional[Tuple[int, int]]] = dict()
+        self.written_cells: Set[int] = set()
+        self.touched_players: Set[int] = set()  # players whose cursor count changed
+
+    def cursor_added(self, slot: int, player_number: int):
+        self.cursor_origins.setdefault(slot, None)
+        self.touched_players.add(player_number)
+
+    def cursor_changed(self, slot: int, addr: int, player_number: int):
+        """call before the cursor is moved or killed"""
+        self.cursor_origins.setdefault(slot, (addr, player_number))
+
+    def cursor_killed(self, slot: int, addr: int, player_number: int):
+        self.cursor_changed(slot, addr, player_number)
+        self.touched_players.add(player_number)
+
+    def cells_written(self, addr: int, count: int, size: int):
+        for i in range(count):
+            self.written_cells.add((addr + i) % size)
+
+    def is_empty(self):
+        return not (self.cursor_origins or self.written_cells or self.touched_players)
+
+    def take(self):
+        """returns collected changes and starts a new batch"""
+        changes = self.cursor_origins, self.written_cells, self.touched_players
+
+        self.cursor_origins = dict()
+        self.written_cells = set()
+        self.touched_players = set()
+
+        return changes
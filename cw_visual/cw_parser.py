@@ -1,5 +1,6 @@
-from typing import List
+from typing import List, Dict
 
+from cw_visual.arena import MAX_PLAYERS
 from cw_visual.state_manager import CorewarStateManager
 
 # separator symbol
@@ -12,6 +13,11 @@ command_parsers = {
     # 'k': kill_cursor
 }
 
+# parsers turn text args of a command into a typed event tuple
+# (command id, cycle, *args of the state manager method handling the command)
+# so events can be produced in the reader thread and applied later in gui thread
+# external ids of the tuple are replaced with player numbers and cursor slots by IdInterner
+
 
 def parser_for_command(id: str):
     """decorator - makes decorated func to be a parser func for the command specified by 'id'"""
@@ -23,89 +29,220 @@ def parser_for_command(id: str):
 
 
 @parser_for_command('p')
-def add_player(state_manager: CorewarStateManager, args: list):
-    cycle = args[0]
+def add_player(args: list):
+    cycle = int(args[0])
     player_id = args[1]
     name = args[2]
     address = int(args[3])
-    bytes_str = args[4].upper()
+    code = bytes.fromhex(args[4])
 
-    state_manager.add_player(player_id, name)
-    state_manager.write_bytes(player_id, address, bytes_str)
+    return 'p', cycle, player_id, name, address, code
 
 
 @parser_for_command('c')
-def add_cursor(state_manager: CorewarStateManager, args: list):
-    cycle = args[0]
+def add_cursor(args: list):
+    cycle = int(args[0])
     player_id = args[1]
     carriage_id = args[2]
     address = int(args[3])
 
-    state_manager.add_cursor(player_id, carriage_id, address)
+    return 'c', cycle, player_id, carriage_id, address
 
 
 @parser_for_command('k')
-def kill_cursor(state_manager: CorewarStateManager, args: list):
-    cycle = args[0]
+def kill_cursor(args: list):
+    cycle = int(args[0])
     player_id = args[1]
     carriage_id = args[2]
 
-    state_manager.kill_cursor(player_id, carriage_id)
+    return 'k', cycle, player_id, carriage_id
 
 
 @parser_for_command('m')
-def move_cursor(state_manager: CorewarStateManager, args: list):
-    cycle = args[0]
+def move_cursor(args: list):
+    cycle = int(args[0])
     player_id = args[1]
     carriage_id = args[2]
     offset = int(args[3])
 
-    state_manager.move_cursor(player_id, carriage_id, offset)
+    return 'm', cycle, player_id, carriage_id, offset
 
 
 @parser_for_command('w')
-def write_memory(state_manager: CorewarStateManager, args: list):
-    cycle = args[0]
+def write_memory(args: list):
+    cycle = int(args[0])
     player_id = args[1]
     address = int(args[2])
-    bytes = args[3].upper()
+    data = bytes.fromhex(args[3])
 
-    state_manager.write_bytes(player_id, address, bytes)
+    return 'w', cycle, player_id, address, data
 
 
 @parser_for_command('e')
-def declare_winner(state_manager: CorewarStateManager, args: list):
-    cycle = args[0]
+def declare_winner(args: list):
+    cycle = int(args[0])
     player_id = args[1]
 
-    state_manager.declare_winner(player_id)
+    return 'e', cycle, player_id
+
+
+@parser_for_command('h')
+def set_geometry(args: list):
+    cycle = int(args[0])
+    mem_size = int(args[1])
+    row_width = int(args[2])
+
+    return 'h', cycle, mem_size, row_width
 
 
 def unknown_command(line):
     print("unknown command: " + line)
 
 
+def tokenize_line(line: str, ids: "IdInterner" = None):
+    """
+    returns event tuple for the line, None if line is not a valid command
+    ids of the event are interned by ids if it is given, None if they are unknown to it
+    """
+    tokens = line.split(separator)
+
+    # first token is the command id
+    command_id = tokens[0]
+    # the rest of the tokens are arguments to the command
+    args = tokens[1:]
+
+    parse_fcn = command_parsers.get(command_id, None)
+
+    if parse_fcn:
+        try:
+            event = parse_fcn(args)
+        except (IndexError, ValueError):
+            pass
+        else:
+            return ids.intern(event) if ids else event
+
+    unknown_command(line)
+    return None
+
+
+def bad_id(event: tuple, reason: str):
+    print(f"{reason}: {event}")
+
+
+class IdInterner:
+    """
+    interns external player and carriage ids (e.g. pointer strings printed by vm) of a stream
+    into player numbers and cursor slots of CorewarStateManager, in the reader thread as events are tokenized,
+    so that gui thread applies events without looking ids up
+
+    players are numbered in order of appearance, as the state manager adds them,
+    slots of killed carriages are given to the next new ones
+    one interner per stream, events must be interned in the order they are applied
+    """
+
+    def __init__(self):
+        self.player_numbers: Dict[object, int] = dict()  # external player id -> player number
+        self.carriage_slots: Dict[object, int] = dict()  # external carriage id -> cursor slot
+        self.free_slots: List[int] = []
+
+    def intern(self, event: tuple):
+        """event with player number and cursor slot instead of ids, None if it refers to unknown ids"""
+        command = event[0]
+
+        if command == 'h':
+            return event
+
+        player_id = event[2]
+        player_number = self.player_numbers.get(player_id, None)
+
+        if command == 'p':
+            if player_number is not None:
+                bad_id(event, "player already exists")
+                return None
+
+            # arena counts cursors of MAX_PLAYERS players only
+            if len(self.player_numbers) >= MAX_PLAYERS:
+                bad_id(event, "too many players")
+                return None
+
+            player_number = len(self.player_numbers)
+            self.player_numbers[player_id] = player_number
+
+            return ('p', event[1], player_number) + event[3:]
+
+        if player_number is None:
+            bad_id(event, "unknown player")
+            return None
+
+        if command == 'w' or command == 'e':
+            return (command, event[1], player_number) + event[3:]
+
+        carriage_id = event[3]
+
+        if command == 'c':
+            if carriage_id in self.carriage_slots:
+                bad_id(event, "carriage already exists")
+                return None
+
+            # while no slot is free every slot is taken by a live carriage
+            slot = self.free_slots.pop() if self.free_slots else len(self.carriage_slots)
+            self.carriage_slots[carriage_id] = slot
+        elif command == 'k':
+            slot = self.carriage_slots.pop(carriage_id, None)
+
+            if slot is not None:
+                self.free_slots.append(slot)
+        else:
+            slot = self.carriage_slots.get(carriage_id, None)
+
+        if slot is None:
+            bad_id(event, "unknown carriage")
+            return None
+
+        return (command, event[1], player_number, slot) + event[4:]
+
+
 class CorewarParser:
     """
     parses the output from corewar virtual machine.
     updates the state of memory, players and cursors through state_manager
+
+    events carry player numbers and cursor slots of state_manager,
+    external ids are interned by IdInterner of the reader as the events are tokenized
     """
 
     def __init__(self, corewar_state_manager: CorewarStateManager):
         self.state_manager = corewar_state_manager
+        self.ids = IdInterner()  # of lines given to parse_corewar_output
 
-    def parse_corewar_output(self, lines: List[str]):
-        for line in lines:
-            tokens = line.split(separator)
+        # command id -> func applying event args
+        self.handlers = {
+            'p': self.apply_add_player,
+            'c': corewar_state_manager.add_cursor,
+            'k': self.apply_kill_cursor,
+            'm': self.apply_move_cursor,
+            'w': corewar_state_manager.write_bytes,
+            'e': corewar_state_manager.declare_winner,
+            'h': corewar_state_manager.set_geometry,
+        }
+
+    def apply_add_player(self, player_number, name, address, code):
+        self.state_manager.add_player(name)
+        self.state_manager.write_bytes(player_number, address, code)
+
+    def apply_kill_cursor(self, player_number, slot):
+        self.state_manager.kill_cursor(slot)
 
-            # first token is the command id
-            command_id = tokens[0]
-            # the rest of the tokens are arguments to the command
-            args = tokens[1:]
+    def apply_move_cursor(self, player_number, slot, offset):
+        self.state_manager.move_cursor(slot, offset)
 
-            parse_fcn = command_parsers.get(command_id, None)
+    def apply_events(self, events: list):
+        """applies already tokenized and interned events, see tokenize_line"""
+        handlers = self.handlers
 
-            if parse_fcn:
-                parse_fcn(self.state_manager, args)
-            else:
-                unknown_command(line)
+        for event in events:
+            handlers[event[0]](*event[2:])
+
+    def parse_corewar_output(self, lines: List[str]):
+        events = [tokenize_line(line, self.ids) for line in lines]
+        self.apply_events([event for event in events if event])
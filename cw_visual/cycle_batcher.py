@@ -0,0 +1,78 @@
+import codecs
+from collections import namedtuple
+from typing import List
+
+from cw_visual.cw_parser import tokenize_line, IdInterner
+
+
+# all events of one vm cycle, ready to be applied by CorewarParser.apply_events
+CycleBatch = namedtuple("CycleBatch", ["cycle", "events"])
+
+# cycle of the batch a source yields when another vm stream starts (see ListenServer),
+# the state is reset before the next batch is applied
+NEW_STREAM_CYCLE = -1
+
+
+class CycleBatcher:
+    """
+    turns raw chunks of vm output into complete cycle batches
+    chunks may end in the middle of a line, the rest of the line is kept for the next chunk
+    a cycle is complete when the first event of another cycle arrives
+    ids of events are interned as lines are tokenized, see IdInterner
+    """
+
+    def __init__(self):
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.ids = IdInterner()
+        self.partial_line = ""
+        self.cycle = None
+        self.events = []
+
+    def feed(self, chunk: bytes) -> List[CycleBatch]:
+        text = self.partial_line + self.decoder.decode(chunk)
+        lines = text.split("\n")
+
+        # last piece is not terminated with newline yet
+        self.partial_line = lines.pop()
+
+        return self.batch_lines(lines)
+
+    def finish(self) -> List[CycleBatch]:
+        """call at the end of stream to get the last cycle"""
+        lines = [self.partial_line + self.decoder.decode(b"", final=True)]
+        self.partial_line = ""
+
+        batches = self.batch_lines(lines)
+
+        if self.events:
+            batches.append(CycleBatch(self.cycle, self.events))
+            self.events = []
+
+        return batches
+
+    def batch_lines(self, lines: List[str]) -> List[CycleBatch]:
+        batches = []
+
+        for line in lines:
+            line = line.rstrip()
+
+            if not line:
+                continue
+
+            event = tokenize_line(line, self.ids)
+
+            if not event:
+                continue
+
+            cycle = event[1]
+
+            if cycle != self.cycle:
+                if self.events:
+                    batches.append(CycleBatch(self.cycle, self.events))
+
+                self.cycle = cycle
+                self.events = []
+
+            self.events.append(event)
+
+        return batches
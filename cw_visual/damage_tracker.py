@@ -0,0 +1,29 @@
+from typing import Dict, List, Tuple
+
+
+class DamageTracker:
+    """
+    collects byte cells touched since the last repaint
+    touched cells of one row are merged into one span [first, last]
+    so a burst of writes ends up as a handful of rects to repaint
+    """
+
+    def __init__(self):
+        self.rows: Dict[int, List[int]] = dict()  # row -> [first column, last column]
+
+    def add_cell(self, i: int, j: int):
+        span = self.rows.get(j, None)
+
+        if span is None:
+            self.rows[j] = [i, i]
+        elif i < span[0]:
+            span[0] = i
+        elif i > span[1]:
+            span[1] = i
+
+    def take_spans(self) -> List[Tuple[int, int, int]]:
+        """returns touched spans as (row, first column, last column) and resets the tracker"""
+        spans = [(j, span[0], span[1]) for j, span in self.rows.items()]
+        self.rows.clear()
+
+        return spans
@@ -0,0 +1,440 @@
+import os
+import math
+import stat
+import time
+import queue
+import socket
+import selectors
+import threading
+from typing import List
+
+from PySide2.QtWidgets import QApplication, QWidget, QHBoxLayout, QVBoxLayout, QGridLayout, QLabel
+from PySide2.QtCore import Qt, QTimer
+from PySide2.QtGui import QFontMetrics
+
+from cw_visual.arena import Arena
+from cw_visual.view import ByteView, ScrollsOverContentArea, load_stylesheet
+from cw_visual.ui_widgets import update_stylesheet
+from cw_visual.state_manager import CorewarStateManager
+from cw_visual.cw_parser import CorewarParser
+from cw_visual.stream_decoder import StreamDecoder
+from cw_visual.spill_buffer import SpillBuffer
+from cw_visual.playback import PlaybackPacer
+from cw_visual.stdin_listener import READ_CHUNK_SIZE, FRAME_INTERVAL_MS
+from cw_visual.perf_stats import counters
+from cw_visual.listen_server import tcp_address
+
+# tournament dashboard: several matches in one process, each with its own parser, state and tile,
+# all of them read by one thread, applied and repainted by one timer,
+# tiles large enough for text draw bytes from glyph atlases shared by all tiles, the others draw pixel maps
+
+# the largest font of tile text, cells of larger fonts would take space from other tiles
+MAX_TILE_FONT_SIZE = 12
+
+# epoll does not accept regular files, poll and select report them always readable
+Selector = getattr(selectors, "PollSelector", selectors.SelectSelector)
+
+
+def open_source(spec: str):
+    """
+    opens input of a match, may block until it is connected:
+    tcp:[HOST:]PORT connects to a tcp server, path of a unix socket connects to it,
+    any other path (file or fifo) is opened for reading, a fifo waits for its writer
+    returns an object with fileno() to read from
+    """
+    tcp = tcp_address(spec)
+
+    if tcp:
+        return socket.create_connection(tcp)
+
+    if stat.S_ISSOCK(os.stat(spec).st_mode):
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.connect(spec)
+        return conn
+
+    return open(spec, "rb", buffering=0)
+
+
+class Match:
+    """one input of the dashboard: its decoder and queue are fed by the reader thread, state is applied by gui"""
+
+    def __init__(self, spec: str, arena: Arena, tile: "MatchTile"):
+        self.spec = spec
+        self.decoder = StreamDecoder()
+        self.cycle_queue = SpillBuffer()
+        self.status = "connecting"  # updated by reader thread
+
+        self.tile = tile
+        self.manager = CorewarStateManager(tile, arena)
+        self.parser = CorewarParser(self.manager)
+
+    def feed(self, chunk: bytes):
+        self.status = "reading"
+        self.put(self.decoder.feed(chunk))
+
+    def finish(self):
+        self.put(self.decoder.finish())
+        self.status = "ended"
+
+    def fail(self, error: Exception):
+        """the input is broken, cycles read so far are still played"""
+        self.status = f"error: {error}"
+
+    def put(self, batches):
+        for batch in batches:
+            self.cycle_queue.put(batch)
+            counters.events_ingested += len(batch.events)
+
+    def apply_next_cycle(self):
+        """returns False if there was no data for the next cycle"""
+        batch = self.cycle_queue.get()
+
+        if batch is None:
+            return False
+
+        self.parser.apply_events(batch.events)
+        self.tile.set_cycle(batch.cycle)
+        return True
+
+
+class MultiplexedReader:
+    """
+    one thread reading inputs of all matches, a selector waits for any of them to become readable
+    every ready input is read one chunk at a time, so a fast input does not hold up the others
+    inputs are opened by short lived threads of their own, as opening a fifo or connecting may block,
+    opened inputs are handed over to the reader through a queue and a wakeup pipe
+    """
+
+    def __init__(self):
+        self.selector = Selector()
+        self.opened = queue.SimpleQueue()
+        self.wakeup_read, self.wakeup_write = os.pipe()
+        self.selector.register(self.wakeup_read, selectors.EVENT_READ)
+
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def add(self, match: Match):
+        opener = threading.Thread(target=self.open, args=(match,))
+        opener.daemon = True
+        opener.start()
+
+    def open(self, match: Match):
+        try:
+            stream = open_source(match.spec)
+        except (OSError, ValueError) as e:
+            match.fail(e)
+            return
+
+        self.opened.put((match, stream))
+        os.write(self.wakeup_write, b"\0")
+
+    def run(self):
+        while True:
+            for key, _ in self.selector.select():
+                if key.fileobj == self.wakeup_read:
+                    self.register_opened()
+                else:
+                    self.read(*key.data)
+
+    def register_opened(self):
+        os.read(self.wakeup_read, 4096)
+
+        while not self.opened.empty():
+            match, stream = self.opened.get()
+            os.set_blocking(stream.fileno(), False)
+            self.selector.register(stream.fileno(), selectors.EVENT_READ, (match, stream))
+
+    def read(self, match: Match, stream):
+        try:
+            chunk = os.read(stream.fileno(), READ_CHUNK_SIZE)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            match.fail(e)
+            self.close(stream)
+            return
+
+        try:
+            if chunk:
+                match.feed(chunk)
+                return
+
+            match.finish()
+        except ValueError as e:
+            # e.g. not a binary corewar stream, only this input is closed, the others are read on
+            match.fail(e)
+
+        self.close(stream)
+
+    def close(self, stream):
+        self.selector.unregister(stream.fileno())
+        stream.close()
+
+
+def text_cell_size(font_size: int):
+    """(width, height) of a byte cell ByteView draws as text in font of the size"""
+    font = QApplication.font()
+    font.setPixelSize(font_size)
+    rect = QFontMetrics(font).boundingRect("00")
+
+    return rect.width() + 2 * ByteView.byte_padding + ByteView.byte_margin, rect.height()
+
+
+class MatchTile(QWidget):
+    """
+    compact view of one match: title, cycle, arena and players
+    has the drawing interface of View used by CorewarStateManager
+    """
+
+    def __init__(self, title: str, arena: Arena, scheduler, size, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.arena = arena
+        self.tile_width, self.tile_height = size
+        self.status = None
+
+        self.title = QLabel(title)
+        self.status_label = QLabel("")
+        self.cycle_label = QLabel("0")
+        self.cycle_label.setProperty("lighted", True)  # for stylesheet
+
+        self.byte_view = ByteView(arena, font_size=self.fit_zoom(), scheduler=scheduler)
+        self.scroll_area = ScrollsOverContentArea()
+        self.scroll_area.setWidget(self.byte_view)
+
+        self.player_labels = []
+
+        for number in range(1, 5):
+            label = QLabel("")
+            label.setProperty("player", number)  # for stylesheet
+            self.player_labels.append(label)
+
+        self.players = []  # name of every player
+        self.winner = None  # player number
+
+        header = QHBoxLayout()
+        header.addWidget(self.title)
+        header.addStretch()
+        header.addWidget(self.status_label)
+        header.addWidget(self.cycle_label)
+
+        players = QHBoxLayout()
+
+        for label in self.player_labels:
+            players.addWidget(label)
+
+        players.addStretch()
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(8, 8, 8, 8)
+        layout.addLayout(header)
+        layout.addWidget(self.scroll_area)
+        layout.addLayout(players)
+        self.setLayout(layout)
+
+        self.redraw_cells = self.byte_view.redraw_cells
+        self.redraw_cursor_cells = self.byte_view.redraw_cursor_cells
+
+    def fit_zoom(self):
+        """
+        the largest font whose byte cells fit the tile, the largest pixel map fitting it if none does
+        tiles of the same font size draw text from the same glyph atlas (see get_atlas)
+        """
+        for font_size in range(MAX_TILE_FONT_SIZE, ByteView.min_text_font_size - 1, -1):
+            width, height = text_cell_size(font_size)
+
+            if width * self.arena.row_width <= self.tile_width and height * self.arena.rows <= self.tile_height:
+                return font_size
+
+        zoom = min(self.tile_width // (self.arena.row_width * 2), self.tile_height // self.arena.rows)
+        return max(ByteView.min_zoom, min(zoom, ByteView.min_text_font_size - 1))
+
+    def set_cycle(self, cycle: int):
+        self.cycle_label.setText(str(cycle))
+
+    def set_status(self, status: str):
+        if status != self.status:
+            self.status = status
+            self.status_label.setText(status)
+
+            failed = status.startswith("error")
+            self.status_label.setProperty("status", "failed" if failed else "")  # for stylesheet
+            update_stylesheet(self.status_label)
+
+    def redraw_arena(self):
+        if self.byte_view.geometry != self.arena.geometry:
+            self.byte_view.initialize(self.fit_zoom())
+            self.scroll_area.updateGeometry()
+
+        self.byte_view.redraw_arena()
+
+    def reset_players(self):
+        self.players = []
+        self.winner = None
+
+        for label in self.player_labels:
+            label.setText("")
+            label.setProperty("lighted", False)
+            update_stylesheet(label)
+
+    def add_player(self, name: str):
+        self.players.append(name)
+        self.set_cursor_count(len(self.players) - 1, 0)
+
+    def set_cursor_count(self, number: int, count: int):
+        # cursor counts are flushed after the winner is declared
+        if number < len(self.player_labels) and number != self.winner:
+            self.player_labels[number].setText(f"{self.players[number]} {count}")
+
+    def declare_winner(self, number: int):
+        self.winner = number
+
+        if number < len(self.player_labels):
+            label = self.player_labels[number]
+            label.setText(f"{self.players[number]} winner")
+            label.setProperty("lighted", True)
+            update_stylesheet(label)
+
+
+class FrameScheduler:
+    """
+    one timer for all matches of the dashboard instead of timers of every match and view:
+    every display frame applies as many cycles of every match as playback pacer allows,
+    a cycle of each match in turn, then repaints all views damaged since the previous frame
+    """
+
+    def __init__(self, interval_ms=FRAME_INTERVAL_MS):
+        self.matches: List[Match] = []
+        self.pacer = PlaybackPacer()
+        self.paused = True
+        self.damaged = dict()  # views to repaint, in order of damage
+
+        self.timer = QTimer()
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.tick)
+        self.timer.start()
+
+    def schedule_repaint(self, view: ByteView):
+        self.damaged[view] = None
+
+    def set_paused(self, paused: bool):
+        self.paused = paused
+        self.pacer.reset()
+
+    def tick(self):
+        if not self.paused:
+            self.play_frame()
+
+        damaged, self.damaged = self.damaged, dict()
+
+        for view in damaged:
+            view.repaint_damaged()
+
+        for match in self.matches:
+            match.tile.set_status(match.status)
+
+    def play_frame(self):
+        cycles_due = self.pacer.start_frame()
+        applied = 0
+        starved = False
+        start = time.perf_counter()
+
+        while applied < cycles_due and self.pacer.within_budget():
+            # matches with no data fall behind, the others go on
+            played = [match.apply_next_cycle() for match in self.matches]
+
+            if not any(played):
+                starved = True
+                break
+
+            applied += 1
+            counters.cycles_applied += sum(played)
+
+        counters.add_time("apply", start)
+        start = time.perf_counter()
+
+        for match in self.matches:
+            match.manager.flush()
+
+        counters.add_time("draw", start)
+        self.pacer.end_frame(applied, starved)
+
+
+class Dashboard(QWidget):
+    """grid of match tiles, space runs or pauses all of them, +- changes speed of all of them"""
+
+    # space around the tile grid
+    margin = 20
+
+    def __init__(self, specs: List[str], create_arena, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("corewar tournament")
+
+        self.scheduler = FrameScheduler()
+        self.reader = MultiplexedReader()
+
+        self.status = QLabel("paused")
+        self.status.setProperty("status", "paused")  # for stylesheet
+        self.speed = QLabel("")
+        self.speed.setProperty("lighted", True)  # for stylesheet
+
+        bar = QHBoxLayout()
+        bar.addWidget(self.status)
+        bar.addWidget(QLabel("cycles/s"))
+        bar.addWidget(self.speed)
+        bar.addStretch()
+
+        columns = math.ceil(math.sqrt(len(specs)))
+        rows = math.ceil(len(specs) / columns)
+        screen = QApplication.desktop().availableGeometry()
+        tile_size = (
+            (screen.width() - 2 * self.margin) // columns - 2 * self.margin,
+            (screen.height() - 2 * self.margin) // rows - 4 * self.margin
+        )
+
+        grid = QGridLayout()
+
+        for i, spec in enumerate(specs):
+            arena = create_arena()
+            tile = MatchTile(os.path.basename(spec) or spec, arena, self.scheduler, tile_size)
+            match = Match(spec, arena, tile)
+
+            self.scheduler.matches.append(match)
+            self.reader.add(match)
+            grid.addWidget(tile, i // columns, i % columns)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(self.margin, self.margin, self.margin, self.margin)
+        layout.addLayout(bar)
+        layout.addLayout(grid)
+        self.setLayout(layout)
+
+        # one stylesheet for all tiles
+        self.setObjectName("main")
+        self.setStyleSheet(load_stylesheet())
+
+        self.scheduler.pacer.set_speed(2)
+        self.update_speed()
+
+    def keyPressEvent(self, ev):
+        if ev.key() == Qt.Key_Space:
+            self.set_paused(not self.scheduler.paused)
+        elif ev.key() == Qt.Key_Plus:
+            self.scheduler.pacer.speed_up()
+            self.update_speed()
+        elif ev.key() == Qt.Key_Minus:
+            self.scheduler.pacer.slow_down()
+            self.update_speed()
+        elif ev.key() == Qt.Key_F11:
+            self.setWindowState(self.windowState() ^ Qt.WindowFullScreen)
+
+    def set_paused(self, paused: bool):
+        self.scheduler.set_paused(paused)
+
+        self.status.setText("paused" if paused else "playing")
+        self.status.setProperty("status", "paused" if paused else "play")  # for stylesheet
+        update_stylesheet(self.status)
+
+    def update_speed(self):
+        self.speed.setText(self.scheduler.pacer.label())
@@ -0,0 +1,142 @@
+from typing import Dict, Tuple
+
+from PySide2.QtGui import QPainter, QPixmap, QFont, QColor
+from PySide2.QtCore import QRect, QPoint, Qt
+
+from cw_visual.colors import *
+
+
+# atlases already built, shared between all byte views
+# key is (font key, cell width, cell height, device pixel ratio)
+atlas_cache: Dict[Tuple[str, int, int, float], "GlyphAtlas"] = dict()
+
+
+# most marks of stack indicator, cells with more cursors show the same marks
+MAX_STACK_MARKS = 3
+
+
+def color_key(color: QColor):
+    return color.rgba()
+
+
+class GlyphAtlas:
+    """
+    pre-rasterized byte cells: every hex value 00..FF in every cell style
+    one atlas row per style, one column per byte value
+    cells are blitted from the atlas instead of laying out text for every byte
+
+    stack indicators are pre-rendered too: a cell with n cursors gets n - 1 marks,
+    they are drawn over the cursor cell
+    """
+
+    def __init__(self, font: QFont, cell_rect: QRect, dpr: float = 1.0):
+        self.font = font
+        self.cell_width = cell_rect.width()
+        self.cell_height = cell_rect.height()
+        self.dpr = dpr
+
+        # style row indexes
+        self.byte_styles: Dict[int, int] = dict()  # pen color -> row
+        self.cursor_styles: Dict[int, int] = dict()  # brush color -> row
+
+        styles = []
+
+        # plain byte cells: empty pen and every player pen on empty background
+        for pen in [PEN_EMPTY] + pens:
+            self.byte_styles[color_key(pen.color())] = len(styles)
+            styles.append((pen, BRUSH_EMPTY))
+
+        # cursor cells: PEN_BCK text on every player brush
+        for brush in brushes:
+            self.cursor_styles[color_key(brush.color())] = len(styles)
+            styles.append((PEN_BCK, brush))
+
+        self.pixmap = self.render(styles)
+        self.stack_marks = self.render_stack_marks()
+
+    def render(self, styles):
+        w = self.cell_width * 256
+        h = self.cell_height * len(styles)
+
+        pixmap = QPixmap(round(w * self.dpr), round(h * self.dpr))
+        pixmap.setDevicePixelRatio(self.dpr)
+        pixmap.fill(Qt.transparent)
+
+        painter = QPainter(pixmap)
+        painter.setFont(self.font)
+
+        cell_rect = QRect(0, 0, self.cell_width, self.cell_height)
+
+        for row, (pen, brush) in enumerate(styles):
+            for value in range(256):
+                cell_rect.moveTopLeft(
+                    QPoint(value * self.cell_width, row * self.cell_height))
+
+                painter.setPen(Qt.NoPen)
+                painter.setBrush(brush)
+                painter.drawRect(cell_rect)
+
+                painter.setPen(pen)
+                painter.drawText(cell_rect, Qt.AlignCenter, f'{value:02X}')
+
+        painter.end()
+
+        return pixmap
+
+    def render_stack_marks(self):
+        """one column per marks count, small squares along the top right corner of the cell"""
+        mark_size = max(2, self.cell_height // 6)
+
+        pixmap = QPixmap(
+            round(self.cell_width * MAX_STACK_MARKS * self.dpr), round(self.cell_height * self.dpr))
+        pixmap.setDevicePixelRatio(self.dpr)
+        pixmap.fill(Qt.transparent)
+
+        painter = QPainter(pixmap)
+
+        for column in range(MAX_STACK_MARKS):
+            right = (column + 1) * self.cell_width - 1
+
+            for mark in range(column + 1):
+                painter.fillRect(
+                    right - (mark + 1) * (mark_size + 1) + 1, 1, mark_size, mark_size, PEN_BCK.color())
+
+        painter.end()
+
+        return pixmap
+
+    def source_rect(self, row: int, value: int):
+        """rect of the cell in atlas pixmap coordinates (device pixels)"""
+        return QRect(
+            round(value * self.cell_width * self.dpr),
+            round(row * self.cell_height * self.dpr),
+            round(self.cell_width * self.dpr),
+            round(self.cell_height * self.dpr)
+        )
+
+    def byte_row(self, pen):
+        return self.byte_styles.get(color_key(pen.color()), 0)
+
+    def cursor_row(self, brush):
+        return self.cursor_styles[color_key(brush.color())]
+
+    def blit(self, painter: QPainter, target: QRect, row: int, value: int):
+        painter.drawPixmap(target, self.pixmap, self.source_rect(row, value))
+
+    def blit_stack_marks(self, painter: QPainter, target: QRect, cursors_count: int):
+        """draws marks of a cell occupied by cursors_count > 1 cursors"""
+        marks = min(cursors_count - 1, MAX_STACK_MARKS)
+        painter.drawPixmap(target, self.stack_marks, self.source_rect(0, marks - 1))
+
+
+def get_atlas(font: QFont, cell_rect: QRect, dpr: float = 1.0):
+    """returns atlas for the font and cell size, builds it only once"""
+    key = (font.key(), cell_rect.width(), cell_rect.height(), dpr)
+
+    atlas = atlas_cache.get(key, None)
+
+    if atlas is None:
+        atlas = GlyphAtlas(font, cell_rect, dpr)
+        atlas_cache[key] = atlas
+
+    return atlas
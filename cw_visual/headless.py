@@ -0,0 +1,117 @@
+import os
+from typing import Iterable, List
+
+from PySide2.QtGui import QImage, QPainter
+from PySide2.QtCore import Qt, QSize, QPoint
+
+from cw_visual.colors import QCOLOR_BKG_EMPTY
+from cw_visual.arena import Arena
+from cw_visual.view import ByteView
+from cw_visual.state_manager import CorewarStateManager, NullView
+from cw_visual.cw_parser import CorewarParser
+from cw_visual.cycle_batcher import CycleBatch
+
+
+DEFAULT_FONT_SIZE = 12
+DEFAULT_FRAME_SIZE = QSize(1280, 720)
+
+
+def use_offscreen_platform():
+    """call before QApplication is created so no display is needed"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+def parse_size(size: str) -> QSize:
+    """'1280x720' -> QSize"""
+    w, h = size.lower().split("x")
+    return QSize(int(w), int(h))
+
+
+class FrameRenderer:
+    """
+    renders arena state into png frames of fixed size with an offscreen byte view
+    the byte view is never shown, it is only used to rasterize cells
+    """
+
+    def __init__(self, arena: Arena, out_dir: str,
+                 frame_size: QSize = DEFAULT_FRAME_SIZE, font_size=DEFAULT_FONT_SIZE):
+        self.byte_view = ByteView(arena, font_size=font_size)
+        self.out_dir = out_dir
+        self.frame_size = frame_size
+        self.frames_written = 0
+
+        os.makedirs(out_dir, exist_ok=True)
+
+    def render(self) -> QImage:
+        self.byte_view.redraw_arena()
+        arena_image = self.byte_view.render_to_image()
+
+        # fit arena into the frame keeping aspect ratio
+        scaled = arena_image.scaled(
+            self.frame_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+        frame = QImage(self.frame_size, QImage.Format_RGB32)
+        frame.fill(QCOLOR_BKG_EMPTY)
+
+        painter = QPainter(frame)
+        painter.drawImage(QPoint(
+            (frame.width() - scaled.width()) // 2,
+            (frame.height() - scaled.height()) // 2
+        ), scaled)
+        painter.end()
+
+        return frame
+
+    def write_frame(self, cycle: int):
+        path = os.path.join(self.out_dir, f"frame_{cycle:07d}.png")
+        self.render().save(path)
+        self.frames_written += 1
+
+
+def run_headless(source: Iterable[CycleBatch], renderer: FrameRenderer,
+                 every: int = 0, at_cycles: List[int] = ()):
+    """
+    applies all batches of source as fast as they are read, no pacing and no timers
+    writes a frame every 'every' cycles and at each of 'at_cycles',
+    the final state of the match is always written
+    """
+    arena = renderer.byte_view.arena
+
+    # state is updated without drawing, cells are rendered only when a frame is written
+    manager = CorewarStateManager(NullView(), arena)
+    parser = CorewarParser(manager)
+
+    at_cycles = sorted(at_cycles)
+    next_every = every if every > 0 else None
+    last_cycle = None
+    last_written = None
+
+    for batch in source:
+        # frames at cycles with no events show the state before the batch
+        while at_cycles and at_cycles[0] < batch.cycle and last_cycle is not None:
+            manager.flush()
+            renderer.write_frame(at_cycles.pop(0))
+            last_written = last_cycle
+
+        parser.apply_events(batch.events)
+        last_cycle = batch.cycle
+        due = False
+
+        while at_cycles and at_cycles[0] <= batch.cycle:
+            at_cycles.pop(0)
+            due = True
+
+        while next_every is not None and next_every <= batch.cycle:
+            next_every += every
+            due = True
+
+        if due:
+            manager.flush()
+            renderer.write_frame(batch.cycle)
+            last_written = batch.cycle
+
+    if last_cycle is not None and last_written != last_cycle:
+        manager.flush()
+        renderer.write_frame(last_cycle)
+
+    return renderer.frames_written
@@ -0,0 +1,131 @@
+import os
+import stat
+import socket
+import selectors
+from typing import List
+
+from cw_visual.cycle_batcher import CycleBatch, NEW_STREAM_CYCLE
+from cw_visual.stream_decoder import StreamDecoder
+
+TCP_PREFIX = "tcp:"
+
+# tcp:PORT listens on this host, the vm runs on the same machine
+DEFAULT_TCP_HOST = "127.0.0.1"
+
+# bytes read from a connection at once, more than from stdin as the socket buffer is larger
+SOCKET_READ_SIZE = 256 * 1024
+
+# kernel buffer of a connection, the vm keeps writing while the reader thread is busy
+RECEIVE_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+def tcp_address(spec: str):
+    """(host, port) of tcp:HOST:PORT or tcp:PORT, None if spec is not a tcp address"""
+    if not spec.startswith(TCP_PREFIX):
+        return None
+
+    host, _, port = spec[len(TCP_PREFIX):].rpartition(":")
+
+    return host or DEFAULT_TCP_HOST, int(port)
+
+
+class VmConnection:
+    """one connected vm, read without blocking"""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.decoder = StreamDecoder()
+        self.ended = False  # vm has disconnected
+
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_SIZE)
+        sock.setblocking(False)
+
+    def read_available(self) -> List[CycleBatch]:
+        """batches of one large read, those of the last cycle too when the vm has disconnected"""
+        try:
+            chunk = self.sock.recv(SOCKET_READ_SIZE)
+        except BlockingIOError:
+            return []
+        except ConnectionError:
+            chunk = b""
+
+        if chunk:
+            return self.decoder.feed(chunk)
+
+        self.ended = True
+        print(self.decoder.throughput_report())
+
+        return self.decoder.finish()
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def close(self):
+        self.sock.close()
+
+
+class ListenServer:
+    """
+    iterable of cycle batches of vms connecting to a unix socket or a tcp port, so the gui outlives vm runs
+    every connection is a stream of its own starting with a batch of NEW_STREAM_CYCLE, the state is reset by it,
+    a vm connecting while another one is connected replaces it, the rest of the old stream is dropped
+
+    address is a path of unix socket or tcp:[HOST:]PORT, it is bound at once so errors are reported early
+    iterated by a reader thread, e.g. of StdinListener, forked worker process iterates the inherited socket
+    """
+
+    def __init__(self, address: str):
+        self.address = address
+        self.path = None  # unix socket file, removed by the process that created it
+        self.pid = os.getpid()
+
+        tcp = tcp_address(address)
+
+        if tcp:
+            self.server = socket.create_server(tcp)
+        else:
+            # socket file left by a previous run that was killed
+            if os.path.exists(address) and stat.S_ISSOCK(os.stat(address).st_mode):
+                os.unlink(address)
+
+            self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.server.bind(address)
+            self.server.listen()
+            self.path = address
+
+        print(f"listening on {address}")
+
+    def __iter__(self):
+        selector = selectors.DefaultSelector()
+        selector.register(self.server, selectors.EVENT_READ)
+        connection = None
+
+        while True:
+            for key, _ in selector.select():
+                if key.fileobj is self.server:
+                    if connection is not None:
+                        selector.unregister(connection)
+                        connection.close()
+
+                    connection = VmConnection(self.server.accept()[0])
+                    selector.register(connection, selectors.EVENT_READ)
+                    print(f"vm connected to {self.address}")
+
+                    yield CycleBatch(NEW_STREAM_CYCLE, [])
+
+                elif key.fileobj is connection:
+                    batches = connection.read_available()
+
+                    if connection.ended:
+                        selector.unregister(connection)
+                        connection.close()
+                        connection = None
+
+                    yield from batches
+
+    def close(self):
+        self.server.close()
+
+        if self.path and os.getpid() == self.pid:
+            os.unlink(self.path)
+            self.path = None
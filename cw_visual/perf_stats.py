@@ -0,0 +1,106 @@
+import csv
+import time
+from collections import namedtuple
+
+
+# stages timed per frame
+#   parse - decoding raw input into cycle batches (reader thread or socket notifier)
+#   apply - applying cycles to the state
+#   draw - drawing changes of a frame into byte view pixmaps (CorewarStateManager.flush)
+#   paint - ByteView.paintEvent
+STAGES = ("parse", "apply", "draw", "paint")
+
+
+class PerfCounters:
+    """
+    monotonic totals updated by every stage, they are only ever increased
+    so they are read from another thread without locking, see PerfSampler for rates
+    every counter is increased by one thread only
+    """
+
+    def __init__(self):
+        self.events_ingested = 0
+        self.cycles_applied = 0
+        self.frames_painted = 0
+        self.seconds = dict.fromkeys(STAGES, 0.0)
+
+    def add_time(self, stage: str, start: float):
+        """adds time since start (time.perf_counter) to the stage"""
+        self.seconds[stage] += time.perf_counter() - start
+
+    def totals(self):
+        return (
+            self.events_ingested, self.cycles_applied, self.frames_painted,
+            dict(self.seconds)
+        )
+
+
+# shared by all stages of the process
+counters = PerfCounters()
+
+
+# rates over the last sample interval
+# stage times are ms spent per display frame interval, to compare with the frame budget
+PerfSample = namedtuple(
+    "PerfSample",
+    ["time", "events_per_s", "cycles_per_s", "queue_depth",
+     "parse_ms", "apply_ms", "draw_ms", "paint_ms", "fps"]
+)
+
+
+class PerfSampler:
+    """turns counters into rates since the previous sample"""
+
+    def __init__(self, queue_depth=lambda: 0, frame_interval_ms=1000 / 60):
+        self.queue_depth = queue_depth
+        self.frame_interval = frame_interval_ms / 1000
+        self.start_time = time.perf_counter()
+        self.last_time = self.start_time
+        self.last_totals = counters.totals()
+
+    def sample(self) -> PerfSample:
+        now = time.perf_counter()
+        totals = counters.totals()
+
+        seconds = max(now - self.last_time, 1e-9)
+        *counts, stage_totals = totals
+        *last_counts, last_stage_totals = self.last_totals
+
+        events, cycles, painted = (count - last for count, last in zip(counts, last_counts))
+        stage_seconds = {stage: stage_totals[stage] - last_stage_totals[stage] for stage in STAGES}
+
+        self.last_time = now
+        self.last_totals = totals
+
+        frames = seconds / self.frame_interval
+
+        def ms_per_frame(stage):
+            return stage_seconds[stage] * 1000 / frames
+
+        return PerfSample(
+            time=now - self.start_time,
+            events_per_s=events / seconds,
+            cycles_per_s=cycles / seconds,
+            queue_depth=self.queue_depth(),
+            parse_ms=ms_per_frame("parse"),
+            apply_ms=ms_per_frame("apply"),
+            draw_ms=ms_per_frame("draw"),
+            paint_ms=ms_per_frame("paint"),
+            fps=painted / seconds,
+        )
+
+
+class PerfLog:
+    """writes samples as csv rows"""
+
+    def __init__(self, path: str):
+        self.file = open(path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(PerfSample._fields)
+
+    def write(self, sample: PerfSample):
+        self.writer.writerow(f"{value:.3f}" if isinstance(value, float) else value for value in sample)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
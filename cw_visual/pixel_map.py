@@ -0,0 +1,77 @@
+import numpy as np
+
+from PySide2.QtGui import QImage, QColor
+
+from cw_visual.colors import *
+from cw_visual.arena import Arena
+
+
+# written cells start at full heat and lose this part of it every rendered frame
+HEAT_DECAY = 1 / 8
+
+# share of owner color in a byte not covered by cursor, the rest is background
+OWNER_SHADE = 0.55
+
+# how much a just written byte is brightened towards white
+HEAT_GLOW = 0.6
+
+
+def rgb(color: QColor):
+    return np.array([color.red(), color.green(), color.blue()], dtype=np.float32)
+
+
+class PixelMap:
+    """
+    level of detail rendering of the arena: one pixel per byte, scaled up by the byte view
+    pixels are computed straight from the arena arrays:
+    owner color, cursor color of the lowest player in the cell on top, brightened by recent writes
+    """
+
+    def __init__(self, arena: Arena):
+        self.arena = arena
+        self.rows = arena.rows
+
+        background = rgb(QCOLOR_BKG_EMPTY)
+
+        # owner -> color of a byte, 0 is a byte never written by a player
+        self.owner_colors = np.array(
+            [rgb(QCOLOR_EMPTY) * 0.5 + background * 0.5] +
+            [rgb(pen.color()) * OWNER_SHADE + background * (1 - OWNER_SHADE) for pen in pens],
+            dtype=np.float32
+        )
+        self.cursor_colors = np.array([rgb(brush.color()) for brush in brushes], dtype=np.float32)
+
+        self.heat = np.zeros(arena.size, dtype=np.float32)
+
+        # kept alive for the image, which does not copy it
+        self.pixels = np.zeros((self.rows, arena.row_width), dtype=np.uint32)
+        self.image = QImage(
+            self.pixels.data, arena.row_width, self.rows, arena.row_width * 4, QImage.Format_RGB32)
+
+    def cells_written(self, addrs):
+        self.heat[list(addrs)] = 1.0
+
+    def is_hot(self):
+        """true while some recent writes are still fading"""
+        return bool(self.heat.any())
+
+    def render(self) -> QImage:
+        """fills pixels from arena state, every call is one frame of heat decay"""
+        arena = self.arena
+
+        colors = self.owner_colors[arena.owners]
+
+        occupied = arena.cursor_counts > 0
+        covered = occupied.any(axis=1)
+        colors[covered] = self.cursor_colors[occupied[covered].argmax(axis=1)]
+
+        colors += (255 - colors) * (self.heat * HEAT_GLOW)[:, None]
+
+        self.heat -= HEAT_DECAY
+        np.maximum(self.heat, 0, out=self.heat)
+
+        channels = colors.astype(np.uint32)
+        self.pixels.reshape(-1)[:] = (
+            0xFF000000 | (channels[:, 0] << 16) | (channels[:, 1] << 8) | channels[:, 2])
+
+        return self.image
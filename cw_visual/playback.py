@@ -0,0 +1,94 @@
+import time
+
+
+UNLIMITED = 0  # apply as many cycles as fit into a frame budget
+
+# playback speeds in cycles per second
+speeds = [
+    1,
+    2,
+    3,
+    5,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    5000,
+    10000,
+    25000,
+    UNLIMITED
+]
+
+
+class PlaybackPacer:
+    """
+    decides how many whole vm cycles are applied in one display frame
+    cycles are owed at the target rate of current speed,
+    but applying them never takes longer than frame budget
+    """
+
+    def __init__(self, frame_budget_ms=12):
+        self.frame_budget = frame_budget_ms / 1000
+        self.speed = 0
+        self.credit = 0.0  # cycles owed, fractional at low speeds
+        self.last_frame_time = None
+        self.frame_start = 0.0
+
+    @property
+    def cycles_per_second(self):
+        return speeds[self.speed]
+
+    def label(self):
+        cps = self.cycles_per_second
+        return "max" if cps == UNLIMITED else str(cps)
+
+    def start_frame(self):
+        """returns how many cycles should be applied this frame"""
+        now = time.perf_counter()
+        self.frame_start = now
+
+        if self.last_frame_time is None:
+            # first frame after start or pause
+            self.last_frame_time = now
+            self.credit = 1.0
+        else:
+            elapsed = now - self.last_frame_time
+            self.last_frame_time = now
+            self.credit += elapsed * self.cycles_per_second
+
+        if self.cycles_per_second == UNLIMITED:
+            return float("inf")
+
+        # do not try to catch up after long stalls
+        self.credit = min(self.credit, max(1.0, self.cycles_per_second / 4))
+
+        return int(self.credit)
+
+    def within_budget(self):
+        return time.perf_counter() - self.frame_start < self.frame_budget
+
+    def end_frame(self, cycles_applied: int, starved: bool):
+        """starved - ran out of data, cycles owed are forgotten"""
+        if starved or self.cycles_per_second == UNLIMITED:
+            self.credit = 0.0
+        else:
+            self.credit = max(0.0, self.credit - cycles_applied)
+
+    def reset(self):
+        self.last_frame_time = None
+        self.credit = 0.0
+
+    def slow_down(self):
+        if self.speed > 0:
+            self.speed -= 1
+
+    def speed_up(self):
+        if self.speed < len(speeds) - 1:
+            self.speed += 1
+
+    def set_speed(self, speed: int):
+        self.speed = max(0, min(speed, len(speeds) - 1))
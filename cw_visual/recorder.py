@@ -0,0 +1,68 @@
+import atexit
+import gzip
+import lzma
+import queue
+import threading
+
+
+# buffer of plain recordings, compressed ones are buffered by their compressor
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# recording file suffix -> opener of compressed file, options of compressor
+# fast levels are used, recording competes for cpu with the visualizer
+compressed_openers = {
+    ".gz": (gzip.open, {"compresslevel": 3}),
+    ".xz": (lzma.open, {"preset": 1}),
+}
+
+
+def open_recording(path: str):
+    """opens raw recording for writing, compressed if path ends with .gz or .xz"""
+    for suffix, (opener, options) in compressed_openers.items():
+        if path.endswith(suffix):
+            return opener(path, "wb", **options)
+
+    return open(path, "wb", buffering=WRITE_BUFFER_SIZE)
+
+
+class RawRecorder:
+    """
+    writes every byte of the input stream to a file as it was received,
+    so the stream can be replayed later (see stdin_listener.file_batches)
+    chunks are handed over to a background thread, the reader never waits for disk
+    """
+
+    def __init__(self, path: str):
+        self.file = open_recording(path)
+        self.chunks = queue.SimpleQueue()
+        self.closed = False
+
+        self.thread = threading.Thread(target=self.write_chunks)
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+        # the rest of the stream is written even if the app exits before the stream ends
+        atexit.register(self.close)
+
+    def write(self, chunk: bytes):
+        self.chunks.put(chunk)
+
+    def write_chunks(self):
+        while True:
+            chunk = self.chunks.get()
+
+            if chunk is None:
+                break
+
+            self.file.write(chunk)
+
+        self.file.close()
+
+    def close(self):
+        """writes what is left and closes the file, waits for the writer thread"""
+        if self.closed:
+            return
+
+        self.closed = True
+        self.chunks.put(None)
+        self.thread.join()
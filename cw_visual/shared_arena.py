@@ -0,0 +1,134 @@
+import os
+import threading
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from cw_visual.arena import Arena, MEM_SIZE, ROW_WIDTH, MAX_PLAYERS
+
+
+# per-frame change lists kept in the ring, the worker fills the next slot while gui draws the previous one
+RING_SLOTS = 4
+
+# addresses one slot holds, a frame changing more cells is drawn from scratch
+RING_SLOT_CELLS = 256 * 1024
+
+
+def block_layout(size: int):
+    """offsets of values, owners and cursor counts in the block, and the size of the block"""
+    counts_offset = (2 * size + 7) // 8 * 8  # cursor counts are aligned to their item size
+    return 0, size, counts_offset, counts_offset + size * MAX_PLAYERS * 4
+
+
+class SharedArena(Arena):
+    """
+    arena whose arrays live in one shared memory block, so another process maps them without copying
+    the worker process updates the arena, gui process only reads it (see worker.py)
+
+    resizing creates a new block, the other process maps it by name with attach
+    a block is unlinked by the process that created it, once it is not used anymore
+    """
+
+    def __init__(self, size=MEM_SIZE, row_width=ROW_WIDTH):
+        self.block = None
+        self.block_pid = None  # process that created the block
+        super().__init__(size, row_width)
+
+    @property
+    def block_name(self):
+        return self.block.name
+
+    def allocate(self):
+        # new shared memory is zero filled
+        block = SharedMemory(create=True, size=block_layout(self.size)[-1])
+        self.map(block, os.getpid())
+
+    def attach(self, name: str, geometry):
+        """maps the block created by another process with arena of the geometry"""
+        self.size, self.row_width = geometry
+        self.rows = self.size // self.row_width
+
+        self.map(attach_block(name), None)
+
+    def map(self, block: SharedMemory, block_pid):
+        values_offset, owners_offset, counts_offset, _ = block_layout(self.size)
+        old_block, old_pid = self.block, self.block_pid
+
+        self.values = np.ndarray(self.size, dtype=np.uint8, buffer=block.buf, offset=values_offset)
+        self.owners = np.ndarray(self.size, dtype=np.uint8, buffer=block.buf, offset=owners_offset)
+        self.cursor_counts = np.ndarray(
+            (self.size, MAX_PLAYERS), dtype=np.uint32, buffer=block.buf, offset=counts_offset)
+
+        self.block, self.block_pid = block, block_pid
+
+        if old_block is not None:
+            release(old_block, old_pid)
+
+    def close(self):
+        """unmaps the block, it is unlinked if this process created it"""
+        if self.block is None:
+            return
+
+        block, pid = self.block, self.block_pid
+        self.block = self.block_pid = None
+        self.values = self.owners = self.cursor_counts = None
+
+        release(block, pid)
+
+
+# guards resource_tracker.register while it is disabled by attach_block
+untracked_lock = threading.Lock()
+
+
+def attach_block(name: str) -> SharedMemory:
+    """
+    maps a block created by another process without registering it with the resource tracker,
+    only the creator unlinks the block, the tracker of the attaching process would unlink it too or warn about a leak
+    before python 3.13 attaching always registers, unregistering afterwards is no way out:
+    a forked worker shares the tracker with gui, it would forget the creator's registration instead
+    """
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        pass  # python < 3.13
+
+    with untracked_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+
+        try:
+            return SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def release(block: SharedMemory, block_pid):
+    block.close()
+
+    if block_pid == os.getpid():
+        block.unlink()
+
+
+class ChangeRing:
+    """
+    ring of slots in shared memory, a slot holds addresses of cells changed in one frame
+    created before the worker process is forked, so both processes map it already,
+    the worker never attaches it by name and never registers it with the resource tracker
+    """
+
+    def __init__(self, slots=RING_SLOTS, slot_cells=RING_SLOT_CELLS):
+        self.slots = slots
+        self.slot_cells = slot_cells
+        self.pid = os.getpid()
+
+        self.block = SharedMemory(create=True, size=slots * slot_cells * 4)
+        self.cells = np.ndarray((slots, slot_cells), dtype=np.int32, buffer=self.block.buf)
+
+    def slot(self, seq: int):
+        """addresses of the slot for frame number seq"""
+        return self.cells[seq % self.slots]
+
+    def close(self):
+        self.cells = None
+        release(self.block, self.pid)
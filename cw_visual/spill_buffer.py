@@ -0,0 +1,121 @@
+import pickle
+import struct
+import tempfile
+import threading
+from collections import deque
+
+from cw_visual.cycle_batcher import CycleBatch
+
+
+# estimated bytes of batches kept in memory, batches arriving while the window is full go to disk
+MEMORY_BYTES = 32 * 1024 * 1024
+
+# estimated size of an event tuple with its fields and its slot in the batch list,
+# writes of the vm are a few bytes, so the size of events hardly depends on their payload
+EVENT_BYTES = 200
+
+RECORD_HEADER = struct.Struct("<I")  # length of pickled batch
+
+
+class SpillBuffer:
+    """
+    fifo of cycle batches between the reader and gui, put never blocks
+    so a paused or slow visualizer does not stall the vm writing to the pipe
+
+    a window of batches bounded by their estimated size is kept in memory, overflow is appended to a temp file
+    and read back sequentially once the window is drained,
+    the file is truncated whenever everything spilled has been read back and batches go to memory again
+
+    there is one consumer calling get: it reads the file outside of lock,
+    so the producer only waits for disk while spilling
+    """
+
+    def __init__(self, memory_bytes=MEMORY_BYTES):
+        self.memory_bytes = memory_bytes
+        self.lock = threading.Lock()  # guards everything but reads of the file
+        self.file_lock = threading.Lock()  # guards seek and read or write of the file, taken after lock
+
+        self.window = deque()
+        self.window_bytes = 0
+
+        self.file = None  # created on first spill
+        self.write_pos = 0
+        self.read_pos = 0
+        self.spilled = 0  # batches in file not read back yet
+
+    def put(self, batch: CycleBatch):
+        size = len(batch.events) * EVENT_BYTES
+
+        with self.lock:
+            # once spilling started newer batches go to disk too, to keep the order
+            if self.spilled or self.window_bytes + size > self.memory_bytes and self.window:
+                self.spill(batch)
+            else:
+                self.window.append(batch)
+                self.window_bytes += size
+
+    def get(self):
+        """next batch, None if the buffer is empty"""
+        with self.lock:
+            if self.window:
+                batch = self.window.popleft()
+                self.window_bytes -= len(batch.events) * EVENT_BYTES
+                return batch
+
+            if not self.spilled:
+                return None
+
+            read_pos = self.read_pos
+
+        return self.read_back(read_pos)
+
+    def empty(self):
+        with self.lock:
+            return not (self.window or self.spilled)
+
+    def __len__(self):
+        with self.lock:
+            return len(self.window) + self.spilled
+
+    def spill(self, batch: CycleBatch):
+        if self.file is None:
+            self.file = tempfile.TemporaryFile(prefix="cw_visual_")
+
+        data = pickle.dumps(tuple(batch), pickle.HIGHEST_PROTOCOL)
+
+        with self.file_lock:
+            self.file.seek(self.write_pos)
+            self.file.write(RECORD_HEADER.pack(len(data)))
+            self.file.write(data)
+            self.write_pos = self.file.tell()
+
+        self.spilled += 1
+
+    def read_back(self, read_pos: int):
+        """reads the record at read_pos, it is written completely as it is counted in spilled"""
+        with self.file_lock:
+            self.file.seek(read_pos)
+            length, = RECORD_HEADER.unpack(self.file.read(RECORD_HEADER.size))
+            data = self.file.read(length)
+
+        batch = CycleBatch(*pickle.loads(data))
+
+        with self.lock:
+            self.read_pos = read_pos + RECORD_HEADER.size + length
+            self.spilled -= 1
+
+            if not self.spilled:
+                # everything spilled is read back, the next batches are kept in memory and disk space is reused
+                with self.file_lock:
+                    self.file.truncate(0)
+
+                self.write_pos = 0
+                self.read_pos = 0
+
+        return batch
+
+    def close(self):
+        with self.lock, self.file_lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
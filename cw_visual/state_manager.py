@@ -1,27 +1,25 @@
-from typing import Dict
+from typing import List
+from array import array
+from collections import namedtuple
+from contextlib import contextmanager
 
 from cw_visual.colors import *
+from cw_visual.arena import Arena
+from cw_visual.coalescer import ChangeCoalescer
 
 
-class Carriage:
-    def __init__(self, brush, addr=0):
-        self.i = 0
-        self.j = 0
-        self.addr = addr
-        self.brush = brush
+# state of players and cursors at some cycle, see CorewarStateManager.snapshot
+ManagerSnapshot = namedtuple(
+    "ManagerSnapshot", ["arena", "players", "cursor_addr", "cursor_player", "winner", "size"])
 
-    @property
-    def addr(self):
-        return self._addr
+FREE_SLOT = -1  # cursor_player value of a slot without cursor
 
-    @addr.setter
-    def addr(self, value):
-        self._addr = value % 4096
 
-        self.i = self._addr % 64
-        self.j = self._addr // 64
+class NullView:
+    """view that draws nothing, used while state is updated without rendering"""
 
-        self.pos = self.i, self.j
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
 
 
 class Player:
@@ -31,106 +29,208 @@ class Player:
         self.pen = pen
         self.brush = brush
 
-        self.cursors: Dict[str, Carriage] = dict()
+        self.cursors_count = 0
 
-    def write_bytes(self, addr, bytes_str, view):
-        view.write_bytes(addr, bytes_str, self.pen)
+    def write_bytes(self, addr, data, arena):
+        arena.write(addr, data, self.number)
 
 
 class CorewarStateManager:
     """
     represents current state of memory, players and cursors.
+    memory and cursor occupancy are kept in the arena,
     uses view to draw the state
-    """
 
-    def __init__(self, view):
-        self.view = view
-        self.players: Dict[str, Player] = dict()
-        self.cursors_field = create_cursor_field(64*64)
+    players are addressed by player number, cursors by carriage slot,
+    both are small integers external ids are interned into as the events are read, see IdInterner
+    cursor state is kept in arrays indexed by slot, slots of killed cursors are reused by the interner
 
-    def add_player(self, id, name):
-        if name in self.players:
-            raise Exception(name + " player already exists")
+    cursor occupancy of the arena and the view are updated only on flush,
+    changes made since the last flush are coalesced, see ChangeCoalescer
+    """
 
+    def __init__(self, view, arena: Arena):
+        self.view = view
+        self.arena = arena
+        self.initial_geometry = arena.geometry  # restored by reset
+        self.players: List[Player] = []
+        self.cursor_addr = array("i")  # slot -> address
+        self.cursor_player = array("i")  # slot -> player number, FREE_SLOT for unused slot
+        self.winner = None  # player number
+        self.changes = ChangeCoalescer()
+
+    def add_player(self, name) -> int:
+        """returns number of the new player"""
         player_number = len(self.players)
 
-        self.players[id] = Player(
-            player_number, name, next(next_pen), next(next_brush)
+        player = Player(
+            player_number, name,
+            pens[player_number % len(pens)], brushes[player_number % len(brushes)]
         )
 
+        self.players.append(player)
+
         self.view.add_player(name[:8])
 
-    def add_cursor(self, player_id, carriage_id, addr):
-        player: Player = self.players[player_id]
+        return player_number
+
+    def add_cursor(self, player_number, slot, addr):
+        """slot is a free one given by IdInterner, arrays grow up to it"""
+        player: Player = self.players[player_number]
+
+        if slot >= len(self.cursor_addr):
+            grow = slot + 1 - len(self.cursor_addr)
+            self.cursor_addr.extend([0] * grow)
+            self.cursor_player.extend([FREE_SLOT] * grow)
+
+        self.cursor_addr[slot] = addr % self.arena.size
+        self.cursor_player[slot] = player_number
+
+        self.changes.cursor_added(slot, player_number)
+        player.cursors_count += 1
+
+    def kill_cursor(self, slot):
+        player: Player = self.players[self.cursor_player[slot]]
+
+        self.changes.cursor_killed(slot, self.cursor_addr[slot], player.number)
+
+        self.cursor_player[slot] = FREE_SLOT
+
+        player.cursors_count -= 1
+
+    def move_cursor(self, slot, num_bytes):
+        addr = self.cursor_addr[slot]
 
-        if carriage_id in player.cursors:
-            raise Exception(carriage_id + " carriage already exists")
+        self.changes.cursor_changed(slot, addr, self.cursor_player[slot])
 
-        new_cursor = Carriage(player.brush, addr=addr)
-        player.cursors[carriage_id] = new_cursor
+        self.cursor_addr[slot] = (addr + num_bytes) % self.arena.size
 
-        self.view.draw_cursor_rect(
-            new_cursor.pos, player.brush, new_cursor.addr)
+    def write_bytes(self, player_number, addr, data: bytes):
+        player: Player = self.players[player_number]
 
-        self.view.set_cursor_count(player.number, len(player.cursors))
+        player.write_bytes(addr, data, self.arena)
+        self.changes.cells_written(addr, len(data), self.arena.size)
 
-        # store reference to cursor in the field
-        self.cursors_field[new_cursor.addr].append(new_cursor)
+    def flush(self):
+        """applies coalesced cursor moves to the arena and draws all changed cells once"""
+        if self.changes.is_empty():
+            return
 
-    def kill_cursor(self, player_id, carriage_id):
-        player: Player = self.players[player_id]
-        cursor = player.cursors[carriage_id]
+        cursor_origins, written_cells, touched_players = self.changes.take()
+        cursor_cells = set()
 
-        del player.cursors[carriage_id]
+        for slot, origin in cursor_origins.items():
+            player_number = self.cursor_player[slot]
+            final = None if player_number == FREE_SLOT else (self.cursor_addr[slot], player_number)
 
-        self.view.erase_cursor_rect(cursor.pos)
+            if origin == final:
+                continue  # moved back to where it was or added and killed
 
-        self.view.set_cursor_count(player.number, len(player.cursors))
+            if origin is not None:
+                self.arena.remove_cursor(*origin)
+                cursor_cells.add(origin[0])
 
-        # remove reference to cursor from the field
-        self.cursors_field[cursor.addr].remove(cursor)
+            if final is not None:
+                self.arena.add_cursor(*final)
+                cursor_cells.add(final[0])
 
-    def move_cursor(self, player_id, carriage_id, num_bytes):
-        player_this: Player = self.players[player_id]
-        cursor_this: Carriage = player_this.cursors[carriage_id]
+        self.view.redraw_cells(written_cells)
 
-        repaint_cursor = False
+        # cursors show the byte below them, so rewritten bytes under cursors are redrawn too
+        if written_cells:
+            written = list(written_cells)
+            cursor_cells.update(addr for addr, occupied in zip(written, self.arena.occupied(written)) if occupied)
 
-        # remove reference to cursor from current occupied cell
-        self.cursors_field[cursor_this.addr].remove(cursor_this)
+        self.view.redraw_cursor_cells(cursor_cells)
 
-        if len(self.cursors_field[cursor_this.addr]):
-            repaint_cursor = True
-            brush = self.cursors_field[cursor_this.addr][0].brush
+        for player_number in touched_players:
+            self.view.set_cursor_count(player_number, self.players[player_number].cursors_count)
 
-        # erase cursor from old pos
-        if repaint_cursor:
-            self.view.draw_cursor_rect(
-                cursor_this.pos, brush, cursor_this.addr)
+    def set_geometry(self, mem_size, row_width):
+        """
+        allocates arena of vm memory size, must come before players and cursors are added,
+        memory written so far is cleared
+        """
+        if self.arena.geometry == (mem_size, row_width):
+            return
+
+        self.arena.resize(mem_size, row_width)
+        self.changes = ChangeCoalescer()  # addresses of pending changes belong to old memory
+
+        self.view.redraw_arena()
+
+    def reset(self):
+        """
+        empty state without players in the geometry the manager was created with, drawn from scratch,
+        e.g. when another vm stream starts
+        """
+        self.players = []
+        self.cursor_addr = array("i")
+        self.cursor_player = array("i")
+        self.winner = None
+        self.changes = ChangeCoalescer()
+
+        if self.arena.geometry == self.initial_geometry:
+            self.arena.clear()
         else:
-            self.view.erase_cursor_rect(cursor_this.pos)
+            self.arena.resize(*self.initial_geometry)
+
+        self.view.reset_players()
+        self.view.redraw_arena()
+
+    def declare_winner(self, player_number):
+        self.winner = player_number
+        self.view.declare_winner(player_number)
+
+    @contextmanager
+    def view_suppressed(self):
+        """updates state inside the block without drawing anything"""
+        view = self.view
+        self.view = NullView()
+
+        try:
+            yield
+        finally:
+            self.view = view
+
+    def snapshot(self) -> ManagerSnapshot:
+        players = [(player.name, player.cursors_count) for player in self.players]
+
+        cursor_addr = array("i", self.cursor_addr)
+        cursor_player = array("i", self.cursor_player)
+
+        size = (self.arena.snapshot_size() + cursor_addr.itemsize * len(cursor_addr) +
+                cursor_player.itemsize * len(cursor_player))
+
+        return ManagerSnapshot(self.arena.snapshot(), players, cursor_addr, cursor_player, self.winner, size)
+
+    def restore(self, snapshot: ManagerSnapshot):
+        """brings state back to the snapshot, view is redrawn with redraw_state"""
+        self.arena.restore(snapshot.arena)
+
+        self.players = []
 
-        cursor_this.addr += num_bytes
+        for number, (name, cursors_count) in enumerate(snapshot.players):
+            player = Player(
+                number, name, pens[number % len(pens)], brushes[number % len(brushes)])
+            player.cursors_count = cursors_count
 
-        # draw cursor at new pos
-        self.view.draw_cursor_rect(
-            cursor_this.pos, player_this.brush, cursor_this.addr)
+            self.players.append(player)
 
-        # add reference to cursor to newly occupied cell 
-        self.cursors_field[cursor_this.addr].append(cursor_this)
+        self.cursor_addr = array("i", snapshot.cursor_addr)
+        self.cursor_player = array("i", snapshot.cursor_player)
+        self.winner = snapshot.winner
+        self.changes = ChangeCoalescer()  # changes made after the snapshot are void
 
-    def write_bytes(self, player_id, addr, bytes_str):
-        player: Player = self.players[player_id]
+    def redraw_state(self):
+        """draws current state from scratch"""
+        self.view.reset_players()
 
-        player.write_bytes(addr, bytes_str, self.view)
+        for player in self.players:
+            self.view.add_player(player.name[:8])
+            self.view.set_cursor_count(player.number, player.cursors_count)
 
-    def declare_winner(self, player_id):
-        player: Player = self.players[player_id]
-        self.view.declare_winner(player.number)
+        if self.winner is not None:
+            self.view.declare_winner(self.winner)
 
-def create_cursor_field(cells_count):
-    l = []
-    for _ in range(cells_count):
-        l.append([])
-    
-    return l
\ No newline at end of file
+        self.view.redraw_arena()
@@ -1,142 +1,425 @@
+import os
 import sys
+import time
 import threading
-import queue
-import re
+from typing import List
 
-from PySide2.QtCore import QTimer
+from PySide2.QtCore import QTimer, QSocketNotifier
 
+from cw_visual.playback import PlaybackPacer
+from cw_visual.cycle_batcher import CycleBatch, NEW_STREAM_CYCLE
+from cw_visual.stream_decoder import StreamDecoder
+from cw_visual.spill_buffer import SpillBuffer
+from cw_visual.perf_stats import counters
 
-# queue between stdin reader and consumer
-# setting size prevets reading all the data from stdin at once and allocating huge buffer for long game
-# otherwise buffer allocating ~5kk lines is usual thing to happen
-MAX_QUEUE_SIZE = 200
+# bytes read from stdin at once
+READ_CHUNK_SIZE = 64 * 1024
 
 
-def extract_cycle(line: str):
-    m = re.search(r'(?<=")\d+(?=")', line)
-    cycle = m.group()
-    return cycle
+def stream_batches(stream, recorder=None):
+    """
+    yields complete cycle batches read from binary stream in large chunks,
+    gzip or xz compressed stream is decompressed on the fly, see StreamDecoder
+    every chunk read is passed to recorder (see RawRecorder) if it is given
+    """
+    decoder = StreamDecoder()
+
+    while True:
+        chunk = stream.read1(READ_CHUNK_SIZE)  # this is blocked until data in stream available
+
+        if not chunk:
+            break
+
+        if recorder:
+            recorder.write(chunk)
+
+        yield from decoder.feed(chunk)
+
+    if recorder:
+        recorder.close()
+
+    yield from decoder.finish()
+
+    print(decoder.throughput_report())
+
+
+def stdin_batches(recorder=None):
+    return stream_batches(sys.stdin.buffer, recorder)
+
+
+def file_batches(path: str):
+    """batches of vm output saved to a file, e.g. by RawRecorder, plain or compressed"""
+    return stream_batches(open(path, "rb"))
+
+
+def recorded(batches, trace_writer):
+    """passes batches through, writing every batch to trace"""
+    try:
+        for batch in batches:
+            trace_writer.write_batch(batch)
+            yield batch
+    finally:
+        trace_writer.close()
+
+
+class NonBlockingReader:
+    """
+    reads whatever is available on a file descriptor without blocking,
+    used from gui thread when the descriptor becomes readable, see StdinListener
+    batches read are written to trace_writer and raw bytes to recorder if they are given
+    """
+
+    def __init__(self, fd: int, trace_writer=None, recorder=None):
+        self.fd = fd
+        self.trace_writer = trace_writer
+        self.recorder = recorder
+        self.decoder = StreamDecoder()
+        self.eof = False
+
+        os.set_blocking(fd, False)
+
+    def read_available(self) -> List[CycleBatch]:
+        batches = []
+
+        while not self.eof:
+            try:
+                chunk = os.read(self.fd, READ_CHUNK_SIZE)
+            except BlockingIOError:
+                break
 
+            if not chunk:
+                self.eof = True
+                batches += self.decoder.finish()
 
-delays = [
-    1000,
-    750,
-    500,
-    300,
-    200,
-    100,
-    50,
-    10,
-    1
-]
+                if self.recorder:
+                    self.recorder.close()
+
+                print(self.decoder.throughput_report())
+            else:
+                if self.recorder:
+                    self.recorder.write(chunk)
+
+                batches += self.decoder.feed(chunk)
+
+        if self.trace_writer:
+            for batch in batches:
+                self.trace_writer.write_batch(batch)
+
+            if self.eof:
+                self.trace_writer.close()
+
+        return batches
+
+
+# display frame interval
+FRAME_INTERVAL_MS = 1000 // 60
+
+# time spent fast forwarding in one timer tick, ui stays responsive between ticks
+FAST_FORWARD_FRAME_MS = 40
 
 
 class StdinListener:
     """
-    1) runs a thread that reads stdin in parallel and puts any data read into a queue
-    2) runs a timer in gui thread that periodically checks the queue
-       and if theres some data -> calls the callback with lines belonging to one cycle of corewar vm
+    1) runs a thread that reads stdin in parallel in large chunks,
+       parses it into events and puts events of every complete cycle into a queue
+       the queue never blocks the reader, overflow is spilled to disk (see SpillBuffer),
+       so the vm writing to stdin is never stalled by the visualizer
+       any other iterable of cycle batches (e.g. TraceReader) can be passed as source instead of stdin
+       batches already played (see Timeline.next_redo) are taken from history before the queue
+       restart replaces the source, e.g. by a trace read from another cycle
+    2) runs a timer in gui thread that checks the queue every display frame
+       and if theres some data -> calls the callback with events belonging to one cycle of corewar vm
+       as many times per frame as playback pacer allows
        on first run calls callback with "start" as a notification about data having started arriving on stdin
+       after the cycles of a frame are applied calls frame_applied once, e.g. to draw coalesced changes
+       when another vm stream starts (see ListenServer) calls callback with "new stream" instead of a cycle
+
+    fast_forward applies cycles up to the target as fast as they are read, ignoring pause and pacer,
+    it is up to the callback not to draw them, fast_forward_done is called at the target
+
+    if source is NonBlockingReader there is no reader thread and no polling:
+    a socket notifier reads the descriptor in gui thread as soon as it is readable
+    and the timer runs only while there are cycles to play
     """
 
-    def __init__(self, callback, check_interval_ms=1000):
+    def __init__(self, callback, check_interval_ms=FRAME_INTERVAL_MS, source=None, history=None,
+                 frame_applied=None):
         self.callback = callback
+        self.frame_applied = frame_applied
+        self.source = source if source is not None else stdin_batches()
+        self.history = history
         self.read_started = False
-        self.line_next_cycle: str = None
-        self.last_cycle: int = 0
-        self.speed = 0
+        self.pacer = PlaybackPacer()
 
         self.timer = QTimer()
         self.timeout = check_interval_ms
         self.timer.timeout.connect(self.read_queue)
 
-        self.stdin_line_queue = queue.Queue(MAX_QUEUE_SIZE)
-        self.parallel_reader = threading.Thread(
-            target=self.parallel_read_stdin, args=(self.stdin_line_queue,))
+        self.starved = False
+        self.notifier = None
+
+        self.fast_forward_target = None
+        self.fast_forward_done = None
+        self.held_batch = None  # read past the fast forward target, played next
+
+        self.cycle_queue = SpillBuffer()
+
+        if isinstance(self.source, NonBlockingReader):
+            self.notifier = QSocketNotifier(self.source.fd, QSocketNotifier.Read)
+            self.notifier.setEnabled(False)
+            self.notifier.activated.connect(self.read_available)
+            return
+
+        self.stop_reading = threading.Event()
+        self.parallel_reader = self.reader_thread()
+
+    def reader_thread(self):
+        thread = threading.Thread(
+            target=self.parallel_read_stdin, args=(self.cycle_queue, self.source, self.stop_reading))
+
+        thread.setDaemon(True)  # kill when main pocess exits
+        return thread
+
+    def parallel_read_stdin(self, q: SpillBuffer, source, stop: threading.Event):
+        """read source in parallel thread and put complete cycle batches into the queue"""
+        for batch in source:
+            if stop.is_set():
+                break
+
+            q.put(batch)
+            counters.events_ingested += len(batch.events)
+
+    def restart(self, source):
+        """
+        reads source from now on instead of the rest of the current one, not with NonBlockingReader
+        cycles read but not played yet are dropped, the old reader thread stops at its next batch
+        """
+        self.stop_reading.set()
+        self.stop_reading = threading.Event()
+
+        self.source = source
+        self.cycle_queue = SpillBuffer()
+        self.held_batch = None
+
+        self.parallel_reader = self.reader_thread()
+        self.parallel_reader.start()
 
-        self.parallel_reader.setDaemon(True)  # kill when main pocess exits
+    def read_available(self):
+        """called by socket notifier when source is readable"""
+        batches = self.source.read_available()
 
-    def parallel_read_stdin(self, q: queue):
-        """read line from stdin in parallel thread and put line read into the queue"""
-        for line in sys.stdin:  # this is blocked until data in stdin available
-            self.stdin_line_queue.put(line.rstrip())
+        for batch in batches:
+            self.cycle_queue.put(batch)
+            counters.events_ingested += len(batch.events)
+
+        if batches and not self.read_started:
+            self.callback(0, "start")
+            self.read_started = True
+
+        if self.source.eof:
+            self.notifier.setEnabled(False)
+
+        if batches:
+            self.wake()
+
+    def wake(self):
+        """plays new data at once and keeps the timer running while there is something to play"""
+        if not self.notifier or self.timer.isActive():
+            return
+
+        if self.paused and not self.fast_forwarding:
+            return
+
+        self.tick()
+        self.timer.start(self.timeout)
 
     def start_paused(self):
         """start timer and start the thread"""
         self.paused = True
+
+        if self.notifier:
+            self.notifier.setEnabled(True)
+            return
+
         self.timer.start(self.timeout)
         self.parallel_reader.start()
 
     def read_queue(self):
         """
-        attempts to read from stdin queue and sends data to callback with all lines for one cycle
+        attempts to read from cycle queue and sends data to callback with all events for one cycle
         """
         # sends "start" notification on first run whe some data arrives from stdin
         if not self.read_started:
-            if not self.stdin_line_queue.empty():
+            if not self.cycle_queue.empty():
                 self.callback(0, "start")
                 self.read_started = True
 
-        if(not self.paused):
-            self.read_next_cycle()
+        self.tick()
+
+        if self.notifier and (self.paused and not self.fast_forwarding or self.starved):
+            self.timer.stop()  # woken again by new data or unpausing
+
+    def tick(self):
+        if self.fast_forwarding:
+            self.fast_forward_frame()
+        elif not self.paused:
+            self.play_frame()
+
+    def play_frame(self):
+        """applies as many whole cycles as pacer allows this frame"""
+        cycles_due = self.pacer.start_frame()
+        applied = 0
+        starved = False
+        start = time.perf_counter()
+
+        while applied < cycles_due and self.pacer.within_budget():
+            if not self.apply_next_cycle():
+                starved = True
+                break
+
+            applied += 1
+
+        counters.add_time("apply", start)
+
+        if applied:
+            self.end_frame()
+
+        self.pacer.end_frame(applied, starved)
+        self.starved = starved
+
+    def end_frame(self):
+        start = time.perf_counter()
+
+        if self.frame_applied:
+            self.frame_applied()
+
+        counters.add_time("draw", start)
 
     def read_next_cycle(self):
-        if not self.stdin_line_queue.empty() or self.line_next_cycle:
-            cycle, lines = self.get_lines_one_cycle()
-            self.callback(cycle, lines)
-
-    def get_lines_one_cycle(self):
-        """extracts all lines for one cycle, if next cycle occurs returns"""
-        current_cycle = None
-        lines = []
-
-        # pick up where we ended last time
-        if self.line_next_cycle:
-            lines.append(self.line_next_cycle)
-            current_cycle = extract_cycle(self.line_next_cycle)
-            self.line_next_cycle = None
-
-        while True:
-            try:
-                # parse cycle number from line
-                line = self.stdin_line_queue.get(block=False)
-                cycle = extract_cycle(line)
+        """applies one cycle as a frame of its own, returns False if there was no data"""
+        start = time.perf_counter()
+        applied = self.apply_next_cycle()
+        counters.add_time("apply", start)
 
-                if not current_cycle:
-                    current_cycle = cycle
+        if not applied:
+            return False
 
-                # remember current line as it belongs to next cycle
-                # and should be processed next time
-                if cycle != current_cycle:
-                    self.line_next_cycle = line
-                    break
+        self.end_frame()
+        return True
 
-                lines.append(line)
+    def apply_next_cycle(self):
+        """returns False if there was no data for the next cycle"""
+        batch = self.next_batch()
 
-            except queue.Empty:
-                break
+        if batch is None:
+            return False
+
+        if batch.cycle == NEW_STREAM_CYCLE:
+            self.callback(0, "new stream")
+            return True
+
+        self.callback(batch.cycle, batch.events)
+        counters.cycles_applied += 1
+        return True
 
-        return current_cycle, lines
+    def next_batch(self) -> CycleBatch:
+        batch = self.history.next_redo() if self.history else None
+
+        if batch is None and self.held_batch is not None:
+            batch, self.held_batch = self.held_batch, None
+
+        if batch is None:
+            batch = self.cycle_queue.get()
+
+        return batch
+
+    @property
+    def fast_forwarding(self):
+        return self.fast_forward_target is not None
+
+    def fast_forward(self, cycle: int, done=None):
+        """
+        applies all cycles up to the cycle without pacing, done(cycle) is called when it is reached,
+        waits for more data if the cycle has not been read yet
+        """
+        self.fast_forward_target = cycle
+        self.fast_forward_done = done
+        self.wake()
+
+    def fast_forward_frame(self):
+        start = time.perf_counter()
+        self.fast_forward_cycles(start + FAST_FORWARD_FRAME_MS / 1000)
+        counters.add_time("apply", start)
+
+    def fast_forward_cycles(self, deadline: float):
+        self.starved = False
+
+        while time.perf_counter() < deadline:
+            batch = self.next_batch()
+
+            if batch is None:
+                self.starved = True
+                return
+
+            if batch.cycle == NEW_STREAM_CYCLE:
+                # the target was a cycle of the previous stream
+                self.callback(0, "new stream")
+                self.stop_fast_forward()
+                return
+
+            if batch.cycle > self.fast_forward_target:
+                self.held_batch = batch
+                self.stop_fast_forward()
+                return
+
+            self.callback(batch.cycle, batch.events)
+            counters.cycles_applied += 1
+
+            if batch.cycle == self.fast_forward_target:
+                self.stop_fast_forward()
+                return
+
+    def stop_fast_forward(self):
+        """ends fast forward where it is now, e.g. when the target is not coming"""
+        if not self.fast_forwarding:
+            return
+
+        target, done = self.fast_forward_target, self.fast_forward_done
+        self.fast_forward_target = None
+        self.fast_forward_done = None
+        self.pacer.reset()
+
+        if done:
+            done(target)
 
     def set_interval(self, interval_ms):
         self.timeout = interval_ms
         self.timer.setInterval(interval_ms)
 
+    def queue_depth(self):
+        """cycles read but not played yet"""
+        return len(self.cycle_queue)
+
     def set_paused(self, paused=True):
         self.paused = paused
+        self.pacer.reset()
 
-    def slow_down(self):
-        if (self.speed > 0):
-            self.speed -= 1
+        if self.notifier and not paused:
+            self.wake()
 
-        self.set_interval(delays[self.speed])
+    def slow_down(self):
+        self.pacer.slow_down()
 
     def speed_up(self):
-        if (self.speed < len(delays) - 1):
-            self.speed += 1
-
-        self.set_interval(delays[self.speed])
+        self.pacer.speed_up()
 
     def set_speed(self, speed: int):
-        self.speed = speed
-        self.set_interval(delays[self.speed])
+        self.pacer.set_speed(speed)
+
+    @property
+    def speed(self):
+        return self.pacer.speed
+
+    def speed_label(self):
+        """cycles per second of current speed for ui"""
+        return self.pacer.label()
@@ -0,0 +1,172 @@
+import time
+import zlib
+import lzma
+from typing import List
+
+from cw_visual.cycle_batcher import CycleBatcher, CycleBatch
+from cw_visual.binary_protocol import BinaryDecoder, is_binary_stream, MAGIC
+from cw_visual.perf_stats import counters
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+XZ_MAGIC = b"\xfd7zXZ\x00"
+
+# bytes needed to tell compressed stream from plain one
+COMPRESSION_HEAD_SIZE = max(len(GZIP_MAGIC), len(XZ_MAGIC))
+
+
+def batcher_for_stream(head: bytes):
+    """picks text or binary protocol decoder by the first bytes of the stream"""
+    if is_binary_stream(head):
+        return BinaryDecoder()
+
+    return CycleBatcher()
+
+
+def decompressor_for_stream(head: bytes):
+    """gzip or xz decompressor by the first bytes of the stream, None for plain stream"""
+    if head.startswith(GZIP_MAGIC):
+        return zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+
+    if head.startswith(XZ_MAGIC):
+        return lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+
+    return None
+
+
+class StreamDecoder:
+    """
+    turns raw chunks of vm output into cycle batches
+    the stream may be gzip or xz compressed, it is decompressed chunk by chunk as it arrives,
+    then text or binary protocol is picked, both by the first bytes of the stream
+    counts bytes for throughput report, time spent is added to parse stage of perf counters
+    """
+
+    def __init__(self):
+        self.raw_head = b""  # first bytes until compression is known
+        self.compression_known = False
+        self.decompressor = None
+        self.member_head = b""  # first bytes of the next gzip member or xz stream
+        self.compressed_end = False  # the rest of the stream is garbage, it is skipped
+
+        self.head = b""  # first decompressed bytes until protocol is known
+        self.batcher = None
+
+        self.raw_bytes = 0
+        self.decoded_bytes = 0
+        self.start_time = None
+        self.end_time = None
+
+    def feed(self, chunk: bytes) -> List[CycleBatch]:
+        start = time.perf_counter()
+
+        if self.start_time is None:
+            self.start_time = start
+
+        self.raw_bytes += len(chunk)
+
+        if not self.compression_known:
+            self.raw_head += chunk
+
+            if len(self.raw_head) < COMPRESSION_HEAD_SIZE:
+                return []
+
+            chunk = self.start_decompression()
+
+        batches = self.feed_decoded(self.decompress(chunk))
+        counters.add_time("parse", start)
+
+        return batches
+
+    def finish(self) -> List[CycleBatch]:
+        """call at the end of stream to get the last cycle"""
+        batches = []
+
+        if not self.compression_known:
+            batches += self.feed_decoded(self.decompress(self.start_decompression()))
+
+        if self.member_head and not self.compressed_end:
+            self.skip_rest("garbage after compressed stream")
+
+        if self.batcher is None:
+            self.batcher = batcher_for_stream(self.head)
+            batches += self.batcher.feed(self.head)
+            self.head = b""
+
+        self.end_time = time.perf_counter()
+
+        return batches + self.batcher.finish()
+
+    def start_decompression(self):
+        """picks decompressor by the head, returns the head to be decompressed"""
+        self.compression_known = True
+        self.decompressor = decompressor_for_stream(self.raw_head)
+
+        head, self.raw_head = self.raw_head, b""
+        return head
+
+    def decompress(self, chunk: bytes):
+        if self.decompressor is None:
+            return chunk
+
+        data = b""
+
+        # concatenated gzip members and xz streams are decompressed one after another,
+        # each is picked by its own magic
+        while chunk and not self.compressed_end:
+            if self.decompressor.eof:
+                self.member_head += chunk
+
+                if len(self.member_head) < COMPRESSION_HEAD_SIZE:
+                    break
+
+                chunk, self.member_head = self.member_head, b""
+                decompressor = decompressor_for_stream(chunk)
+
+                if decompressor is None:
+                    self.skip_rest("garbage after compressed stream")
+                    break
+
+                self.decompressor = decompressor
+
+            try:
+                data += self.decompressor.decompress(chunk)
+            except (zlib.error, lzma.LZMAError) as e:
+                self.skip_rest(f"bad compressed data: {e}")
+                break
+
+            chunk = self.decompressor.unused_data if self.decompressor.eof else b""
+
+        return data
+
+    def skip_rest(self, reason: str):
+        """reported like malformed records of binary protocol, the rest of the stream is treated as its end"""
+        print(f"{reason}, the rest of the stream is skipped")
+        self.compressed_end = True
+        self.member_head = b""
+
+    def feed_decoded(self, data: bytes):
+        self.decoded_bytes += len(data)
+
+        if self.batcher is None:
+            self.head += data
+
+            if len(self.head) < len(MAGIC):
+                return []
+
+            self.batcher = batcher_for_stream(self.head)
+            data, self.head = self.head, b""
+
+        return self.batcher.feed(data)
+
+    def throughput_report(self):
+        end = self.end_time or time.perf_counter()
+        seconds = max(end - (self.start_time or end), 1e-9)
+        mb = 1024 * 1024
+
+        report = f"read {self.raw_bytes / mb:.1f} MB"
+
+        if self.decompressor is not None:
+            report += f" ({self.decoded_bytes / mb:.1f} MB decompressed)"
+
+        return report + f" in {seconds:.1f} s, {self.decoded_bytes / mb / seconds:.1f} MB/s"
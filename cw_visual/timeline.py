@@ -0,0 +1,149 @@
+import bisect
+from collections import deque
+from typing import List
+
+from cw_visual.cycle_batcher import CycleBatch
+from cw_visual.cw_parser import CorewarParser
+from cw_visual.state_manager import CorewarStateManager, ManagerSnapshot
+
+
+KEYFRAME_INTERVAL = 500  # cycles between keyframes
+MEMORY_LIMIT = 64 * 1024 * 1024  # bytes taken by keyframes and delta logs
+
+# rough memory taken by one logged event
+EVENT_SIZE = 120
+
+
+class Segment:
+    """keyframe of the state at some cycle and the batches applied after it"""
+
+    def __init__(self, cycle: int, snapshot: ManagerSnapshot):
+        self.cycle = cycle
+        self.snapshot = snapshot
+        self.log: List[CycleBatch] = []
+        self.size = snapshot.size
+
+
+class Timeline:
+    """
+    remembers played cycles so that playback can be moved to any of them, backwards too
+    every KEYFRAME_INTERVAL cycles the state is snapshotted into a keyframe,
+    batches between keyframes are kept in delta logs
+    seeking restores the nearest keyframe before the target and replays its delta log
+    the oldest keyframes are dropped when memory limit is reached
+    """
+
+    def __init__(self, parser: CorewarParser, manager: CorewarStateManager,
+                 keyframe_interval=KEYFRAME_INTERVAL, memory_limit=MEMORY_LIMIT):
+        self.parser = parser
+        self.manager = manager
+        self.keyframe_interval = keyframe_interval
+        self.memory_limit = memory_limit
+
+        self.segments: List[Segment] = []
+        self.size = 0
+        self.live_cycle = None  # last cycle ever read from the source
+        self.position = None  # cycle the state currently corresponds to
+
+        # already recorded batches to be played after seeking backwards
+        self.redo = deque()
+
+    @property
+    def first_cycle(self):
+        """the earliest cycle that can be restored"""
+        return self.segments[0].cycle if self.segments else None
+
+    def apply(self, cycle: int, events: list):
+        self.parser.apply_events(events)
+        self.position = cycle
+
+        if self.live_cycle is not None and cycle <= self.live_cycle:
+            return  # replayed from history, already recorded
+
+        self.live_cycle = cycle
+        self.record(CycleBatch(cycle, events))
+
+    def record(self, batch: CycleBatch):
+        if self.segments:
+            segment = self.segments[-1]
+            segment.log.append(batch)
+
+            size = len(batch.events) * EVENT_SIZE
+            segment.size += size
+            self.size += size
+
+        if not self.segments or batch.cycle - self.segments[-1].cycle >= self.keyframe_interval:
+            self.add_keyframe(batch.cycle)
+
+        self.drop_old_segments()
+
+    def add_keyframe(self, cycle: int):
+        self.manager.flush()  # snapshot must not miss pending changes
+        segment = Segment(cycle, self.manager.snapshot())
+        self.segments.append(segment)
+        self.size += segment.size
+
+    def drop_old_segments(self):
+        # the latest segment is always kept
+        while self.size > self.memory_limit and len(self.segments) > 1:
+            segment = self.segments.pop(0)
+            self.size -= segment.size
+
+    def next_redo(self):
+        """next batch to play after seeking backwards, None if playback is at the live cycle"""
+        if self.redo:
+            return self.redo.popleft()
+
+        return None
+
+    def seek(self, cycle: int):
+        """moves state to the cycle, returns the cycle actually restored"""
+        if not self.segments:
+            return self.position
+
+        cycle = max(self.first_cycle, min(cycle, self.live_cycle))
+
+        keyframe_cycles = [segment.cycle for segment in self.segments]
+        i = bisect.bisect_right(keyframe_cycles, cycle) - 1
+
+        self.manager.restore(self.segments[i].snapshot)
+        self.redo = deque()
+
+        with self.manager.view_suppressed():
+            for segment in self.segments[i:]:
+                for batch in segment.log:
+                    if batch.cycle <= cycle:
+                        self.parser.apply_events(batch.events)
+                    else:
+                        self.redo.append(batch)
+
+            self.manager.flush()
+
+        self.position = cycle
+        self.manager.redraw_state()
+
+        return cycle
+
+    def jump(self, cycle: int, snapshot: ManagerSnapshot):
+        """
+        moves state to a keyframe taken elsewhere, e.g. read from a trace, and starts history over from it
+        batches after the keyframe are to be read from the source again, view is redrawn with redraw_state
+        """
+        self.manager.restore(snapshot)
+
+        self.segments = []
+        self.size = 0
+        self.redo = deque()
+        self.live_cycle = self.position = cycle
+
+        self.add_keyframe(cycle)
+
+    def reset(self):
+        """forgets every played cycle and resets the state, e.g. when another vm stream starts"""
+        self.manager.reset()
+
+        self.segments = []
+        self.size = 0
+        self.live_cycle = None
+        self.position = None
+        self.redo = deque()
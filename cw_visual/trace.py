@@ -0,0 +1,307 @@
+import io
+import json
+import mmap
+import bisect
+import struct
+import threading
+from array import array
+
+import numpy as np
+
+from cw_visual.arena import Arena
+from cw_visual.binary_protocol import BinaryWriter, FRAME_HEADER, MAGIC, decode_frame_reporting
+from cw_visual.cycle_batcher import CycleBatch
+from cw_visual.cw_parser import CorewarParser
+from cw_visual.state_manager import CorewarStateManager, ManagerSnapshot, NullView
+
+
+# trace file stores a recorded match for replay
+#
+#   TRACE_MAGIC
+#   binary protocol stream (MAGIC and one frame per cycle, see binary_protocol.py)
+#   keyframes: state after some cycle, every one packed by pack_keyframe
+#   keyframe table: cycle (u32), file offset (u64) and length (u64) of every keyframe
+#   index: u64 file offset of the first frame with cycle >= c,
+#          for every cycle c from first cycle to last cycle
+#   footer: stream end (u64), keyframe table offset (u64), keyframes (u32),
+#           index offset (u64), first cycle (u32), cycles in index (u32), FOOTER_MAGIC
+#
+# index is dense so finding the frame of any cycle is a single lookup,
+# the state at any cycle is the nearest keyframe before it and at most a keyframe interval of frames
+# trace without footer (recording was interrupted) is indexed by scanning its frames and has no keyframes
+
+TRACE_MAGIC = b"CWTRACE2"
+FOOTER = struct.Struct("<QQIQII8s")
+FOOTER_MAGIC = b"CWTRIDX2"
+KEYFRAME_ENTRY = struct.Struct("<IQQ")
+
+TRACE_KEYFRAME_INTERVAL = 1000  # cycles between keyframes of a trace
+
+
+def pack_keyframe(snapshot: ManagerSnapshot) -> bytes:
+    """state manager snapshot as compressed numpy arrays"""
+    geometry, values, owners, cursor_counts = snapshot.arena
+    meta = {"geometry": geometry, "players": snapshot.players, "winner": snapshot.winner}
+
+    packed = io.BytesIO()
+    np.savez_compressed(
+        packed, values=values, owners=owners, cursor_counts=cursor_counts,
+        cursor_addr=np.array(snapshot.cursor_addr, dtype=np.int32),
+        cursor_player=np.array(snapshot.cursor_player, dtype=np.int32),
+        meta=np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8))
+
+    return packed.getvalue()
+
+
+def unpack_keyframe(data: bytes):
+    """state manager snapshot of pack_keyframe, nothing in the file is unpickled"""
+    with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+        meta = json.loads(arrays["meta"].tobytes())
+        arena = tuple(meta["geometry"]), arrays["values"], arrays["owners"], arrays["cursor_counts"]
+        cursor_addr = array("i", arrays["cursor_addr"].tolist())
+        cursor_player = array("i", arrays["cursor_player"].tolist())
+
+    return ManagerSnapshot(
+        arena, [tuple(player) for player in meta["players"]], cursor_addr, cursor_player, meta["winner"], len(data))
+
+
+class TraceWriter:
+    """
+    records cycle batches into a trace file
+    events are written with player numbers and cursor slots their ids were interned into (see IdInterner),
+    so batches of a trace are applied as they are read, from any cycle
+
+    batches are applied to a state of its own too, without drawing, so that it is snapshotted into a keyframe
+    every keyframe_interval cycles, keyframes are kept compressed in memory until the trace is closed
+    geometry is (memory size, row width) of the match before it sets its own
+    """
+
+    def __init__(self, path: str, geometry=None, keyframe_interval=TRACE_KEYFRAME_INTERVAL):
+        self.file = open(path, "wb")
+        self.file.write(TRACE_MAGIC)
+
+        self.writer = BinaryWriter(self.file)
+        self.lock = threading.Lock()  # batches are written by reader thread, closed by gui thread
+        self.closed = False
+
+        self.first_cycle = None
+        self.last_cycle = None
+        self.frame_offsets = array("Q")  # offset of every frame
+        self.frame_cycles = array("I")  # cycle of every frame
+
+        arena = Arena(*geometry) if geometry else Arena()
+        self.manager = CorewarStateManager(NullView(), arena)
+        self.parser = CorewarParser(self.manager)
+        self.keyframe_interval = keyframe_interval
+        self.keyframes = []  # (cycle, packed keyframe)
+
+    def write_batch(self, batch: CycleBatch):
+        with self.lock:
+            if self.closed:
+                return
+
+            # frames must go in increasing cycle order for the index
+            if self.last_cycle is not None and batch.cycle <= self.last_cycle:
+                return
+
+            if self.first_cycle is None:
+                self.first_cycle = batch.cycle
+
+            self.last_cycle = batch.cycle
+            self.frame_offsets.append(self.file.tell())
+            self.frame_cycles.append(batch.cycle)
+
+            for event in batch.events:
+                self.write_event(event)
+
+            self.writer.flush_cycle()
+            self.keep_state(batch.cycle, batch.events)
+
+    def write_event(self, event):
+        command, cycle = event[0], event[1]
+        writer = self.writer
+
+        if command == 'p':
+            _, _, player_id, name, address, code = event
+            writer.add_player(cycle, player_id, name, address, code)
+        elif command == 'c':
+            _, _, player_id, carriage_id, address = event
+            writer.add_cursor(cycle, player_id, carriage_id, address)
+        elif command == 'k':
+            _, _, player_id, carriage_id = event
+            writer.kill_cursor(cycle, player_id, carriage_id)
+        elif command == 'm':
+            _, _, player_id, carriage_id, offset = event
+            writer.move_cursor(cycle, player_id, carriage_id, offset)
+        elif command == 'w':
+            _, _, player_id, address, data = event
+            writer.write_memory(cycle, player_id, address, data)
+        elif command == 'e':
+            _, _, player_id = event
+            writer.declare_winner(cycle, player_id)
+        elif command == 'h':
+            _, _, mem_size, row_width = event
+            writer.set_geometry(cycle, mem_size, row_width)
+
+    def keep_state(self, cycle: int, events: list):
+        if self.parser is None:
+            return
+
+        try:
+            self.parser.apply_events(events)
+        except Exception as e:
+            # state of a malformed stream cannot be trusted, the rest of the trace gets no keyframes
+            print(f"trace keyframes stopped at cycle {cycle}: {e!r}")
+            self.parser = None
+            return
+
+        if not self.keyframes or cycle - self.keyframes[-1][0] >= self.keyframe_interval:
+            self.manager.flush()
+            self.keyframes.append((cycle, pack_keyframe(self.manager.snapshot())))
+
+    def close(self):
+        """writes keyframes, cycle index and footer"""
+        with self.lock:
+            if self.closed:
+                return
+
+            self.closed = True
+            self.writer.close()
+
+            body_end = self.file.tell()
+            table = []
+
+            for cycle, data in self.keyframes:
+                table.append(KEYFRAME_ENTRY.pack(cycle, self.file.tell(), len(data)))
+                self.file.write(data)
+
+            table_offset = self.file.tell()
+            self.file.write(b"".join(table))
+
+            index_offset = self.file.tell()
+            index = dense_index(
+                self.frame_cycles, self.frame_offsets, self.first_cycle or 0)
+
+            self.file.write(index.tobytes())
+            self.file.write(FOOTER.pack(
+                body_end, table_offset, len(table), index_offset, self.first_cycle or 0, len(index), FOOTER_MAGIC))
+            self.file.close()
+            self.keyframes = []
+
+
+def dense_index(frame_cycles, frame_offsets, first_cycle):
+    """offset of the first frame with cycle >= c for every cycle c from first_cycle to the last one"""
+    index = array("Q")
+
+    for cycle, offset in zip(frame_cycles, frame_offsets):
+        # cycles without events point to the next frame
+        while first_cycle + len(index) <= cycle:
+            index.append(offset)
+
+    return index
+
+
+class TraceReader:
+    """
+    memory maps a trace file and reads cycle batches straight from the mapping
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.data = memoryview(self.map)
+        self.keyframe_cycles = array("I")
+        self.keyframe_spans = []  # (offset, length) of every keyframe
+
+        header = TRACE_MAGIC + MAGIC
+        if bytes(self.data[:len(header)]) != header:
+            raise ValueError(path + " is not a corewar trace")
+
+        self.body_start = len(header)
+        self.read_index()
+
+    def read_index(self):
+        footer_start = len(self.data) - FOOTER.size
+
+        if footer_start >= self.body_start:
+            body_end, table_offset, keyframes, index_offset, first_cycle, count, magic = FOOTER.unpack_from(
+                self.data, footer_start)
+
+            if magic == FOOTER_MAGIC:
+                self.body_end = body_end
+                self.first_cycle = first_cycle
+                self.index = self.data[index_offset:index_offset + count * 8].cast("Q")
+
+                for cycle, offset, length in KEYFRAME_ENTRY.iter_unpack(
+                        self.data[table_offset:table_offset + keyframes * KEYFRAME_ENTRY.size]):
+                    self.keyframe_cycles.append(cycle)
+                    self.keyframe_spans.append((offset, length))
+
+                return
+
+        self.scan_index()
+
+    def scan_index(self):
+        """builds index of a trace that was not closed properly"""
+        frame_cycles = array("I")
+        frame_offsets = array("Q")
+        offset = self.body_start
+        end = len(self.data)
+
+        while end - offset >= FRAME_HEADER.size:
+            cycle, length = FRAME_HEADER.unpack_from(self.data, offset)
+
+            if offset + FRAME_HEADER.size + length > end:
+                break  # truncated frame
+
+            frame_cycles.append(cycle)
+            frame_offsets.append(offset)
+            offset += FRAME_HEADER.size + length
+
+        self.body_end = offset
+        self.first_cycle = frame_cycles[0] if frame_cycles else 0
+        self.index = dense_index(frame_cycles, frame_offsets, self.first_cycle)
+
+    @property
+    def last_cycle(self):
+        return self.first_cycle + len(self.index) - 1
+
+    def offset_of(self, cycle: int):
+        """file offset of the first frame with cycle >= cycle"""
+        if cycle <= self.first_cycle:
+            return self.body_start
+
+        position = cycle - self.first_cycle
+
+        if position >= len(self.index):
+            return self.body_end
+
+        return self.index[position]
+
+    def keyframe_before(self, cycle: int):
+        """(keyframe cycle, state manager snapshot) of the latest keyframe <= cycle or None"""
+        i = bisect.bisect_right(self.keyframe_cycles, cycle) - 1
+
+        if i < 0:
+            return None
+
+        offset, length = self.keyframe_spans[i]
+
+        return self.keyframe_cycles[i], unpack_keyframe(self.data[offset:offset + length])
+
+    def batches(self, start_cycle: int = 0):
+        """yields cycle batches starting from the first cycle >= start_cycle"""
+        data = self.data
+        offset = self.offset_of(start_cycle)
+
+        while offset < self.body_end:
+            cycle, length = FRAME_HEADER.unpack_from(data, offset)
+            start = offset + FRAME_HEADER.size
+
+            yield CycleBatch(cycle, decode_frame_reporting(cycle, data[start:start + length], start))
+
+            offset = start + length
+
+    def __iter__(self):
+        return self.batches()
@@ -1,5 +1,5 @@
-from PySide2.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, QGridLayout, QLabel, QSizePolicy, QApplication
-from PySide2.QtCore import Qt, QEvent
+from PySide2.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, QGridLayout, QLabel, QSizePolicy, QApplication, QSlider
+from PySide2.QtCore import Qt, QEvent, Signal
 
 
 def update_stylesheet(widget):
@@ -75,6 +75,12 @@ class PlayerInfo(QWidget):
         self.cursor_number.setProperty("lighted", True)
         update_stylesheet(self.cursor_number)
 
+    def reset(self):
+        self.cursor_number.setText("0")
+        self.cursor_number.setProperty("lighted", False)
+        update_stylesheet(self.cursor_number)
+        self.set_visible(False)
+
 
 class GameInfo(QWidget):
     def __init__(self, *args, **kwargs):
@@ -85,7 +91,7 @@ class GameInfo(QWidget):
         self.status.setProperty("status", "paused")  # for stylesheet
         self.status.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Preferred)
 
-        self.speed_title = QLabel("speed")
+        self.speed_title = QLabel("cycles/s")
         self.speed_value = QLabel("1")
         self.speed_value.setProperty("lighted", True)  # for stylesheet
 
@@ -108,8 +114,8 @@ class GameInfo(QWidget):
     def set_cycle(self, cycle: int):
         self.cycle_number.setText(str(cycle))
 
-    def set_speed(self, speed: int):
-        self.speed_value.setText(str(speed))
+    def set_speed(self, speed: str):
+        self.speed_value.setText(speed)
 
     def set_game_finished(self):
         self.game_finished = True
@@ -117,5 +123,99 @@ class GameInfo(QWidget):
         self.status.setProperty("status", "paused")  # for stylesheet
         update_stylesheet(self.status)
 
+    def set_game_resumed(self):
+        """game is not finished anymore after moving back in time"""
+        self.game_finished = False
+
     def __iter__(self):
         return iter((self.status, self.speed_title, self.speed_value, self.cycle_title, self.cycle_number))
+
+
+class PerfHud(QWidget):
+    """
+    performance counters of the last sample (see perf_stats.PerfSample), title and value per row
+    hidden until toggled
+    """
+
+    # sample field -> title, value format
+    rows = {
+        "events_per_s": ("ingest events/s", "{:.0f}"),
+        "cycles_per_s": ("applied cycles/s", "{:.0f}"),
+        "queue_depth": ("queued cycles", "{}"),
+        "parse_ms": ("parse ms", "{:.2f}"),
+        "apply_ms": ("apply ms", "{:.2f}"),
+        "draw_ms": ("draw ms", "{:.2f}"),
+        "paint_ms": ("paint ms", "{:.2f}"),
+        "fps": ("fps", "{:.0f}"),
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.shown = False
+        self.titles = []
+        self.values = dict()  # sample field -> value label
+
+        for field, (title, _) in self.rows.items():
+            self.titles.append(QLabel(title))
+
+            value = QLabel("0")
+            value.setProperty("lighted", True)  # for stylesheet
+            self.values[field] = value
+
+        self.set_visible(False)
+
+    def __iter__(self):
+        """title and value label of every row"""
+        for title, value in zip(self.titles, self.values.values()):
+            yield title
+            yield value
+
+    def set_visible(self, visible: bool):
+        self.shown = visible
+
+        for widget in self:
+            widget.setVisible(visible)
+
+    def set_sample(self, sample):
+        for field, (_, value_format) in self.rows.items():
+            self.values[field].setText(value_format.format(getattr(sample, field)))
+
+
+class TimelineSlider(QSlider):
+    """
+    slider over the played cycles
+    emits seek_requested when moved by user, not when cycle is set by playback
+    """
+
+    seek_requested = Signal(int)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(Qt.Horizontal, *args, **kwargs)
+
+        self.setRange(0, 0)
+        self.setFocusPolicy(Qt.NoFocus)  # keys are handled by main view
+
+        self.valueChanged.connect(self.on_value_changed)
+        self.sliderReleased.connect(self.on_released)
+
+    def on_value_changed(self, value):
+        # while dragging seek only once on release
+        if not self.isSliderDown():
+            self.seek_requested.emit(value)
+
+    def on_released(self):
+        self.seek_requested.emit(self.value())
+
+    def set_range(self, first: int, last: int):
+        self.blockSignals(True)
+        self.setRange(first, last)
+        self.blockSignals(False)
+
+    def set_cycle(self, cycle: int):
+        if self.isSliderDown():
+            return
+
+        self.blockSignals(True)
+        self.setValue(cycle)
+        self.blockSignals(False)
@@ -1,13 +1,28 @@
 from typing import List, Dict, Tuple
 from dataclasses import dataclass
 import os
+import time
 
 from PySide2.QtWidgets import QApplication, QWidget, QScrollArea, QHBoxLayout, QVBoxLayout, QSizePolicy, QScrollBar, QLabel
-from PySide2.QtGui import QPainter, QPen, QBrush, QColor, QPainterPath, QTransform, QPixmap, QFontMetrics, QFont
+from PySide2.QtGui import QPainter, QPen, QBrush, QColor, QPainterPath, QTransform, QPixmap, QFontMetrics, QFont, QRegion, QImage
 from PySide2.QtCore import QObject, QRect, QRectF, QPoint, QPointF, Slot, Signal, Qt, QTimer, QSize, QSettings
 
 from cw_visual.colors import *
 from cw_visual.ui_widgets import *
+from cw_visual.glyph_atlas import get_atlas
+from cw_visual.damage_tracker import DamageTracker
+from cw_visual.pixel_map import PixelMap
+from cw_visual.arena import Arena
+from cw_visual.perf_stats import counters
+
+
+def load_stylesheet():
+    # path relative to current file otherwise crash when main.py called from different working dir
+    dirname = os.path.dirname(__file__)
+    stylesheet_path = os.path.join(dirname, 'stylesheet.qss')
+
+    with open(stylesheet_path) as file:
+        return file.read()
 
 
 def pairs(string):
@@ -100,6 +115,30 @@ class ScrollsOverContentArea(MouseScrolledArea):
         """use size hint of the child widget"""
         return self.widget().sizeHint()
 
+    def wheelEvent(self, ev):
+        """zooms widgets having zoom(steps) method, point under mouse stays in place"""
+        widget = self.widget()
+        steps = ev.angleDelta().y() // 120
+
+        if not hasattr(widget, "zoom") or not steps:
+            return super().wheelEvent(ev)
+
+        mouse = ev.pos()
+        point = widget.mapFrom(self.viewport(), mouse)
+        old_size = widget.size()
+
+        if widget.zoom(steps):
+            self.updateGeometry()  # size hint follows the widget
+
+            size = widget.size()
+            x = point.x() * size.width() // max(1, old_size.width())
+            y = point.y() * size.height() // max(1, old_size.height())
+
+            self.horizontalScrollBar().setValue(x - mouse.x())
+            self.verticalScrollBar().setValue(y - mouse.y())
+
+        ev.accept()
+
     def center_view(self):
         vertical = self.verticalScrollBar()
         horizontal = self.horizontalScrollBar()
@@ -117,8 +156,9 @@ class ScrollsOverContentArea(MouseScrolledArea):
 
 class View(QWidget):
     key_pressed = Signal(str)
+    seek_requested = Signal(int)
 
-    def __init__(self, parent=None):
+    def __init__(self, arena: Arena, parent=None):
         super().__init__(parent)
         self.first_show = True  # to apply center view on byte view
         self.players_count = 0
@@ -126,7 +166,7 @@ class View(QWidget):
 
         self.setWindowTitle("corewar visual")
 
-        self.byte_view = ByteView()
+        self.byte_view = ByteView(arena)
 
         self.scroll_area = ScrollsOverContentArea()
         self.scroll_area.setWidget(self.byte_view)
@@ -143,13 +183,13 @@ class View(QWidget):
         self.style()
 
         # make references to byte_view functions availible on self
-        self.draw_cursor_rect = self.byte_view.draw_cursor_rect
-        self.erase_cursor_rect = self.byte_view.erase_cursor_rect
-        self.write_bytes = self.byte_view.write_bytes
+        self.redraw_cursor_cells = self.byte_view.redraw_cursor_cells
+        self.redraw_cells = self.byte_view.redraw_cells
         self.print_msg = self.byte_view.print_msg
         self.set_paused = self.game_info.set_paused
-        self.set_cycle = self.game_info.set_cycle
         self.set_speed = self.game_info.set_speed
+        self.set_timeline_range = self.timeline_slider.set_range
+        self.set_perf_sample = self.perf_hud.set_sample
 
         self.readSettings()
 
@@ -170,6 +210,14 @@ class View(QWidget):
 
         grid.setRowMinimumHeight(3, 20)
 
+        # performance counters next to game info, shown on demand
+        self.perf_hud = PerfHud()
+        widget = iter(self.perf_hud)
+
+        for row in range(len(PerfHud.rows)):
+            grid.addWidget(next(widget), row, 2)
+            grid.addWidget(next(widget), row, 3)
+
         player1 = PlayerInfo(1)
         i = self.unpack_player_widget_to_grid(player1, grid, 4)
 
@@ -189,6 +237,10 @@ class View(QWidget):
 
         self.player_widgets = [player1, player2, player3, player4]
 
+        self.timeline_slider = TimelineSlider()
+        self.timeline_slider.seek_requested.connect(self.seek_requested)
+        grid.addWidget(self.timeline_slider, i, 0, 1, 2)
+
         grid.setColumnMinimumWidth(1, 100)
         grid.setContentsMargins(20, 20, 20, 20)
         self.layout.addLayout(grid)
@@ -211,21 +263,20 @@ class View(QWidget):
 
         self.scroll_area.setAlignment(Qt.AlignVCenter | Qt.AlignRight)
 
-        # path relative to current file otherwise crash when main.py called from different working dir
-        dirname = os.path.dirname(__file__)
-        stylesheet_path = os.path.join(dirname, 'stylesheet.qss')
-
-        with open(stylesheet_path) as file:
-            stylesheet = file.read()
-
         self.setObjectName("main")  # for proper styling
-        self.setStyleSheet(stylesheet)
+        self.setStyleSheet(load_stylesheet())
 
     def keyPressEvent(self, ev):
         if ev.key() == Qt.Key_Space:
             self.key_pressed.emit(" ")
         elif ev.key() == Qt.Key_D:
             self.key_pressed.emit("d")
+        elif ev.key() == Qt.Key_A:
+            self.key_pressed.emit("a")
+        elif ev.key() == Qt.Key_G:
+            self.key_pressed.emit("g")
+        elif ev.key() == Qt.Key_P:
+            self.key_pressed.emit("p")
         elif ev.key() == Qt.Key_Plus:
             self.key_pressed.emit("+")
         elif ev.key() == Qt.Key_Minus:
@@ -292,6 +343,27 @@ class View(QWidget):
         settings.setValue("maximized", self.isMaximized())
         settings.setValue("fullscreen", self.isFullScreen())
 
+    def redraw_arena(self):
+        self.byte_view.redraw_arena()
+        self.scroll_area.updateGeometry()  # arena geometry may have changed
+
+    def toggle_perf_hud(self):
+        """returns True if the panel is shown now"""
+        self.perf_hud.set_visible(not self.perf_hud.shown)
+        return self.perf_hud.shown
+
+    def set_cycle(self, cycle: int):
+        self.game_info.set_cycle(cycle)
+        self.timeline_slider.set_cycle(cycle)
+
+    def reset_players(self):
+        for player in self.player_widgets:
+            player.reset()
+
+        self.players_count = 0
+
+        self.game_info.set_game_resumed()
+
     def add_player(self, name: str):
         index = self.players_count
 
@@ -330,44 +402,113 @@ class MsgLines:
 class ByteView(QWidget):
     """
     Is used to draw memory, players and cursors state onto a widget
+
+    zoom is the font size of byte cells, below min_text_font_size text is unreadable,
+    so the arena is drawn as a pixel map instead: one block of zoom height per byte
+
+    repaints are scheduled by a timer of the view,
+    or by scheduler if it is given: scheduler.schedule_repaint(view) must call view.repaint_damaged later
     """
     byte_margin = 0
     byte_padding = 4
 
+    min_zoom = 1
+    max_zoom = 40
+    min_text_font_size = 8
+
+    # text layers taller than this are not created, large arenas are limited in zoom
+    max_layer_height = 32767
+
     test_curr_addr = 0
 
-    def __init__(self, *args, **kwargs):
+    # touched cells are collected and repainted at most once per frame
+    repaint_interval_ms = 1000 // 60
+
+    def __init__(self, arena: Arena, *args, font_size=None, scheduler=None, **kwargs):
         super().__init__(*args, **kwargs)
 
-        self.initialize()
-        self.startTimer(1000/60)
+        self.arena = arena
+        self.scheduler = scheduler
+        self.geometry = None  # arena geometry the layers are allocated for
+        self.damage = DamageTracker()
+
+        # started only when something got damaged, so idle view never repaints
+        self.repaint_timer = QTimer()
+        self.repaint_timer.setSingleShot(True)
+        self.repaint_timer.setInterval(self.repaint_interval_ms)
+        self.repaint_timer.timeout.connect(self.repaint_damaged)
+
+        self.initialize(font_size)
+
+    def initialize(self, font_size=None):
+        """font_size - pixel size of byte font, by default fits all rows of the arena on screen"""
+        if font_size is None:
+            font_size = compute_font_size(self.arena.rows, self.min_zoom)
 
-    def initialize(self):
-        font_size = compute_font_size()
+        if self.geometry != self.arena.geometry:
+            self.geometry = self.arena.geometry
+            self.pixel_map = PixelMap(self.arena)
+
+        self.zoom_level = font_size
+        self.pixel_mode = font_size < self.min_text_font_size
 
         font = QApplication.font()
-        font.setPixelSize(font_size)
+        font.setPixelSize(max(font_size, self.min_text_font_size))
         # font.setBold(True)
         self.font = font
 
         self.font_bold = QFont(font)
         self.font_bold.setBold(True)
 
+        self.dpr = self.devicePixelRatioF()
         self.byte_rect = self.compute_byte_rect()
         self.byte_advance = self.compute_byte_advance()
-        self.bytes_pixmap = self.create_pixmap(transparent=False)
-        self.bytes_field = self.build_bytes_field()
-        self.cursors_pixmap = self.create_pixmap(transparent=True)
+        self.atlas = get_atlas(self.font, self.byte_rect, self.dpr)
 
-        self.setMinimumWidth(self.bytes_pixmap.width())
-        self.setMinimumHeight(self.bytes_pixmap.height())
+        # text layers are only allocated when shown, they are huge for large arenas
+        if self.pixel_mode:
+            self.bytes_pixmap = None
+            self.cursors_pixmap = None
+        else:
+            self.bytes_pixmap = self.create_pixmap(transparent=False)
+            self.cursors_pixmap = self.create_pixmap(transparent=True)
+            self.render_empty_bytes_to_pixmap()
 
-        self.render_empty_bytes_to_pixmap()
+        self.setMinimumSize(self.sizeHint())
+        self.resize(self.sizeHint())
 
         self.prev_msg_lines = MsgLines(0, 0)
 
     def sizeHint(self):
-        return QSize(self.bytes_pixmap.width(), self.bytes_pixmap.height())
+        if self.pixel_mode:
+            block = self.zoom_level
+            return QSize(self.arena.row_width * 2 * block, self.arena.rows * block)
+
+        return self.bytes_pixmap.size() / self.dpr
+
+    def zoom(self, steps: int):
+        """changes zoom level by steps, returns False if it is already at the limit"""
+        zoom_level = max(self.min_zoom, min(self.max_zoom, self.zoom_level + steps))
+
+        # byte cell is less than twice as high as its font
+        if zoom_level > self.zoom_level and self.arena.rows * zoom_level * 2 > self.max_layer_height:
+            return False
+
+        if zoom_level == self.zoom_level:
+            return False
+
+        self.initialize(zoom_level)
+        self.redraw_arena()
+
+        return True
+
+    def schedule_repaint(self):
+        if self.scheduler is not None:
+            self.scheduler.schedule_repaint(self)
+            return
+
+        if not self.repaint_timer.isActive():
+            self.repaint_timer.start()
 
     def compute_byte_rect(self):
         fm = QFontMetrics(self.font)
@@ -382,49 +523,103 @@ class ByteView(QWidget):
         return fm.boundingRect("00").width() + 2*self.byte_padding + self.byte_margin
 
     def create_pixmap(self, transparent=False):
-        w = self.byte_advance * 64
-        h = self.byte_rect.height() * 64
+        w = self.byte_advance * self.arena.row_width
+        h = self.byte_rect.height() * self.arena.rows
 
-        pixmap = QPixmap(w, h)
+        pixmap = QPixmap(round(w * self.dpr), round(h * self.dpr))
+        pixmap.setDevicePixelRatio(self.dpr)
 
         if transparent:
             pixmap.fill(Qt.transparent)
 
         return pixmap
 
-    def build_bytes_field(self):
-        l = []
-        for _ in range(4096):
-            l.append(["00", PEN_EMPTY])
-
-        return l
+    def render_empty_bytes_to_pixmap(self, address=0, count=None):
+        if count is None:
+            count = self.arena.size
 
-    def render_empty_bytes_to_pixmap(self, address=0, count=4096):
         pixmap_painter = QPainter(self.bytes_pixmap)
-        pixmap_painter.setFont(self.font)
 
-        self.print_to_pixmap(pixmap_painter, address, "00"*count, PEN_EMPTY)
+        self.blit_to_pixmap(pixmap_painter, address, bytes(count), PEN_EMPTY)
 
         pixmap_painter.end()
 
     def byte_index(self, byte_addr):
+        size = self.arena.size
+        cell_pos = self.arena.cell_pos
+
         while True:
-            looped_addr = byte_addr % 4096
-            i = looped_addr % 64
-            j = looped_addr // 64
-            yield i, j
+            yield cell_pos(byte_addr % size)
             byte_addr += 1
 
-    def write_bytes(self, addr, bytes_str, pen):
-        pixmap_painter = QPainter(self.bytes_pixmap)
-        pixmap_painter.setFont(self.font)
+    def cell_rect(self, i, j):
+        rect = QRect(self.byte_rect)
+        rect.moveTopLeft(QPoint(i*self.byte_advance, j*rect.height()))
 
-        self.print_to_pixmap(pixmap_painter, addr, bytes_str, pen)
-        pixmap_painter.end()
+        return rect
+
+    def mark_damaged(self, i, j):
+        self.damage.add_cell(i, j)
+        self.schedule_repaint()
+
+    def repaint_damaged(self):
+        """schedules repaint of touched cells that are visible in the scroll viewport"""
+        if self.pixel_mode:
+            # pixel map is rendered whole, it is cheap
+            self.damage.take_spans()
+            self.update(self.visibleRegion())
+            return
+
+        region = QRegion()
+        h = self.byte_rect.height()
+
+        for j, first, last in self.damage.take_spans():
+            region += QRect(
+                first * self.byte_advance, j * h,
+                (last - first + 1) * self.byte_advance, h
+            )
+
+        region &= self.visibleRegion()
+
+        if not region.isEmpty():
+            self.update(region)
+
+    def redraw_cells(self, addrs):
+        """renders cells from arena values and owners"""
+        if not addrs:
+            return
+
+        if self.pixel_mode:
+            self.pixel_map.cells_written(addrs)
+            self.schedule_repaint()
+            return
 
-        self.print_to_bytes_field(addr, bytes_str, pen)
+        painter = QPainter(self.bytes_pixmap)
+
+        rows = [self.atlas.byte_row(PEN_EMPTY)] + [self.atlas.byte_row(pen) for pen in pens]
+        values = self.arena.values
+        owners = self.arena.owners
+        row_width = self.arena.row_width
+
+        for addr in addrs:
+            j, i = divmod(addr, row_width)
+            self.atlas.blit(painter, self.cell_rect(i, j), rows[owners[addr]], int(values[addr]))
+            self.mark_damaged(i, j)
+
+        painter.end()
+
+    def blit_to_pixmap(self, painter, byte_addr, values, pen):
+        """copies pre-rendered byte cells from glyph atlas"""
+        index = self.byte_index(byte_addr)
+        row = self.atlas.byte_row(pen)
+
+        for value in values:
+            i, j = next(index)
+            self.atlas.blit(painter, self.cell_rect(i, j), row, value)
+            self.mark_damaged(i, j)
 
     def print_to_pixmap(self, painter, byte_addr, string, pen):
+        """lays out arbitrary text in byte cells, only used for msgs"""
         index = self.byte_index(byte_addr)
         byte_rect = QRect(self.byte_rect)
         h = byte_rect.height()
@@ -442,19 +637,13 @@ class ByteView(QWidget):
             painter.setPen(pen)
             painter.drawText(byte_rect, Qt.AlignCenter, f'{txt}')
 
-    def print_to_bytes_field(self, byte_addr, bytes_str, pen):
-        for digit1, digit2 in pairs(bytes_str):
-            looped_addr = byte_addr % 4096
-            txt = digit1 + digit2
-            cell = self.bytes_field[looped_addr]
-            cell[0] = txt
-            cell[1] = pen
-            byte_addr += 1
+            self.mark_damaged(i, j)
 
     def clear_last_msg(self):
         # clear prev msg
-        prev_msg_start = self.prev_msg_lines.start_line * 64
-        prev_msg_bytes_count = self.prev_msg_lines.line_count * 64
+        row_width = self.arena.row_width
+        prev_msg_start = self.prev_msg_lines.start_line * row_width
+        prev_msg_bytes_count = self.prev_msg_lines.line_count * row_width
 
         self.render_empty_bytes_to_pixmap(prev_msg_start, prev_msg_bytes_count)
 
@@ -463,14 +652,20 @@ class ByteView(QWidget):
         prints msg to byte cells vertically and horizontally centered
         pens_dict specifies PEN to be used for specified line 
         eg {0: PEN_WARNING} - line 0 will be painted with PEN_WARNING pen
+        msgs are not shown in pixel mode
         """
+        if self.pixel_mode:
+            return
+
         self.clear_last_msg()
 
         pixmap_painter = QPainter(self.bytes_pixmap)
         pixmap_painter.setFont(self.font_bold)
 
+        row_width = self.arena.row_width
+
         lines = multiline_msg.splitlines()
-        row = 64 // 2 - len(lines) // 2  # centered vertically
+        row = self.arena.rows // 2 - len(lines) // 2  # centered vertically
 
         # for clearing this msg when new one printed
         self.prev_msg_lines = MsgLines(row, len(lines))
@@ -481,66 +676,146 @@ class ByteView(QWidget):
             if len(line) % 2:  # odd
                 line += '_'
 
-            column = 64 // 2 - len(line) // 2 // 2  # centered horizontally
-            address = row * 64 + column
+            column = row_width // 2 - len(line) // 2 // 2  # centered horizontally
+            address = row * row_width + column
 
             pen = pens_dict.get(index, PEN_LIGHT)
             self.print_to_pixmap(pixmap_painter, address, line, pen)
             row += 1
 
-    def draw_cursor_rect(self, pos: Tuple[int, int], brush, addr):
+    def redraw_cursor_cells(self, addrs):
+        """renders cursor layer cells from cursor occupancy of the arena, free cells are cleared"""
+        if not addrs:
+            return
+
+        if self.pixel_mode:
+            self.schedule_repaint()
+            return
+
+        addrs = list(addrs)
+        owners, counts = self.arena.cursor_stacks(addrs)
+        values = self.arena.values
+
+        rows = [self.atlas.cursor_row(brush) for brush in brushes]
+        stacked = []
+
+        row_width = self.arena.row_width
+
         painter = QPainter(self.cursors_pixmap)
 
-        cursor_rect = QRect(self.byte_rect)
-        h = cursor_rect.height()
-        i, j = pos
+        # cursor cell fully covers the cell below
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+
+        for addr, owner, count in zip(addrs, owners.tolist(), counts.tolist()):
+            j, i = divmod(addr, row_width)
+            rect = self.cell_rect(i, j)
+
+            if count:
+                self.atlas.blit(painter, rect, rows[owner], int(values[addr]))
+
+                if count > 1:
+                    stacked.append((rect, count))
+            else:
+                painter.fillRect(rect, Qt.transparent)
 
-        cursor_rect.moveTopLeft(QPoint(i*self.byte_advance, j*h))
+            self.mark_damaged(i, j)
 
-        painter.setPen(Qt.NoPen)
-        painter.setBrush(brush)
-        painter.drawRect(cursor_rect)
+        # stack marks are drawn over cursor cells
+        painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
 
-        painter.setFont(self.font)
-        txt = self.bytes_field[addr][0]
-        painter.setPen(PEN_BCK)
-        painter.drawText(cursor_rect, Qt.AlignCenter, f'{txt}')
+        for rect, count in stacked:
+            self.atlas.blit_stack_marks(painter, rect, count)
 
         painter.end()
 
-    def erase_cursor_rect(self, pos: Tuple[int, int]):
-        painter = QPainter(self.cursors_pixmap)
+    def redraw_arena(self):
+        """renders every cell and cursor from arena from scratch"""
+        if self.geometry != self.arena.geometry:
+            self.initialize(self.zoom_level)
 
-        cursor_rect = QRect(self.byte_rect)
-        h = cursor_rect.height()
-        i, j = pos
+        if self.pixel_mode:
+            self.update()
+            return
 
-        cursor_rect.moveTopLeft(QPoint(i*self.byte_advance, j*h))
+        painter = QPainter(self.bytes_pixmap)
 
-        painter.setCompositionMode(QPainter.CompositionMode_Source)
-        painter.setPen(Qt.NoPen)
-        painter.setBrush(Qt.transparent)
-        painter.drawRect(cursor_rect)
-        painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+        rows = [self.atlas.byte_row(PEN_EMPTY)] + [self.atlas.byte_row(pen) for pen in pens]
+        index = self.byte_index(0)
+
+        for value, owner in zip(self.arena.values.tolist(), self.arena.owners.tolist()):
+            i, j = next(index)
+            self.atlas.blit(painter, self.cell_rect(i, j), rows[owner], value)
+
+        painter.end()
+
+        self.cursors_pixmap.fill(Qt.transparent)
+        self.redraw_cursor_cells(self.arena.cursor_counts.any(axis=1).nonzero()[0].tolist())
+
+        self.prev_msg_lines = MsgLines(0, 0)
+        self.update()
+
+    def render_to_image(self):
+        """composes memory and cursors layers into one image"""
+        if self.pixel_mode:
+            return self.pixel_map.render().scaled(self.sizeHint())
+
+        image = QImage(self.bytes_pixmap.size(), QImage.Format_RGB32)
+        image.setDevicePixelRatio(self.dpr)
+        image.fill(QCOLOR_BKG_EMPTY)
+
+        painter = QPainter(image)
+        painter.drawPixmap(QPoint(), self.bytes_pixmap)
+        painter.drawPixmap(QPoint(), self.cursors_pixmap)
+        painter.end()
+
+        return image
+
+    def device_rect(self, rect: QRect):
+        """rect in pixmap coordinates (device pixels)"""
+        return QRect(
+            round(rect.x() * self.dpr), round(rect.y() * self.dpr),
+            round(rect.width() * self.dpr), round(rect.height() * self.dpr)
+        )
 
     def paintEvent(self, event):
-        painter = QPainter(self)
+        start = time.perf_counter()
+
+        if self.pixel_mode:
+            self.paint_pixel_map()
+        else:
+            self.paint_pixmaps(event)
+
+        counters.add_time("paint", start)
+        counters.frames_painted += 1
 
-        # clear background
+    def paint_pixmaps(self, event):
+        painter = QPainter(self)
         painter.setBackground(QCOLOR_BKG_EMPTY)
-        painter.eraseRect(self.rect())
 
-        # draw memory view layer
-        painter.drawPixmap(QPoint(), self.bytes_pixmap)
+        # only repaint what was damaged or exposed
+        for rect in event.region().rects():
+            source = self.device_rect(rect)
 
-        # draw cursors layer
-        painter.drawPixmap(QPoint(), self.cursors_pixmap)
+            # clear background
+            painter.eraseRect(rect)
 
-    def timerEvent(self, event):
-        # render pixmaps to widget
-        self.update()
+            # draw memory view layer
+            painter.drawPixmap(rect, self.bytes_pixmap, source)
+
+            # draw cursors layer
+            painter.drawPixmap(rect, self.cursors_pixmap, source)
+
+    def paint_pixel_map(self):
+        painter = QPainter(self)
+        painter.drawImage(self.rect(), self.pixel_map.render())
+        painter.end()
+
+        # keep repainting until recent writes fade out
+        if self.pixel_map.is_hot():
+            self.schedule_repaint()
 
-def compute_font_size():
+def compute_font_size(rows, min_font_size=1):
+    """the largest font size fitting rows of byte cells on screen"""
     screen_rect = QApplication.desktop().availableGeometry()
 
     font_size = 14
@@ -551,9 +826,9 @@ def compute_font_size():
         fm = QFontMetrics(font)
 
         byte_height = fm.boundingRect("0").height()
-        byte_view_height = byte_height * 64
+        byte_view_height = byte_height * rows
 
-        if byte_view_height < screen_rect.height():
+        if byte_view_height < screen_rect.height() or font_size <= min_font_size:
             return font_size
         else:
             font_size -= 1
\ No newline at end of file
@@ -0,0 +1,580 @@
+import time
+import threading
+import multiprocessing
+import multiprocessing.connection
+from collections import namedtuple
+
+from PySide2.QtCore import QTimer, QSocketNotifier
+
+from cw_visual.playback import PlaybackPacer
+from cw_visual.spill_buffer import SpillBuffer
+from cw_visual.shared_arena import SharedArena, ChangeRing
+from cw_visual.state_manager import CorewarStateManager
+from cw_visual.cw_parser import CorewarParser
+from cw_visual.timeline import Timeline, KEYFRAME_INTERVAL, MEMORY_LIMIT
+from cw_visual.cycle_batcher import NEW_STREAM_CYCLE
+from cw_visual.stdin_listener import FRAME_INTERVAL_MS, FAST_FORWARD_FRAME_MS
+from cw_visual.perf_stats import counters
+
+# worker mode: reading, parsing, state updates and timeline run in a worker process,
+# gui process only draws, so both of them get a core of their own
+#
+# the worker's arena lives in shared memory (see SharedArena), gui maps it without copying
+# gui asks the worker to play a frame, the worker applies cycles and replies with a WorkerFrame:
+# addresses of changed cells are put into a slot of ChangeRing, the rest of drawing calls go in the reply
+# the next frame is requested before the previous one is drawn, so the worker applies while gui draws,
+# cells drawn meanwhile may show values one frame ahead, they are drawn again with the next frame
+
+# view calls whose argument is a collection of addresses, passed through the ring
+CELL_CALLS = ("redraw_cells", "redraw_cursor_cells")
+
+# drawing calls of a frame and state of the worker after it
+#   calls - (view method name, args), args of CELL_CALLS are (start, count) in the ring slot
+#   position, live_cycle, first_cycle - of the worker's timeline
+#   applied - cycles applied, starved - ran out of data, done - fast forward reached its target
+#   arena_block, geometry - name of a new shared memory block of the arena, None if it has not changed
+#   stats - events ingested, cycles applied and seconds parsing and applying since the previous frame
+WorkerFrame = namedtuple(
+    "WorkerFrame",
+    ["seq", "calls", "position", "live_cycle", "first_cycle", "applied", "starved", "done",
+     "queued", "arena_block", "geometry", "stats"]
+)
+
+
+class ChangeListView:
+    """view of the worker's state manager, records drawing calls instead of drawing"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    def take(self, slot):
+        """
+        returns calls recorded since the last take, addresses of cell calls are moved into slot
+        if they do not fit the whole arena is redrawn instead
+        """
+        calls, self.calls = self.calls, []
+        packed = []
+        end = 0
+
+        for name, args in calls:
+            if name not in CELL_CALLS:
+                packed.append((name, args))
+                continue
+
+            addrs = list(args[0])
+
+            if end + len(addrs) > len(slot):
+                # every other call of the frame is kept, cells are drawn by redrawing the arena at the end
+                return [call for call in calls if call[0] not in CELL_CALLS] + [("redraw_arena", ())]
+
+            slot[end:end + len(addrs)] = addrs
+            packed.append((name, (end, len(addrs))))
+            end += len(addrs)
+
+        return packed
+
+
+class ArenaWorker:
+    """
+    runs in the worker process: reads the source in a thread like StdinListener
+    and serves requests of WorkerClient, every request is answered with a WorkerFrame
+
+    requests:
+      ("play", cycles, budget) - applies up to cycles within budget seconds
+      ("fast_forward", cycle, budget) - applies up to the cycle without drawing, draws the state at it
+      ("seek", cycle) - moves the timeline to a played cycle
+      ("redraw",) - draws the current state from scratch
+      ("quit",)
+    """
+
+    def __init__(self, conn, arena: SharedArena, ring: ChangeRing, source_factory,
+                 keyframe_interval=KEYFRAME_INTERVAL, memory_limit=MEMORY_LIMIT):
+        self.conn = conn
+        self.send_lock = threading.Lock()  # reader thread sends "started"
+        self.arena = arena
+        self.ring = ring
+        self.source_factory = source_factory
+        self.at_exit = []
+
+        self.view = ChangeListView()
+        self.manager = CorewarStateManager(self.view, arena)
+        self.parser = CorewarParser(self.manager)
+        self.timeline = Timeline(
+            self.parser, self.manager, keyframe_interval=keyframe_interval, memory_limit=memory_limit)
+
+        self.cycle_queue = SpillBuffer()
+        self.held_batch = None  # read past the fast forward target, played next
+        self.read_started = False
+        self.seq = 0
+        self.arena_block = arena.block_name
+        self.last_stats = self.stats_totals()
+
+    def run(self):
+        source = self.source_factory(self.at_exit.append)
+
+        reader = threading.Thread(target=self.read_source, args=(source,))
+        reader.daemon = True
+        reader.start()
+
+        try:
+            self.serve()
+        finally:
+            for close in self.at_exit:
+                close()
+
+            self.arena.close()
+
+    def read_source(self, source):
+        for batch in source:
+            self.cycle_queue.put(batch)
+            counters.events_ingested += len(batch.events)
+
+            if not self.read_started:
+                self.read_started = True
+                self.send(("started",))
+
+    def send(self, message):
+        with self.send_lock:
+            self.conn.send(message)
+
+    def serve(self):
+        handlers = {
+            "play": self.play,
+            "fast_forward": self.fast_forward,
+            "seek": self.seek,
+            "redraw": self.redraw,
+        }
+
+        parent = multiprocessing.parent_process()
+
+        while True:
+            # the pipe does not report eof while a child of the gui still holds its end, gui may be killed too
+            ready = multiprocessing.connection.wait([self.conn, parent.sentinel])
+
+            if self.conn not in ready:
+                return  # gui is gone
+
+            try:
+                command, *args = self.conn.recv()
+            except EOFError:
+                return  # gui is gone
+
+            if command == "quit":
+                return
+
+            start = time.perf_counter()
+            frame_state = handlers[command](*args)
+            counters.add_time("apply", start)
+
+            self.send(("frame", self.frame(*frame_state)))
+
+    def next_batch(self):
+        batch = self.timeline.next_redo()
+
+        if batch is None and self.held_batch is not None:
+            batch, self.held_batch = self.held_batch, None
+
+        if batch is None:
+            batch = self.cycle_queue.get()
+
+        return batch
+
+    def play(self, cycles, budget):
+        deadline = time.perf_counter() + budget
+        applied = 0
+        starved = False
+
+        while applied < cycles and time.perf_counter() < deadline:
+            batch = self.next_batch()
+
+            if batch is None:
+                starved = True
+                break
+
+            if batch.cycle == NEW_STREAM_CYCLE:
+                self.new_stream()
+                continue
+
+            self.timeline.apply(batch.cycle, batch.events)
+            applied += 1
+
+        self.manager.flush()
+
+        return applied, starved, False
+
+    def fast_forward(self, target, budget):
+        deadline = time.perf_counter() + budget
+        applied = 0
+
+        with self.manager.view_suppressed():
+            while time.perf_counter() < deadline:
+                batch = self.next_batch()
+
+                if batch is None:
+                    return applied, True, False
+
+                if batch.cycle == NEW_STREAM_CYCLE:
+                    # the target was a cycle of the previous stream
+                    self.new_stream()
+                    break
+
+                if batch.cycle > target:
+                    self.held_batch = batch
+                    break
+
+                self.timeline.apply(batch.cycle, batch.events)
+                applied += 1
+
+                if batch.cycle == target:
+                    break
+            else:
+                return applied, False, False
+
+        self.redraw()
+
+        return applied, False, True
+
+    def new_stream(self):
+        """another vm stream starts from scratch"""
+        self.timeline.reset()
+
+        self.view.set_cycle(0)
+        self.view.set_timeline_range(0, 0)
+
+    def seek(self, cycle):
+        self.timeline.seek(cycle)
+
+        return 0, False, False
+
+    def redraw(self):
+        with self.manager.view_suppressed():
+            self.manager.flush()
+
+        self.manager.redraw_state()
+
+        return 0, False, False
+
+    def stats_totals(self):
+        events, cycles, _, seconds = counters.totals()
+        return events, cycles, seconds["parse"], seconds["apply"]
+
+    def frame(self, applied, starved, done) -> WorkerFrame:
+        calls = self.view.take(self.ring.slot(self.seq))
+
+        arena_block = None
+
+        if self.arena.block_name != self.arena_block:
+            arena_block = self.arena_block = self.arena.block_name
+
+        counters.cycles_applied += applied
+        totals = self.stats_totals()
+        stats = tuple(total - last for total, last in zip(totals, self.last_stats))
+        self.last_stats = totals
+
+        frame = WorkerFrame(
+            self.seq, calls, self.timeline.position, self.timeline.live_cycle, self.timeline.first_cycle,
+            applied, starved, done, len(self.cycle_queue), arena_block, self.arena.geometry, stats
+        )
+
+        self.seq += 1
+
+        return frame
+
+
+def run_worker(conn, gui_conn, arena, ring, source_factory, keyframe_interval, memory_limit):
+    """target of the worker process, gui_conn is the gui's end of the pipe inherited by fork"""
+    # otherwise the worker would keep the pipe open and never see eof when gui exits
+    gui_conn.close()
+
+    ArenaWorker(conn, arena, ring, source_factory, keyframe_interval, memory_limit).run()
+
+
+class WorkerProcess:
+    """
+    starts the worker process, must be created before QApplication:
+    the process is forked and it must not inherit anything of qt
+
+    source_factory(at_exit) is called in the worker and returns iterable of cycle batches,
+    functions passed to at_exit are called before the worker exits
+    stdin is closed in the worker by multiprocessing, source_factory reads it from its duplicate stdin_fd
+    """
+
+    def __init__(self, arena: SharedArena, source_factory,
+                 keyframe_interval=KEYFRAME_INTERVAL, memory_limit=MEMORY_LIMIT):
+        context = multiprocessing.get_context("fork")
+
+        self.arena = arena
+        self.ring = ChangeRing()
+        self.conn, worker_conn = context.Pipe()
+
+        self.process = context.Process(
+            target=run_worker, daemon=True,
+            args=(worker_conn, self.conn, arena, self.ring, source_factory, keyframe_interval, memory_limit)
+        )
+        self.process.start()
+
+        worker_conn.close()
+
+    def close(self):
+        """stops the worker and releases shared memory"""
+        try:
+            self.conn.send(("quit",))
+        except OSError:
+            pass  # the worker is gone already
+
+        self.process.join(timeout=5)
+
+        if self.process.is_alive():
+            self.process.terminate()
+
+        self.arena.close()
+        self.ring.close()
+
+
+class WorkerClient:
+    """
+    gui side of worker mode, has the interface of StdinListener,
+    timeline of the worker is available as timeline (see RemoteTimeline)
+
+    while playing a timer requests a frame every display frame,
+    if the previous one is not answered yet the next one is requested as soon as it arrives, before drawing it
+    frames are drawn on view as soon as they arrive, a socket notifier watches the pipe
+    stepping, seeking and redrawing wait for their frame
+    """
+
+    def __init__(self, worker: WorkerProcess, view, callback, check_interval_ms=FRAME_INTERVAL_MS):
+        self.worker = worker
+        self.conn = worker.conn
+        self.view = view
+        self.callback = callback
+        self.timeline = RemoteTimeline(self)
+
+        self.pacer = PlaybackPacer()
+        self.paused = True
+        self.read_started = False
+        self.waiting = None  # request sent, frame not received yet
+        self.tick_missed = False  # timer ticked while waiting
+        self.in_call = False
+        self.queued = 0
+        self.worker_lost = False
+
+        self.fast_forward_target = None
+        self.fast_forward_done = None
+
+        self.timer = QTimer()
+        self.timeout = check_interval_ms
+        self.timer.timeout.connect(self.tick)
+
+        self.notifier = QSocketNotifier(self.conn.fileno(), QSocketNotifier.Read)
+        self.notifier.setEnabled(False)
+        self.notifier.activated.connect(self.receive)
+
+    def start_paused(self):
+        self.paused = True
+        self.notifier.setEnabled(True)
+
+    def queue_depth(self):
+        return self.queued
+
+    def request(self, *command):
+        if self.worker_lost:
+            return
+
+        self.waiting = command[0]
+
+        try:
+            self.conn.send(command)
+        except OSError as error:
+            self.lose_worker(error)
+
+    def receive(self):
+        """handles everything the worker has sent"""
+        while not self.worker_lost and self.conn.poll():
+            self.receive_one()
+
+    def receive_one(self):
+        try:
+            message = self.conn.recv()
+        except (EOFError, OSError) as error:
+            self.lose_worker(error)
+            return
+
+        self.handle(message)
+
+    def lose_worker(self, error):
+        """the pipe is broken, the worker has exited or crashed: playback ends at the last drawn frame"""
+        print(f"worker process is gone ({error!r}), playback has ended")
+
+        self.worker_lost = True
+        self.waiting = None
+        self.paused = True
+        self.fast_forward_target = None
+        self.fast_forward_done = None
+        self.timer.stop()
+        self.notifier.setEnabled(False)
+
+    def call(self, *command):
+        """sends the command and draws its frame, waits for a frame requested before it first"""
+        self.in_call = True
+
+        try:
+            while self.waiting:
+                self.receive_one()
+
+            self.request(*command)
+
+            while self.waiting:
+                self.receive_one()
+        finally:
+            self.in_call = False
+
+    def handle(self, message):
+        if message[0] == "started":
+            if not self.read_started:
+                self.read_started = True
+                self.callback(0, "start")
+
+            return
+
+        _, frame = message
+        command, self.waiting = self.waiting, None
+
+        self.timeline.position = frame.position
+        self.timeline.live_cycle = frame.live_cycle
+        self.timeline.first_cycle = frame.first_cycle
+        self.queued = frame.queued
+
+        if command == "play":
+            self.pacer.end_frame(frame.applied, frame.starved)
+
+        # attached before the next frame is requested: if the worker resizes again it unlinks this block
+        if frame.arena_block is not None:
+            self.worker.arena.attach(frame.arena_block, frame.geometry)
+
+        # the worker applies the next frame while this one is drawn
+        if self.tick_missed and not frame.done:
+            self.tick()
+
+        self.draw(frame)
+
+        if frame.done and self.fast_forwarding:
+            self.finish_fast_forward()
+
+    def draw(self, frame: WorkerFrame):
+        start = time.perf_counter()
+        slot = self.worker.ring.slot(frame.seq)
+
+        for name, args in frame.calls:
+            if name in CELL_CALLS:
+                first, count = args
+                args = (slot[first:first + count].tolist(),)
+
+            getattr(self.view, name)(*args)
+
+        counters.add_time("draw", start)
+
+        events, cycles, parse_seconds, apply_seconds = frame.stats
+        counters.events_ingested += events
+        counters.cycles_applied += cycles
+        counters.seconds["parse"] += parse_seconds
+        counters.seconds["apply"] += apply_seconds
+
+        if frame.position is not None:
+            self.view.set_cycle(frame.position)
+            self.view.set_timeline_range(frame.first_cycle, frame.live_cycle)
+
+    def tick(self):
+        """requests the next frame if nothing is requested yet"""
+        self.tick_missed = bool(self.waiting)
+
+        if self.waiting or self.in_call:
+            return
+
+        if self.fast_forwarding:
+            self.request("fast_forward", self.fast_forward_target, FAST_FORWARD_FRAME_MS / 1000)
+        elif not self.paused:
+            self.request("play", self.pacer.start_frame(), self.pacer.frame_budget)
+
+    def wake(self):
+        if self.paused and not self.fast_forwarding:
+            self.timer.stop()
+            return
+
+        self.tick()
+        self.timer.start(self.timeout)
+
+    def read_next_cycle(self):
+        self.call("play", 1, float("inf"))
+
+    @property
+    def fast_forwarding(self):
+        return self.fast_forward_target is not None
+
+    def fast_forward(self, cycle: int, done=None):
+        self.fast_forward_target = cycle
+        self.fast_forward_done = done
+        self.wake()
+
+    def stop_fast_forward(self):
+        if not self.fast_forwarding:
+            return
+
+        self.call("redraw")
+        self.finish_fast_forward()
+
+    def finish_fast_forward(self):
+        target, done = self.fast_forward_target, self.fast_forward_done
+        self.fast_forward_target = None
+        self.fast_forward_done = None
+        self.pacer.reset()
+        self.wake()
+
+        if done:
+            done(target)
+
+    def set_interval(self, interval_ms):
+        self.timeout = interval_ms
+        self.timer.setInterval(interval_ms)
+
+    def set_paused(self, paused=True):
+        self.paused = paused
+        self.pacer.reset()
+        self.wake()
+
+    def slow_down(self):
+        self.pacer.slow_down()
+
+    def speed_up(self):
+        self.pacer.speed_up()
+
+    def set_speed(self, speed: int):
+        self.pacer.set_speed(speed)
+
+    @property
+    def speed(self):
+        return self.pacer.speed
+
+    def speed_label(self):
+        return self.pacer.label()
+
+
+class RemoteTimeline:
+    """cycles of the worker's timeline as of the last frame, seeking is done by the worker"""
+
+    def __init__(self, client: WorkerClient):
+        self.client = client
+        self.position = None
+        self.live_cycle = None
+        self.first_cycle = None
+
+    def seek(self, cycle: int):
+        """moves the worker's state to the cycle, returns the cycle actually restored"""
+        if self.live_cycle is None:
+            return self.position
+
+        self.client.call("seek", cycle)
+
+        return self.position
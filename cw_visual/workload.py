@@ -0,0 +1,164 @@
+import random
+from collections import namedtuple
+from typing import Iterator
+
+from cw_visual.arena import MEM_SIZE, MAX_PLAYERS
+
+
+# shape of a generated match, rates are per cycle
+#   players - count of players
+#   cycles - length of the match
+#   cursors - cursors every player starts with
+#   fork_rate - cursors added, kill_rate - cursors killed
+#   move_rate - share of live cursors moving
+#   write_rate - memory writes, write_size - bytes in one write
+Profile = namedtuple(
+    "Profile",
+    ["players", "cycles", "cursors", "fork_rate", "kill_rate", "move_rate", "write_rate", "write_size"]
+)
+
+profiles = {
+    "few_cursors": Profile(
+        players=2, cycles=20000, cursors=1, fork_rate=0.002, kill_rate=0.001,
+        move_rate=0.3, write_rate=0.1, write_size=4),
+    "many_cursors": Profile(
+        players=4, cycles=1000, cursors=2000, fork_rate=5, kill_rate=5,
+        move_rate=0.1, write_rate=20, write_size=4),
+    "write_heavy": Profile(
+        players=4, cycles=4000, cursors=20, fork_rate=0.05, kill_rate=0.05,
+        move_rate=0.3, write_rate=40, write_size=4),
+    "fork_storm": Profile(
+        players=4, cycles=2000, cursors=1, fork_rate=40, kill_rate=36,
+        move_rate=0.05, write_rate=5, write_size=4),
+    "long_game": Profile(
+        players=2, cycles=200000, cursors=4, fork_rate=0.001, kill_rate=0.001,
+        move_rate=0.25, write_rate=0.2, write_size=4),
+    # default of vm_output_emu.py, something to look at
+    "demo": Profile(
+        players=4, cycles=5000, cursors=1, fork_rate=0.02, kill_rate=0.015,
+        move_rate=1, write_rate=4, write_size=5),
+    # the size of streams of the real vm: 100k cursors, 10M events
+    "vm_scale": Profile(
+        players=4, cycles=1000, cursors=25000, fork_rate=20, kill_rate=20,
+        move_rate=0.1, write_rate=50, write_size=4),
+}
+
+# profiles run by benchmark.py by default
+benchmark_profiles = ["few_cursors", "many_cursors", "write_heavy", "fork_storm", "long_game"]
+
+
+def scaled(profile: Profile, scale: float) -> Profile:
+    """same shape, scale times longer"""
+    return profile._replace(cycles=max(1, round(profile.cycles * scale)))
+
+
+def check_profile(profile: Profile):
+    """raises ValueError if the visualizer cannot show a match of the profile"""
+    if not 1 <= profile.players <= MAX_PLAYERS:
+        raise ValueError(f"players must be from 1 to {MAX_PLAYERS}, not {profile.players}")
+
+
+def count(rng: random.Random, rate: float):
+    """whole part of rate, plus one with probability of the fraction"""
+    whole = int(rate)
+    return whole + (rng.random() < rate - whole)
+
+
+def random_bytes(rng: random.Random, size: int) -> bytes:
+    return rng.getrandbits(size * 8).to_bytes(size, "little")
+
+
+def generate_events(profile: Profile, seed=0, mem_size=MEM_SIZE) -> Iterator[tuple]:
+    """
+    yields events of a match in the form of cw_parser.tokenize_line,
+    the same profile and seed always give the same events
+    cursors do not run real code, they only move, fork, die and write at random
+    """
+    check_profile(profile)
+
+    rng = random.Random(seed)
+
+    # code of all players is written at cycle 1, one cursor stack per player
+    for player in range(1, profile.players + 1):
+        address = (player - 1) * mem_size // profile.players
+        code = random_bytes(rng, 32)
+
+        yield 'p', 1, player, f"player {player}", address, code
+
+    next_carriage = 1
+    alive = []  # carriage ids
+    carriages = dict()  # carriage id -> [player, address]
+
+    def add_cursor(cycle, player, address):
+        nonlocal next_carriage
+        carriage = next_carriage
+        next_carriage += 1
+
+        alive.append(carriage)
+        carriages[carriage] = [player, address]
+
+        return 'c', cycle, player, carriage, address
+
+    for player in range(1, profile.players + 1):
+        address = (player - 1) * mem_size // profile.players
+
+        for _ in range(profile.cursors):
+            yield add_cursor(1, player, address)
+
+    for cycle in range(2, profile.cycles + 1):
+        for _ in range(count(rng, profile.fork_rate)):
+            if alive:
+                player, address = carriages[rng.choice(alive)]
+                yield add_cursor(cycle, player, (address + rng.randrange(-512, 512)) % mem_size)
+
+        for _ in range(count(rng, profile.kill_rate)):
+            if alive:
+                # swap with the last one so removal is O(1)
+                i = rng.randrange(len(alive))
+                alive[i], alive[-1] = alive[-1], alive[i]
+                carriage = alive.pop()
+                player, _ = carriages.pop(carriage)
+
+                yield 'k', cycle, player, carriage
+
+        if alive:
+            for carriage in rng.sample(alive, count(rng, len(alive) * profile.move_rate)):
+                cursor = carriages[carriage]
+                offset = rng.choice((1, 2, 3, 5, 7))
+                cursor[1] = (cursor[1] + offset) % mem_size
+
+                yield 'm', cycle, cursor[0], carriage, offset
+
+        for _ in range(count(rng, profile.write_rate)):
+            if alive:
+                player, address = carriages[rng.choice(alive)]
+                data = random_bytes(rng, profile.write_size)
+
+                yield 'w', cycle, player, (address + rng.randrange(-64, 64)) % mem_size, data
+
+    # the last player standing wins
+    winner = carriages[alive[0]][0] if alive else 1
+    yield 'e', profile.cycles, winner
+
+
+# command -> text protocol line of its fields
+line_formats = {
+    'p': 'p"{}"{}"{}"{}"{}',
+    'c': 'c"{}"{}"{}"{}',
+    'k': 'k"{}"{}"{}',
+    'm': 'm"{}"{}"{}"{}',
+    'w': 'w"{}"{}"{}"{}',
+    'e': 'e"{}"{}',
+    'h': 'h"{}"{}"{}',
+}
+
+
+def event_line(event: tuple) -> str:
+    """line of text protocol for the event"""
+    command = event[0]
+
+    # code and written data are the last fields, sent as hex
+    if command == 'p' or command == 'w':
+        return line_formats[command].format(*event[1:-1], event[-1].hex())
+
+    return line_formats[command].format(*event[1:])
@@ -0,0 +1,96 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from cw_visual.binary_protocol import (
+    BinaryDecoder, BinaryWriter, FRAME_HEADER, MAGIC, ProtocolError, decode_frame
+)
+
+
+def binary_stream(write):
+    """bytes written by BinaryWriter, write(writer) adds the events"""
+    stream = io.BytesIO()
+    writer = BinaryWriter(stream)
+    write(writer)
+    writer.close()
+
+    return stream.getvalue()
+
+
+class MalformedFrameTest(unittest.TestCase):
+    def test_unknown_command_raises_protocol_error(self):
+        payload = memoryview(b"e\x00\x00" + b"\xff")
+
+        with self.assertRaises(ProtocolError) as raised:
+            decode_frame(7, payload, stream_offset=100)
+
+        self.assertEqual(raised.exception.cycle, 7)
+        self.assertEqual(raised.exception.offset, 103)
+        self.assertEqual(raised.exception.events, [('e', 7, 0)])
+
+    def test_truncated_record_raises_protocol_error(self):
+        with self.assertRaises(ProtocolError) as raised:
+            decode_frame(1, memoryview(b"c\x00\x00\x01"))
+
+        self.assertEqual(raised.exception.offset, 0)
+
+    def test_truncated_player_code_raises_protocol_error(self):
+        frame = binary_stream(lambda writer: writer.add_player(1, 0, "batman", 0, b"\x01\x02\x03"))
+        payload = frame[len(MAGIC) + FRAME_HEADER.size:-1]
+
+        with self.assertRaises(ProtocolError):
+            decode_frame(1, memoryview(payload))
+
+    def test_decoder_reports_bad_record_and_goes_on(self):
+        def write(writer):
+            writer.add_player(1, 0, "batman", 0, b"")
+            writer.add_player(1, 1, "robin", 0, b"")
+            writer.declare_winner(1, 0)
+            writer.payload.append(0xff)  # corrupt command byte
+            writer.declare_winner(2, 1)
+
+        output = io.StringIO()
+
+        with redirect_stdout(output):
+            batches = BinaryDecoder().feed(binary_stream(write))
+
+        self.assertEqual(batches[0].events[-1], ('e', 1, 0))
+        self.assertEqual(batches[1].events, [('e', 2, 1)])
+        self.assertIn("cycle 1", output.getvalue())
+        self.assertIn("unknown command 0xff", output.getvalue())
+
+
+class ShortWriteTest(unittest.TestCase):
+    def decode(self, write):
+        """events written by write(writer), after those of the player it writes for"""
+        def write_with_player(writer):
+            writer.add_player(1, 1, "batman", 0, b"")
+            write(writer)
+
+        batches = BinaryDecoder().feed(binary_stream(write_with_player))
+
+        return [event for batch in batches for event in batch.events][1:]
+
+    def test_short_write_keeps_its_length(self):
+        events = self.decode(lambda writer: writer.write_memory(3, 1, 100, b"\xab\xcd"))
+
+        self.assertEqual(events, [('w', 3, 0, 100, b"\xab\xcd")])
+
+    def test_register_write_is_packed(self):
+        data = b"\x01\x02\x03\x04"
+        stream = binary_stream(lambda writer: writer.write_memory(3, 1, 100, data))
+
+        self.assertEqual(len(stream), len(MAGIC) + FRAME_HEADER.size + 1 + 10)
+        self.assertEqual(self.decode(lambda writer: writer.write_memory(3, 1, 100, data)),
+                         [('w', 3, 0, 100, data)])
+
+    def test_long_write_is_split(self):
+        data = bytes(range(256)) * 300
+        events = self.decode(lambda writer: writer.write_memory(5, 1, 10, data))
+
+        self.assertEqual(b"".join(event[4] for event in events), data)
+        self.assertEqual([event[3] for event in events], [10, 10 + 0xffff])
+
+
+if __name__ == "__main__":
+    unittest.main()
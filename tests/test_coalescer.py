@@ -0,0 +1,92 @@
+import itertools
+import unittest
+
+import numpy as np
+
+from cw_visual.arena import Arena
+from cw_visual.coalescer import ChangeCoalescer
+from cw_visual.cw_parser import CorewarParser, IdInterner
+from cw_visual.state_manager import CorewarStateManager, NullView
+from cw_visual.workload import profiles, scaled, generate_events
+
+
+class MirrorView(NullView):
+    """copies cells of the arena it is asked to redraw, so it shows what a real view would"""
+
+    def __init__(self, arena: Arena):
+        self.arena = arena
+        self.values = np.zeros(arena.size, dtype=np.uint8)
+        self.owners = np.zeros(arena.size, dtype=np.uint8)
+        self.occupied = np.zeros(arena.size, dtype=bool)
+        self.cursor_counts = dict()
+
+    def redraw_cells(self, cells):
+        cells = list(cells)
+        self.values[cells] = self.arena.values[cells]
+        self.owners[cells] = self.arena.owners[cells]
+
+    def redraw_cursor_cells(self, cells):
+        cells = list(cells)
+        self.occupied[cells] = self.arena.occupied(cells)
+
+    def set_cursor_count(self, player_number, count):
+        self.cursor_counts[player_number] = count
+
+
+def played(flush_every: int):
+    """arena and view after a generated match, changes are flushed every flush_every cycles"""
+    arena = Arena()
+    view = MirrorView(arena)
+    manager = CorewarStateManager(view, arena)
+    parser = CorewarParser(manager)
+    ids = IdInterner()
+
+    events = (ids.intern(event) for event in generate_events(scaled(profiles["fork_storm"], 0.15)))
+
+    for cycle, cycle_events in itertools.groupby(events, key=lambda event: event[1]):
+        parser.apply_events(list(cycle_events))
+
+        if cycle % flush_every == 0:
+            manager.flush()
+
+    manager.flush()
+
+    return arena, view
+
+
+class ChangeCoalescerTest(unittest.TestCase):
+    def test_coalesced_flush_equals_per_cycle_flush(self):
+        arena, view = played(flush_every=1)
+
+        for flush_every in (7, 100):
+            coalesced_arena, coalesced_view = played(flush_every)
+
+            self.assertTrue(np.array_equal(coalesced_arena.values, arena.values))
+            self.assertTrue(np.array_equal(coalesced_arena.cursor_counts, arena.cursor_counts))
+            self.assertTrue(np.array_equal(coalesced_view.values, view.values))
+            self.assertTrue(np.array_equal(coalesced_view.owners, view.owners))
+            self.assertTrue(np.array_equal(coalesced_view.occupied, view.occupied))
+            self.assertEqual(coalesced_view.cursor_counts, view.cursor_counts)
+
+    def test_view_shows_the_arena(self):
+        arena, view = played(flush_every=100)
+
+        self.assertTrue(np.array_equal(view.values, arena.values))
+        self.assertTrue(np.array_equal(view.owners, arena.owners))
+        self.assertTrue(np.array_equal(view.occupied, arena.cursor_counts.any(axis=1)))
+
+    def test_only_the_first_origin_of_a_cursor_is_kept(self):
+        changes = ChangeCoalescer()
+
+        changes.cursor_changed(3, 10, 0)
+        changes.cursor_changed(3, 15, 0)
+        changes.cursor_added(4, 1)
+        changes.cursor_killed(4, 20, 1)
+        changes.cells_written(4094, 4, 4096)
+
+        cursor_origins, written_cells, touched_players = changes.take()
+
+        self.assertEqual(cursor_origins, {3: (10, 0), 4: None})
+        self.assertEqual(written_cells, {4094, 4095, 0, 1})
+        self.assertEqual(touched_players, {1})
+        self.assertTrue(changes.is_empty())
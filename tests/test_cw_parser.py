@@ -0,0 +1,76 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from cw_visual.arena import Arena, MAX_PLAYERS
+from cw_visual.cw_parser import CorewarParser, IdInterner, tokenize_line
+from cw_visual.state_manager import CorewarStateManager, NullView, FREE_SLOT
+
+
+class IdInternerTest(unittest.TestCase):
+    def setUp(self):
+        self.ids = IdInterner()
+
+    def intern(self, line):
+        with redirect_stdout(io.StringIO()):
+            return tokenize_line(line, self.ids)
+
+    def test_players_are_numbered_in_order_of_appearance(self):
+        self.assertEqual(self.intern('p"1"0xa"batman"0"01')[:3], ('p', 1, 0))
+        self.assertEqual(self.intern('p"1"0xb"robin"64"01')[:3], ('p', 1, 1))
+        self.assertEqual(self.intern('w"2"0xb"5"AB'), ('w', 2, 1, 5, b"\xab"))
+        self.assertEqual(self.intern('e"3"0xa'), ('e', 3, 0))
+
+    def test_players_beyond_max_players_are_rejected(self):
+        for number in range(MAX_PLAYERS):
+            self.assertEqual(self.intern(f'p"1"0x{number}"bot"0"01')[:3], ('p', 1, number))
+
+        output = io.StringIO()
+
+        with redirect_stdout(output):
+            self.assertIsNone(tokenize_line('p"1"0xff"extra"0"01', self.ids))
+            self.assertIsNone(tokenize_line('c"1"0xff"0x10"0', self.ids))
+
+        self.assertIn("too many players", output.getvalue())
+
+    def test_slots_of_killed_carriages_are_reused(self):
+        self.intern('p"1"0xa"batman"0"01')
+
+        self.assertEqual(self.intern('c"1"0xa"0x10"0'), ('c', 1, 0, 0, 0))
+        self.assertEqual(self.intern('c"1"0xa"0x20"4'), ('c', 1, 0, 1, 4))
+        self.assertEqual(self.intern('k"2"0xa"0x10'), ('k', 2, 0, 0))
+
+        # the same pointer may be printed again for another carriage
+        self.assertEqual(self.intern('c"3"0xa"0x20"8'), None)
+        self.assertEqual(self.intern('c"3"0xa"0x10"8'), ('c', 3, 0, 0, 8))
+        self.assertEqual(self.intern('c"3"0xa"0x30"8'), ('c', 3, 0, 2, 8))
+        self.assertEqual(self.intern('m"4"0xa"0x20"5'), ('m', 4, 0, 1, 5))
+
+    def test_unknown_ids_are_reported_and_skipped(self):
+        output = io.StringIO()
+
+        with redirect_stdout(output):
+            self.assertIsNone(tokenize_line('m"1"0xa"0x10"1', self.ids))
+            tokenize_line('p"1"0xa"batman"0"01', self.ids)
+            self.assertIsNone(tokenize_line('k"2"0xa"0x10', self.ids))
+            self.assertIsNone(tokenize_line('p"2"0xa"batman"0"01', self.ids))
+
+        self.assertIn("unknown player", output.getvalue())
+        self.assertIn("unknown carriage", output.getvalue())
+        self.assertIn("player already exists", output.getvalue())
+
+    def test_interned_events_are_applied_to_slots(self):
+        manager = CorewarStateManager(NullView(), Arena())
+        parser = CorewarParser(manager)
+
+        parser.parse_corewar_output([
+            'p"1"0xa"batman"0"01', 'c"1"0xa"0x10"0', 'c"1"0xa"0x20"10', 'k"2"0xa"0x10', 'm"2"0xa"0x20"3'])
+        manager.flush()
+
+        self.assertEqual(list(manager.cursor_player), [FREE_SLOT, 0])
+        self.assertEqual(list(manager.cursor_addr)[1], 13)
+        self.assertEqual(manager.players[0].cursors_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import io
+import os
+import socket
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from cw_visual.cycle_batcher import NEW_STREAM_CYCLE
+from cw_visual.listen_server import ListenServer, tcp_address
+
+MATCH = (
+    'p"1"0xa"batman"0"01020304\n'
+    'w"2"0xa"100"AB\n'
+    'w"3"0xa"101"CD\n'
+)
+
+
+class ListenServerTest(unittest.TestCase):
+    def setUp(self):
+        output = redirect_stdout(io.StringIO())
+        output.__enter__()
+        self.addCleanup(output.__exit__, None, None, None)
+
+    def listen(self, address):
+        server = ListenServer(address)
+        self.addCleanup(server.close)
+
+        return server, iter(server)
+
+    def tcp_server(self):
+        server, batches = self.listen("tcp:0")
+        port = server.server.getsockname()[1]
+
+        return batches, lambda: socket.create_connection(("127.0.0.1", port))
+
+    def take(self, batches, count):
+        return [(batch.cycle, [event[0] for event in batch.events]) for _, batch in zip(range(count), batches)]
+
+    def test_tcp_address(self):
+        self.assertEqual(tcp_address("tcp:4242"), ("127.0.0.1", 4242))
+        self.assertEqual(tcp_address("tcp:0.0.0.0:4242"), ("0.0.0.0", 4242))
+        self.assertIsNone(tcp_address("/tmp/corewar.sock"))
+
+    def test_every_connection_is_a_new_stream(self):
+        batches, connect = self.tcp_server()
+
+        for _ in range(2):
+            with connect() as vm:
+                vm.sendall(MATCH.encode())
+
+            self.assertEqual(self.take(batches, 4),
+                             [(NEW_STREAM_CYCLE, []), (1, ['p']), (2, ['w']), (3, ['w'])])
+
+    def test_new_connection_replaces_the_connected_vm(self):
+        batches, connect = self.tcp_server()
+
+        first = connect()
+        self.addCleanup(first.close)
+        first.sendall(MATCH.encode())
+
+        # the last cycle of the first vm is not complete while it is connected
+        self.assertEqual(self.take(batches, 3), [(NEW_STREAM_CYCLE, []), (1, ['p']), (2, ['w'])])
+
+        with connect() as vm:
+            vm.sendall(MATCH[:MATCH.index("w")].encode())
+
+        self.assertEqual(self.take(batches, 2), [(NEW_STREAM_CYCLE, []), (1, ['p'])])
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "no unix sockets")
+    def test_unix_socket_file_is_removed_on_close(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "corewar.sock")
+            server, batches = self.listen(path)
+
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as vm:
+                vm.connect(path)
+                vm.sendall(MATCH.encode())
+
+            self.assertEqual(len(self.take(batches, 4)), 4)
+
+            server.close()
+            self.assertFalse(os.path.exists(path))
@@ -0,0 +1,69 @@
+import unittest
+from unittest import mock
+
+from cw_visual.playback import PlaybackPacer, speeds, UNLIMITED
+
+
+class PlaybackPacerTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 100.0
+        patcher = mock.patch("cw_visual.playback.time.perf_counter", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.pacer = PlaybackPacer()
+        self.pacer.set_speed(speeds.index(1000))
+
+    def frame_after(self, seconds: float):
+        self.now += seconds
+        return self.pacer.start_frame()
+
+    def test_cycles_are_owed_at_the_rate_of_speed(self):
+        self.assertEqual(self.frame_after(0), 1)
+        self.pacer.end_frame(1, starved=False)
+
+        self.assertEqual(self.frame_after(0.125), 125)
+
+        # cycles not applied within the budget are owed in the next frame
+        self.pacer.end_frame(60, starved=False)
+        self.assertEqual(self.frame_after(0.125), 190)
+
+    def test_starving_forgets_owed_cycles(self):
+        self.frame_after(0)
+        self.pacer.end_frame(1, starved=False)
+        self.frame_after(0.125)
+        self.pacer.end_frame(10, starved=True)
+
+        self.assertEqual(self.frame_after(0.0625), 62)
+
+    def test_long_stall_is_not_caught_up(self):
+        self.frame_after(0)
+        self.pacer.end_frame(1, starved=False)
+
+        self.assertEqual(self.frame_after(60), 250)
+
+    def test_reset_starts_over_with_one_cycle(self):
+        self.frame_after(0)
+        self.frame_after(0.125)
+        self.pacer.reset()
+
+        self.assertEqual(self.frame_after(5), 1)
+
+    def test_unlimited_speed_applies_as_many_cycles_as_fit_the_budget(self):
+        self.pacer.set_speed(speeds.index(UNLIMITED))
+
+        self.assertEqual(self.frame_after(0), float("inf"))
+        self.assertEqual(self.pacer.label(), "max")
+        self.assertTrue(self.pacer.within_budget())
+
+        self.now += self.pacer.frame_budget
+        self.assertFalse(self.pacer.within_budget())
+
+    def test_speed_is_clamped(self):
+        self.pacer.set_speed(-3)
+        self.pacer.slow_down()
+        self.assertEqual(self.pacer.cycles_per_second, speeds[0])
+
+        self.pacer.set_speed(len(speeds) + 3)
+        self.pacer.speed_up()
+        self.assertEqual(self.pacer.cycles_per_second, speeds[-1])
@@ -0,0 +1,104 @@
+import io
+import os
+import tempfile
+import itertools
+import unittest
+from contextlib import redirect_stdout
+
+import numpy as np
+
+from cw_visual.arena import Arena
+from cw_visual.cycle_batcher import CycleBatch
+from cw_visual.cw_parser import CorewarParser, IdInterner, tokenize_line
+from cw_visual.state_manager import CorewarStateManager, NullView
+from cw_visual.trace import TraceWriter, TraceReader
+
+# text vm output with a short write next to cells written before
+TEXT_LINES = [
+    'h"0"4096"64',
+    'p"1"0x7ffd01"batman"0"4A16AF8542E56179',
+    'p"1"0x7ffd02"robin"2048"01020304',
+    'c"1"0x7ffd01"0x5501"0',
+    'c"1"0x7ffd02"0x5502"2048',
+    'm"2"0x7ffd01"0x5501"5',
+    'w"3"0x7ffd01"100"01AF223F',
+    'w"4"0x7ffd02"101"FFFF',
+    'w"4"0x7ffd02"200"AB',
+    'k"5"0x7ffd01"0x5501',
+    'e"6"0x7ffd02',
+]
+
+
+def text_events(lines):
+    """events of the lines as the reader thread tokenizes and interns them"""
+    ids = IdInterner()
+
+    with redirect_stdout(io.StringIO()):
+        events = [tokenize_line(line, ids) for line in lines]
+
+    return [event for event in events if event]
+
+
+def binary_events(events):
+    """events recorded in binary protocol by TraceWriter (as --write-trace does), then read back"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "match.cwt")
+        writer = TraceWriter(path)
+
+        for cycle, cycle_events in itertools.groupby(events, key=lambda event: event[1]):
+            writer.write_batch(CycleBatch(cycle, list(cycle_events)))
+
+        writer.close()
+
+        reader = TraceReader(path)
+        decoded = [event for batch in reader for event in batch.events]
+
+    return decoded
+
+
+def applied_state(events):
+    arena = Arena()
+    manager = CorewarStateManager(NullView(), arena)
+    CorewarParser(manager).apply_events(events)
+    manager.flush()
+
+    return arena, manager
+
+
+class RoundTripTest(unittest.TestCase):
+    def test_events_survive_text_to_binary(self):
+        text = text_events(TEXT_LINES)
+        binary = binary_events(text)
+
+        # pointer strings of text are interned before they are recorded
+        self.assertEqual(binary, text)
+
+    def test_both_protocols_decode_to_the_same_state(self):
+        text = text_events(TEXT_LINES)
+        text_arena, text_manager = applied_state(text)
+        binary_arena, binary_manager = applied_state(binary_events(text))
+
+        self.assertTrue(np.array_equal(text_arena.values, binary_arena.values))
+        self.assertTrue(np.array_equal(text_arena.owners, binary_arena.owners))
+        self.assertTrue(np.array_equal(text_arena.cursor_counts, binary_arena.cursor_counts))
+        self.assertEqual(text_manager.winner, binary_manager.winner)
+
+    def test_short_write_leaves_neighbours_alone(self):
+        arena, _ = applied_state(binary_events(text_events(TEXT_LINES)))
+
+        self.assertEqual(bytes(arena.values[200:204]), b"\xab\x00\x00\x00")
+        self.assertEqual(arena.owners[201], 0)
+
+    def test_unknown_text_command_is_reported_and_skipped(self):
+        output = io.StringIO()
+
+        with redirect_stdout(output):
+            event = tokenize_line('x"1"2')
+
+        self.assertIsNone(event)
+        self.assertIn("unknown command", output.getvalue())
+        self.assertEqual(len(text_events(TEXT_LINES + ['x"7"1'])), len(TEXT_LINES))
+
+
+if __name__ == "__main__":
+    unittest.main()
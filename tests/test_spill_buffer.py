@@ -0,0 +1,101 @@
+import os
+import threading
+import unittest
+
+from cw_visual.cycle_batcher import CycleBatch
+from cw_visual.spill_buffer import SpillBuffer, EVENT_BYTES
+
+
+def batch(cycle: int, events=10):
+    return CycleBatch(cycle, [('m', cycle, 0, slot, cycle % 4096) for slot in range(events)])
+
+
+class SpillBufferTest(unittest.TestCase):
+    def setUp(self):
+        # room for three batches of 10 events
+        self.buffer = SpillBuffer(memory_bytes=30 * EVENT_BYTES)
+
+    def tearDown(self):
+        self.buffer.close()
+
+    def drain(self):
+        batches = []
+
+        while not self.buffer.empty():
+            batches.append(self.buffer.get())
+
+        return batches
+
+    def test_overflow_is_spilled_to_disk(self):
+        for cycle in range(3):
+            self.buffer.put(batch(cycle))
+
+        self.assertIsNone(self.buffer.file)
+
+        for cycle in range(3, 10):
+            self.buffer.put(batch(cycle))
+
+        self.assertIsNotNone(self.buffer.file)
+        self.assertEqual(len(self.buffer.window), 3)
+        self.assertEqual(len(self.buffer), 10)
+
+    def test_batches_are_read_back_in_order(self):
+        for cycle in range(10):
+            self.buffer.put(batch(cycle))
+
+        # batches put while spilled batches are read back go to disk after them
+        first = [self.buffer.get() for _ in range(5)]
+
+        for cycle in range(10, 15):
+            self.buffer.put(batch(cycle))
+
+        self.assertEqual(first + self.drain(), [batch(cycle) for cycle in range(15)])
+        self.assertIsNone(self.buffer.get())
+
+    def test_memory_is_used_again_once_spilled_batches_are_read(self):
+        for cycle in range(5):
+            self.buffer.put(batch(cycle))
+
+        self.drain()
+        self.buffer.put(batch(5))
+
+        self.assertEqual(list(self.buffer.window), [batch(5)])
+        self.assertEqual(os.fstat(self.buffer.file.fileno()).st_size, 0)
+
+    def test_big_batch_is_kept_in_memory_if_window_is_empty(self):
+        self.buffer.put(batch(0, events=100))
+
+        self.assertIsNone(self.buffer.file)
+        self.assertEqual(self.buffer.get(), batch(0, events=100))
+
+    def test_close_removes_temp_file(self):
+        for cycle in range(5):
+            self.buffer.put(batch(cycle))
+
+        file = self.buffer.file
+        self.buffer.close()
+
+        self.assertTrue(file.closed)
+        self.assertIsNone(self.buffer.file)
+
+    def test_reader_and_consumer_threads_keep_order(self):
+        cycles = 2000
+
+        def produce():
+            for cycle in range(cycles):
+                self.buffer.put(batch(cycle, events=cycle % 7))
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+
+        received = []
+
+        while len(received) < cycles:
+            next_batch = self.buffer.get()
+
+            if next_batch is not None:
+                received.append(next_batch.cycle)
+
+        producer.join()
+
+        self.assertEqual(received, list(range(cycles)))
@@ -0,0 +1,62 @@
+import io
+import gzip
+import lzma
+import unittest
+from contextlib import redirect_stdout
+
+from cw_visual.stream_decoder import StreamDecoder
+
+TEXT = "".join(
+    f'p"1"0x{player}"bot"{player * 1024}"01020304\n' for player in range(2)
+) + "".join(
+    f'w"{cycle}"0x{cycle % 2}"{cycle}"AB\n' for cycle in range(1, 40)
+)
+DATA = TEXT.encode()
+
+
+def decode(stream: bytes, chunk_size=5):
+    """events of the stream fed in chunks of chunk_size, and what was reported"""
+    decoder = StreamDecoder()
+    output = io.StringIO()
+    batches = []
+
+    with redirect_stdout(output):
+        for start in range(0, len(stream), chunk_size):
+            batches += decoder.feed(stream[start:start + chunk_size])
+
+        batches += decoder.finish()
+
+    return [event for batch in batches for event in batch.events], output.getvalue()
+
+
+class StreamDecoderTest(unittest.TestCase):
+    def setUp(self):
+        self.events, _ = decode(DATA)
+
+    def test_gzip_and_xz_are_decompressed(self):
+        for compressed in (gzip.compress(DATA), lzma.compress(DATA)):
+            for chunk_size in (1, 5, len(compressed)):
+                self.assertEqual(decode(compressed, chunk_size), (self.events, ""))
+
+    def test_concatenated_members_are_decompressed(self):
+        middle = len(DATA) // 2
+        stream = gzip.compress(DATA[:middle]) + lzma.compress(DATA[middle:])
+
+        for chunk_size in (1, 5, len(stream)):
+            self.assertEqual(decode(stream, chunk_size), (self.events, ""))
+
+    def test_garbage_after_compressed_stream_ends_it(self):
+        for garbage in (b"junk after the member", b"ju"):
+            events, output = decode(gzip.compress(DATA) + garbage)
+
+            self.assertEqual(events, self.events)
+            self.assertIn("garbage after compressed stream", output)
+
+    def test_bad_compressed_data_ends_stream(self):
+        # a member with gzip header and a deflate block of reserved type
+        bad_member = gzip.compress(b"")[:10] + b"\xff" * 8
+
+        events, output = decode(gzip.compress(DATA) + bad_member + gzip.compress(DATA))
+
+        self.assertEqual(events, self.events)
+        self.assertIn("bad compressed data", output)
@@ -0,0 +1,100 @@
+import itertools
+import unittest
+
+import numpy as np
+
+from cw_visual.arena import Arena
+from cw_visual.cw_parser import CorewarParser, IdInterner
+from cw_visual.cycle_batcher import CycleBatch
+from cw_visual.state_manager import CorewarStateManager, NullView
+from cw_visual.timeline import Timeline
+from cw_visual.workload import profiles, scaled, generate_events
+
+
+def match_batches(profile=scaled(profiles["fork_storm"], 0.15)):
+    """batches of a generated match, interned as the reader thread does"""
+    ids = IdInterner()
+    events = [ids.intern(event) for event in generate_events(profile)]
+
+    return [CycleBatch(cycle, list(cycle_events))
+            for cycle, cycle_events in itertools.groupby(events, key=lambda event: event[1])]
+
+
+def state_of(manager: CorewarStateManager):
+    manager.flush()
+    arena = manager.arena
+
+    return (arena.values.copy(), arena.owners.copy(), arena.cursor_counts.copy(),
+            [(player.name, player.cursors_count) for player in manager.players],
+            list(manager.cursor_addr), list(manager.cursor_player), manager.winner)
+
+
+def replayed_state(batches, cycle: int):
+    """state after applying every batch up to the cycle one after another"""
+    manager = CorewarStateManager(NullView(), Arena())
+    parser = CorewarParser(manager)
+
+    for batch in batches:
+        if batch.cycle > cycle:
+            break
+
+        parser.apply_events(batch.events)
+
+    return state_of(manager)
+
+
+class TimelineTest(unittest.TestCase):
+    def setUp(self):
+        self.batches = match_batches()
+        self.manager = CorewarStateManager(NullView(), Arena())
+        self.timeline = Timeline(CorewarParser(self.manager), self.manager, keyframe_interval=40)
+
+    def play(self, batches):
+        for batch in batches:
+            self.timeline.apply(batch.cycle, batch.events)
+            self.manager.flush()
+
+    def assertStateEqual(self, first, second):
+        for first_part, second_part in zip(first, second):
+            if isinstance(first_part, np.ndarray):
+                self.assertTrue(np.array_equal(first_part, second_part))
+            else:
+                self.assertEqual(first_part, second_part)
+
+    def test_seek_equals_linear_replay(self):
+        self.play(self.batches)
+        live_cycle = self.batches[-1].cycle
+
+        for cycle in (live_cycle, 1, 40, 41, 123, 79, live_cycle - 1, 200):
+            self.assertEqual(self.timeline.seek(cycle), cycle)
+            self.assertStateEqual(state_of(self.manager), replayed_state(self.batches, cycle))
+
+    def test_redo_after_seek_reaches_live_state(self):
+        self.play(self.batches)
+        self.timeline.seek(57)
+
+        redone = []
+
+        while True:
+            batch = self.timeline.next_redo()
+
+            if batch is None:
+                break
+
+            redone.append(batch.cycle)
+            self.play([batch])
+
+        self.assertEqual(redone, [batch.cycle for batch in self.batches if batch.cycle > 57])
+        self.assertEqual(self.timeline.position, self.timeline.live_cycle)
+        self.assertStateEqual(state_of(self.manager), replayed_state(self.batches, self.batches[-1].cycle))
+
+    def test_seek_is_clamped_to_kept_history(self):
+        # a limit of about two keyframes, older ones are dropped
+        self.timeline.memory_limit = 2 * self.manager.snapshot().size
+        self.play(self.batches)
+
+        first_cycle = self.timeline.first_cycle
+        self.assertGreater(first_cycle, 1)
+
+        self.assertEqual(self.timeline.seek(0), first_cycle)
+        self.assertStateEqual(state_of(self.manager), replayed_state(self.batches, first_cycle))
@@ -0,0 +1,138 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from cw_visual.arena import Arena
+from cw_visual.cycle_batcher import CycleBatch
+from cw_visual.cw_parser import CorewarParser, IdInterner
+from cw_visual.state_manager import CorewarStateManager, NullView
+from cw_visual.trace import TraceWriter, TraceReader
+
+# cycles with events, the cycles between them have none
+CYCLES = [1, 5, 9]
+
+
+def match_batch(cycle):
+    """a player and its cursor appear at the first cycle, the cursor moves and writes at the others"""
+    if cycle == CYCLES[0]:
+        return CycleBatch(cycle, [('p', cycle, "0x1", "bot", 0, b"\x01\x02"), ('c', cycle, "0x1", "0x2", 0)])
+
+    return CycleBatch(cycle, [('m', cycle, "0x1", "0x2", cycle), ('w', cycle, "0x1", cycle * 10, bytes([cycle]))])
+
+
+def write_trace(path, close=True, keyframe_interval=1000):
+    writer = TraceWriter(path, keyframe_interval=keyframe_interval)
+    ids = IdInterner()
+
+    for cycle in CYCLES:
+        batch = match_batch(cycle)
+        writer.write_batch(CycleBatch(cycle, [ids.intern(event) for event in batch.events]))
+
+    if close:
+        writer.close()
+    else:
+        writer.file.flush()  # recording interrupted, no index and footer
+
+    return writer
+
+
+class TraceIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "match.cwt")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def check_index(self, reader: TraceReader):
+        self.assertEqual(reader.first_cycle, 1)
+        self.assertEqual(reader.last_cycle, 9)
+
+        for cycle in range(0, 12):
+            first = [batch.cycle for batch in reader.batches(cycle)][:1]
+            expected = [c for c in CYCLES if c >= cycle][:1]
+
+            self.assertEqual(first, expected, f"start at cycle {cycle}")
+
+        self.assertEqual(reader.offset_of(2), reader.offset_of(5))
+        self.assertLess(reader.offset_of(5), reader.offset_of(6))
+        self.assertEqual(reader.offset_of(100), reader.body_end)
+
+    def test_index_of_closed_trace(self):
+        write_trace(self.path)
+        self.check_index(TraceReader(self.path))
+
+    def test_index_of_interrupted_trace_is_rebuilt(self):
+        writer = write_trace(self.path, close=False)
+        self.check_index(TraceReader(self.path))
+        writer.close()
+
+    def test_batches_from_cycle_are_decoded(self):
+        write_trace(self.path)
+        batches = list(TraceReader(self.path).batches(4))
+
+        self.assertEqual([batch.cycle for batch in batches], [5, 9])
+        self.assertEqual(batches[0].events, [('m', 5, 0, 0, 5), ('w', 5, 0, 50, b"\x05")])
+
+
+def state_at(reader: TraceReader, cycle: int, from_keyframe: bool):
+    manager = CorewarStateManager(NullView(), Arena())
+    parser = CorewarParser(manager)
+    start = 0
+
+    if from_keyframe:
+        start, snapshot = reader.keyframe_before(cycle)
+        manager.restore(snapshot)
+        start += 1
+
+    for batch in reader.batches(start):
+        if batch.cycle > cycle:
+            break
+
+        parser.apply_events(batch.events)
+
+    manager.flush()
+
+    return manager.arena, [(player.name, player.cursors_count) for player in manager.players], manager.cursor_addr
+
+
+class TraceKeyframeTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "match.cwt")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_keyframes_are_taken_every_interval(self):
+        write_trace(self.path, keyframe_interval=4)
+        reader = TraceReader(self.path)
+
+        self.assertEqual(list(reader.keyframe_cycles), [1, 5, 9])
+        self.assertIsNone(reader.keyframe_before(0))
+        self.assertEqual(reader.keyframe_before(8)[0], 5)
+
+    def test_state_from_keyframe_is_state_replayed_from_start(self):
+        write_trace(self.path, keyframe_interval=4)
+        reader = TraceReader(self.path)
+
+        for cycle in range(1, 12):
+            arena, players, cursors = state_at(reader, cycle, from_keyframe=True)
+            expected_arena, expected_players, expected_cursors = state_at(reader, cycle, from_keyframe=False)
+
+            self.assertTrue(np.array_equal(arena.values, expected_arena.values), f"cycle {cycle}")
+            self.assertTrue(np.array_equal(arena.owners, expected_arena.owners), f"cycle {cycle}")
+            self.assertTrue(np.array_equal(arena.cursor_counts, expected_arena.cursor_counts), f"cycle {cycle}")
+            self.assertEqual(players, expected_players)
+            self.assertEqual(cursors, expected_cursors)
+
+    def test_interrupted_trace_has_no_keyframes(self):
+        writer = write_trace(self.path, close=False, keyframe_interval=4)
+        self.assertIsNone(TraceReader(self.path).keyframe_before(9))
+        writer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+
+from cw_visual.shared_arena import ChangeRing
+from cw_visual.worker import ChangeListView
+
+
+class ChangeListViewTest(unittest.TestCase):
+    def setUp(self):
+        self.ring = ChangeRing(slots=2, slot_cells=4)
+        self.addCleanup(self.ring.close)
+
+        self.view = ChangeListView()
+
+    def test_cells_are_passed_through_ring_slot(self):
+        self.view.add_player("batman")
+        self.view.redraw_cells([7, 8])
+        self.view.redraw_cursor_cells([100])
+
+        slot = self.ring.slot(0)
+
+        self.assertEqual(self.view.take(slot), [
+            ("add_player", ("batman",)),
+            ("redraw_cells", (0, 2)),
+            ("redraw_cursor_cells", (2, 1)),
+        ])
+        self.assertEqual(slot[:3].tolist(), [7, 8, 100])
+        self.assertEqual(self.view.calls, [])
+
+    def test_overflow_keeps_every_other_call_and_redraws_arena(self):
+        self.view.redraw_cells([1, 2, 3])
+        self.view.set_cursor_count(0, 5)
+        self.view.redraw_cursor_cells([4, 5])
+        self.view.declare_winner(0)
+
+        self.assertEqual(self.view.take(self.ring.slot(0)), [
+            ("set_cursor_count", (0, 5)),
+            ("declare_winner", (0,)),
+            ("redraw_arena", ()),
+        ])
+
+    def test_slots_are_reused_around_the_ring(self):
+        self.ring.slot(0)[0] = 42
+
+        self.assertEqual(self.ring.slot(2)[0], 42)
+        self.assertNotEqual(self.ring.slot(1)[0], 42)
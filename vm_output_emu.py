@@ -1,98 +1,127 @@
 #!/usr/bin/env python3
 
-import random
+import os
+import sys
+import time
+import argparse
+
+from cw_visual.arena import MEM_SIZE
+from cw_visual.binary_protocol import BinaryWriter
+from cw_visual.recorder import WRITE_BUFFER_SIZE, open_recording
+from cw_visual.workload import Profile, profiles, check_profile, generate_events, event_line
 
 # this script emulates output of corewar vm to stdout
-# used to test corewar_visual in abscence of corewar vm
+# used to test corewar_visual in abscence of corewar vm and to load test it
+# the match is generated from a profile (see cw_visual/workload.py), any of its fields can be overridden,
+# the same profile and --seed always give the same output
+# use --binary to emit compact binary protocol instead of text
+# use --output to write to a file instead of stdout, compressed if it ends with .gz or .xz
+# use --mem-size and --row-width to start the output with arena geometry header
+
+# text lines joined into one write
+LINES_PER_WRITE = 16 * 1024
+
+arg_parser = argparse.ArgumentParser(description="emulates corewar vm output")
+arg_parser.add_argument("--profile", choices=list(profiles), default="demo",
+                        help="shape of the generated match")
+arg_parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the generated match")
+
+for field in Profile._fields:
+    field_type = int if field in ("players", "cycles", "cursors", "write_size") else float
+    arg_parser.add_argument("--" + field.replace("_", "-"), type=field_type,
+                            help=f"override {field} of the profile")
+
+arg_parser.add_argument("--binary", action="store_true",
+                        help="emit binary protocol instead of text")
+arg_parser.add_argument("--output", metavar="PATH",
+                        help="write to PATH instead of stdout")
+arg_parser.add_argument("--mem-size", type=int,
+                        help="emit header with memory size of vm")
+arg_parser.add_argument("--row-width", type=int, default=64,
+                        help="bytes in one row of the arena, sent in header")
+options = arg_parser.parse_args()
+
+
+def write_text(events, stream):
+    lines = []
 
-sep = '"'  # separator sign
+    for event in events:
+        lines.append(event_line(event))
 
+        if len(lines) == LINES_PER_WRITE:
+            stream.write(("\n".join(lines) + "\n").encode())
+            lines = []
 
-def add_player(cycle, player_id, player_name, address, bytes):
-    print(
-        f'p{sep}{cycle}{sep}{player_id}{sep}{player_name}{sep}{address}{sep}{bytes}'
-    )
+    if lines:
+        stream.write(("\n".join(lines) + "\n").encode())
 
 
-def add_cursor(cycle, player_id, cursor_id, address):
-    print(
-        f'c{sep}{cycle}{sep}{player_id}{sep}{cursor_id}{sep}{address}'
-    )
+def write_binary(events, stream):
+    writer = BinaryWriter(stream)
 
+    # fields of events are in the order of writer arguments
+    write_event = {
+        'p': writer.add_player,
+        'c': writer.add_cursor,
+        'k': writer.kill_cursor,
+        'm': writer.move_cursor,
+        'w': writer.write_memory,
+        'e': writer.declare_winner,
+        'h': writer.set_geometry,
+    }
 
-def kill_cursor(cycle, player_id, cursor_id):
-    print(
-        f'k{sep}{cycle}{sep}{player_id}{sep}{cursor_id}'
-    )
+    for event in events:
+        write_event[event[0]](*event[1:])
 
+    writer.close()
 
-def move_cursor(cycle, player_id, cursor_id, offset):
-    print(
-        f'm{sep}{cycle}{sep}{player_id}{sep}{cursor_id}{sep}{offset}'
-    )
 
+def counted(events, counter: list):
+    for event in events:
+        counter[0] += 1
+        yield event
 
-def write_memory(cycle, player_id, address, bytes):
-    """ st & sti instruction"""
-    print(
-        f'w{sep}{cycle}{sep}{player_id}{sep}{address}{sep}{bytes}'
-    )
 
+def match_events(profile: Profile):
+    if options.mem_size:
+        yield 'h', 1, options.mem_size, options.row_width
 
-def declare_winner(cycle, player_id):
-    print(
-        f'e{sep}{cycle}{sep}{player_id}'
-    )
+    yield from generate_events(profile, options.seed, options.mem_size or MEM_SIZE)
 
 
 # start emulating output of corewar vm to stdout
-add_player(1, 1, 'Some really long name',
-           0, "00002901DA04446963742901DA"
-           )
-add_player(1, 2, 'Robin', 64*10, "df01bb09")
-add_player(1, 3, 'Yoshi', 64*20, "47823958")
-add_player(1, 4, 'Mario', 64*50, "44ff55eeaabbcacd9933")
-
-# in corewar vm cursors technically do not belong to players, so each cursor id is unique
-# but for visualization sake cursors do belong to players who created them and are colorized respectively
-add_cursor(2, 1, 1, 0)  # player 1 adds cursor 1
-add_cursor(2, 2, 2, 64*10)  # player 2 adds cursor 2
-add_cursor(2, 3, 3, 64*20)  # player 3 adds cursor 3
-add_cursor(2, 4, 4, 64*50)  # player 4 adds cursor 4
-
-add_cursor(10, 1, 5, 64*13)  # player 1 adds cursor 5
-
-move_cursor(20, 1, 5, 4)  # move cursor 5 of player 1
-move_cursor(40, 1, 5, 4)  # move cursor 5 of player 1
-
-cycle = 50
-kill_cursor(cycle, 1, 5)  # kill cursor 5 of player 1
-cycle += 1
-
-for i in range(5000):
-    move_cursor(cycle, 1, 1, 4)  # move cursor 1 of player 1
-    write_memory(cycle, 1, i * 6 + random.randint(0, 10), "AAFF01Baedf0")
-
-    move_cursor(cycle, 2, 2, 2)  # move cursor 2 of player 2
-    write_memory(cycle, 2, 64*10 + i * 6 +
-                 random.randint(0, 10), "BB162fab08"
-                 )
-
-    move_cursor(cycle, 3, 3, 3)  # move cursor 3 of player 3
-    write_memory(cycle, 3, 64*20 - i * 7 +
-                 random.randint(0, 10), "17aa3891fe"
-                 )
-
-    move_cursor(cycle, 4, 4, 8)  # move cursor 4 of player 4
-    write_memory(cycle, 4, 64*50 + i * 10 +
-                 random.randint(0, 10), "6D6F64652E0D0D0A2401"
-                 )
-
-    cycle += 1
-
-kill_cursor(cycle, 1, 1)  # kill cursor 1 of player 1
-kill_cursor(cycle, 2, 2)  # kill cursor 2 of player 2
-kill_cursor(cycle, 3, 3)  # kill cursor 3 of player 3
-kill_cursor(cycle, 4, 4)  # kill cursor 4 of player 4
-
-declare_winner(cycle, 1)
+overrides = {field: getattr(options, field) for field in Profile._fields if getattr(options, field) is not None}
+profile = profiles[options.profile]._replace(**overrides)
+
+try:
+    check_profile(profile)
+except ValueError as e:
+    arg_parser.error(str(e))
+
+if options.output:
+    stream = open_recording(options.output)
+else:
+    # writes go to stdout in large blocks, not line by line
+    stream = open(sys.stdout.fileno(), "wb", buffering=WRITE_BUFFER_SIZE, closefd=False)
+
+events_written = [0]
+start = time.perf_counter()
+
+try:
+    events = counted(match_events(profile), events_written)
+
+    if options.binary:
+        write_binary(events, stream)
+    else:
+        write_text(events, stream)
+
+    stream.close()
+except BrokenPipeError:
+    # the visualizer was closed before the end of the match
+    os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    sys.exit(1)
+
+seconds = max(time.perf_counter() - start, 1e-9)
+print(f"{events_written[0]} events in {seconds:.1f} s, {events_written[0] / seconds:.0f} events/s",
+      file=sys.stderr)